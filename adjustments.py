@@ -0,0 +1,117 @@
+from typing import Optional, Tuple
+import numpy as np
+from snapshot import CountrySnapshot, VISA_DIFFICULTY_LEVELS
+from scoring import VISA_PENALTIES
+
+PROFESSIONS = [
+    "Software Engineer", "Data Scientist", "Product Manager", "Marketing Manager",
+    "Financial Analyst", "Mechanical Engineer", "Registered Nurse", "Teacher",
+    "Graphic Designer", "Sales Manager", "Consultant", "Researcher",
+    "Project Manager", "Business Analyst", "UX/UI Designer", "Operations Manager",
+    "HR Manager", "Accountant", "Civil Engineer", "Healthcare Professional",
+    "Doctor", "Lawyer", "Architect", "Chef", "Pharmacist"
+]
+
+VISA_TYPES = [
+    "Work Visa", "Student Visa", "Investment Visa", "Family Reunification",
+    "Skilled Migrant Visa", "Startup Visa", "Freelancer Visa", "Tourist Visa"
+]
+
+# Positions of professions and visa types in the adjustment tables
+PROFESSION_INDEX = {name: i for i, name in enumerate(PROFESSIONS)}
+VISA_INDEX = {name: i for i, name in enumerate(VISA_TYPES)}
+
+# Global demand for each profession as a multiplier on the jobMarket score
+PROFESSION_DEMAND = {
+    "Software Engineer": 1.15, "Data Scientist": 1.1, "Product Manager": 1.0,
+    "Marketing Manager": 0.9, "Financial Analyst": 0.95, "Mechanical Engineer": 1.05,
+    "Registered Nurse": 1.15, "Teacher": 0.9, "Graphic Designer": 0.8,
+    "Sales Manager": 0.95, "Consultant": 0.95, "Researcher": 0.9,
+    "Project Manager": 1.0, "Business Analyst": 1.0, "UX/UI Designer": 0.9,
+    "Operations Manager": 0.95, "HR Manager": 0.85, "Accountant": 0.95,
+    "Civil Engineer": 1.05, "Healthcare Professional": 1.1, "Doctor": 1.1,
+    "Lawyer": 0.75, "Architect": 0.85, "Chef": 0.9, "Pharmacist": 1.0
+}
+
+# Countries where demand for a profession clearly differs from the global level
+PROFESSION_COUNTRY_DEMAND = {
+    ("Software Engineer", "DE"): 1.25, ("Software Engineer", "NL"): 1.2,
+    ("Software Engineer", "US"): 1.25, ("Software Engineer", "SG"): 1.2,
+    ("Software Engineer", "IN"): 1.2, ("Data Scientist", "US"): 1.2,
+    ("Data Scientist", "GB"): 1.15, ("Registered Nurse", "GB"): 1.3,
+    ("Registered Nurse", "AU"): 1.3, ("Registered Nurse", "CA"): 1.3,
+    ("Registered Nurse", "NZ"): 1.25, ("Registered Nurse", "DE"): 1.25,
+    ("Doctor", "AU"): 1.25, ("Doctor", "NZ"): 1.25, ("Doctor", "GB"): 1.2,
+    ("Mechanical Engineer", "DE"): 1.25, ("Mechanical Engineer", "JP"): 1.15,
+    ("Civil Engineer", "AU"): 1.2, ("Civil Engineer", "CA"): 1.2,
+    ("Teacher", "JP"): 1.1, ("Teacher", "KR"): 1.15,
+    ("Financial Analyst", "CH"): 1.2, ("Financial Analyst", "SG"): 1.2,
+    ("Financial Analyst", "GB"): 1.15, ("Lawyer", "US"): 1.0,
+    ("Chef", "FR"): 1.1, ("Chef", "AU"): 1.1
+}
+
+# How a visa type shifts the country's general visaDifficulty level
+VISA_TYPE_SHIFT = {
+    "Work Visa": 0, "Student Visa": -1, "Investment Visa": -1,
+    "Family Reunification": 0, "Skilled Migrant Visa": 0, "Startup Visa": 0,
+    "Freelancer Visa": 1, "Tourist Visa": -2
+}
+
+# Programs that make a visa type notably easier or harder in one country
+VISA_COUNTRY_DIFFICULTY = {
+    ("Skilled Migrant Visa", "CA"): "LOW", ("Skilled Migrant Visa", "AU"): "MEDIUM",
+    ("Skilled Migrant Visa", "NZ"): "LOW", ("Skilled Migrant Visa", "DE"): "LOW",
+    ("Startup Visa", "NL"): "LOW", ("Startup Visa", "PT"): "LOW",
+    ("Startup Visa", "CA"): "MEDIUM", ("Freelancer Visa", "DE"): "MEDIUM",
+    ("Freelancer Visa", "PT"): "LOW", ("Freelancer Visa", "NL"): "MEDIUM",
+    ("Work Visa", "US"): "HIGH", ("Investment Visa", "PT"): "LOW",
+    ("Student Visa", "US"): "MEDIUM"
+}
+
+class AdjustmentTables:
+    """Profession and visa-type adjustments indexed by key and snapshot row"""
+
+    def __init__(self, snapshot: CountrySnapshot, country_of: Optional[np.ndarray] = None):
+        self.snapshot = snapshot
+        n = len(snapshot)
+        # Catalog regions and cities take the overrides of their country row
+        if country_of is None:
+            country_of = np.arange(n)
+        self.profession_index = PROFESSION_INDEX
+        self.visa_index = VISA_INDEX
+
+        # job_multiplier[profession, row] scales the jobMarket score
+        demand = np.array([PROFESSION_DEMAND[name] for name in PROFESSIONS])
+        self.job_multiplier = np.repeat(demand[:, np.newaxis], n, axis=1)
+        for (profession, code), multiplier in PROFESSION_COUNTRY_DEMAND.items():
+            row = snapshot.index_of(code)
+            if row is not None:
+                self.job_multiplier[self.profession_index[profession], country_of == row] = multiplier
+
+        # visa_difficulty[visa_type, row] holds a VISA_DIFFICULTY_LEVELS code
+        base = np.nan_to_num(snapshot.column('visaDifficulty'), nan=1)
+        shifts = np.array([VISA_TYPE_SHIFT[name] for name in VISA_TYPES])[:, np.newaxis]
+        self.visa_difficulty = np.clip(base[np.newaxis, :] + shifts, 0, 2).astype(np.int8)
+        for (visa_type, code), level in VISA_COUNTRY_DIFFICULTY.items():
+            row = snapshot.index_of(code)
+            if row is not None:
+                self.visa_difficulty[self.visa_index[visa_type], country_of == row] = VISA_DIFFICULTY_LEVELS.index(level)
+
+        penalties = np.array([VISA_PENALTIES[level] for level in VISA_DIFFICULTY_LEVELS])
+        self.visa_penalty = penalties[self.visa_difficulty]
+
+    def lookup(
+        self, rows: np.ndarray, profession: Optional[str], visa_type: Optional[str]
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Per-row job multipliers and visa penalties for one request
+
+        Either is None when the profession or visa type is unknown, so the
+        country's general values apply.
+        """
+        job_multiplier = None
+        if profession in self.profession_index:
+            job_multiplier = self.job_multiplier[self.profession_index[profession], rows]
+        visa_penalty = None
+        if visa_type in self.visa_index:
+            visa_penalty = self.visa_penalty[self.visa_index[visa_type], rows]
+        return job_multiplier, visa_penalty
@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+# Lower values are admitted first when requests are waiting
+PRIORITY_CHEAP = 0
+PRIORITY_EXPENSIVE = 1
+
+# Route prefixes under admission control; anything else bypasses it
+ROUTE_PRIORITIES = (
+    ("/api/analyze", PRIORITY_EXPENSIVE),
+    ("/api/sensitivity", PRIORITY_EXPENSIVE),
+    ("/api/compare", PRIORITY_EXPENSIVE),
+    ("/api/similar", PRIORITY_EXPENSIVE),
+    ("/api/skyline", PRIORITY_EXPENSIVE),
+    ("/api/countries", PRIORITY_CHEAP),
+    ("/api/catalog", PRIORITY_CHEAP),
+    ("/api/details", PRIORITY_CHEAP),
+    ("/api/search", PRIORITY_CHEAP),
+    ("/api/resolve", PRIORITY_CHEAP),
+    ("/api/autocomplete", PRIORITY_CHEAP),
+    ("/api/history", PRIORITY_CHEAP),
+    ("/api/changes", PRIORITY_CHEAP),
+    ("/api/professions", PRIORITY_CHEAP),
+    ("/api/visa-types", PRIORITY_CHEAP)
+)
+
+def route_priority(path: str) -> Optional[int]:
+    """Admission priority of a request path, None if it is not controlled"""
+    for prefix, priority in ROUTE_PRIORITIES:
+        if path.startswith(prefix):
+            return priority
+    return None
+
+class AdmissionRejected(Exception):
+    """A request was shed instead of admitted"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'future')
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+    def key(self):
+        return (self.priority, self.seq)
+
+class AdmissionController:
+    """Concurrency cap with a bounded, prioritized wait queue
+
+    At most max_concurrency requests run at once. Up to max_queue more wait,
+    cheap routes ahead of expensive ones and FIFO within a priority. A full
+    queue sheds the newest lowest-priority request with 429, and a request
+    that waits longer than queue_timeout is shed with 503; both carry a
+    Retry-After estimated from recent service times.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        # Exponentially weighted mean service time, for Retry-After
+        self._service_time = 0.1
+
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.peak_queue_depth = 0
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = (len(self._waiters) + self._active) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _reject_queue_full(self) -> AdmissionRejected:
+        self.shed_queue_full += 1
+        return AdmissionRejected(429, self._retry_after(), "Too many requests queued, try again later")
+
+    async def acquire(self, priority: int):
+        """Wait for a slot or raise AdmissionRejected"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters, key=_Waiter.key, default=None)
+            if worst is None or worst.priority <= priority:
+                raise self._reject_queue_full()
+            # Make room by shedding the newest request of a lower priority
+            self._waiters.remove(worst)
+            worst.future.set_exception(self._reject_queue_full())
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed_timeout += 1
+            raise AdmissionRejected(503, self._retry_after(), "Service saturated, try again later")
+        except asyncio.CancelledError:
+            # The client went away; hand back a slot it may have been given
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release()
+            self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def _discard(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot, handing it straight to the next waiter if any"""
+        if service_time is not None:
+            self._service_time = 0.9 * self._service_time + 0.1 * service_time
+        while self._waiters:
+            waiter = min(self._waiters, key=_Waiter.key)
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: int):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current load and shed counters"""
+        return {
+            'active': self._active,
+            'queue_depth': len(self._waiters),
+            'peak_queue_depth': self.peak_queue_depth,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'queue_timeout_seconds': self.queue_timeout,
+            'admitted': self.admitted,
+            'shed_queue_full': self.shed_queue_full,
+            'shed_timeout': self.shed_timeout,
+            'mean_service_ms': round(self._service_time * 1000, 1)
+        }
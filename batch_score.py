@@ -0,0 +1,421 @@
+"""
+Offline batch scoring of saved preference profiles.
+
+Re-ranks any number of stored profiles against the current data without
+going through HTTP:
+
+    python batch_score.py profiles.csv rankings/ --top 10 --workers 8
+
+Profiles are read in chunks from CSV or Parquet, one profile per row:
+
+    profile_id          required
+    profession          optional; unknown or blank means no profession
+    visa_type           optional; blank means "Work Visa"
+    economicOpportunities, qualityOfLife, safetyAndSecurity,
+    healthcareQuality, climateSuitability
+                        optional sliders (1-10); blank means not given
+
+Scores use the analyzer's ScoringTable and AdjustmentTables, so each
+profile gets the ranking POST /api/analyze returns for the same request
+with every country (or --targets) as targets. Profiles whose given sliders
+are all zero are skipped and counted.
+
+Worker processes memory-map the same snapshot file, so the country data
+exists once in the page cache. Each worker writes its chunk's rankings
+itself, one row per profile and rank:
+
+    <output>/part-<chunk>.csv|.parquet   profile_id, rank, code, score, recommendation
+    <output>/checkpoint.json             run parameters and finished chunks
+
+Part files and the checkpoint are replaced atomically. A run that stops
+resumes from its checkpoint and skips finished chunks, as long as the
+input file, data version and parameters are unchanged. Only a few chunks
+per worker are read ahead, so memory stays bounded whatever the input size.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from snapshot import CountrySnapshot, write_snapshot
+from scoring import ScoringTable, PREFERENCE_KEYS, DEFAULT_PREFERENCE_SLIDERS, RECOMMENDATION_LEVELS
+from scoring import recommendation_levels, round_deci
+from adjustments import AdjustmentTables, PROFESSION_INDEX, VISA_INDEX
+from ranking_table import worker_context
+import settings
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "parquet")
+CHECKPOINT_FILE = "checkpoint.json"
+DEFAULT_VISA_TYPE = "Work Visa"
+
+# Chunks read ahead per worker; bounds the memory held by pending chunks
+_CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def input_format(path: str) -> str:
+    """csv or parquet, by file extension"""
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+def _read_chunks(path: str, chunk_size: int) -> Iterator[Any]:
+    """DataFrames of at most chunk_size profiles, read lazily"""
+    import pandas as pd
+    if input_format(path) == "csv":
+        # Only the profile id must stay text; sliders are parsed later
+        yield from pd.read_csv(
+            path, chunksize=chunk_size, dtype={'profile_id': str, 'profession': str, 'visa_type': str}
+        )
+        return
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet profiles requires pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    wanted = {'profile_id', 'profession', 'visa_type', *PREFERENCE_KEYS}
+    columns = [name for name in parquet.schema_arrow.names if name in wanted]
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
+
+def _count_profiles(path: str) -> Optional[int]:
+    """Profiles in the input when known without reading it, from Parquet metadata"""
+    if input_format(path) != "parquet":
+        return None
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pq.ParquetFile(path).metadata.num_rows
+
+def encode_chunk(frame) -> Dict[str, np.ndarray]:
+    """Plain arrays for one chunk of profiles, cheap to send to a worker"""
+    import pandas as pd
+    if 'profile_id' not in frame.columns:
+        raise ValueError("Profiles need a profile_id column")
+    n = len(frame)
+
+    sliders = np.full((n, len(PREFERENCE_KEYS)), np.nan)
+    for k, key in enumerate(PREFERENCE_KEYS):
+        if key in frame.columns:
+            sliders[:, k] = pd.to_numeric(frame[key], errors='coerce').to_numpy(dtype=float)
+
+    def indices(column: str, index: Dict[str, int], default: Optional[str]) -> np.ndarray:
+        if column not in frame.columns:
+            return np.full(n, index.get(default, -1), dtype=np.int16)
+        values = frame[column].fillna(default or "").astype(str).str.strip()
+        if default is not None:
+            values = values.replace("", default)
+        return values.map(index).fillna(-1).to_numpy(dtype=np.int16)
+
+    return {
+        'ids': frame['profile_id'].astype(str).to_numpy(dtype=object),
+        'sliders': sliders,
+        'professions': indices('profession', PROFESSION_INDEX, None),
+        'visas': indices('visa_type', VISA_INDEX, DEFAULT_VISA_TYPE)
+    }
+
+class ProfileScorer:
+    """Top-N rankings for many preference profiles at once
+
+    Scores come from ScoringTable.scores with the adjustments of
+    MigrationAnalyzer.analyze_migration: missing sliders take the default
+    weights in the numerator while the divisor sums only the sliders given,
+    profession multipliers scale the job market score, and ties keep target
+    order.
+    """
+
+    def __init__(self, snapshot: CountrySnapshot, targets: Optional[List[str]] = None):
+        self.snapshot = snapshot
+        self.table = ScoringTable(snapshot)
+        self.adjustments = AdjustmentTables(snapshot)
+        if targets is None:
+            self.rows = np.arange(len(snapshot))
+        else:
+            rows = [snapshot.index_of(code) for code in targets]
+            missing = [code for code, row in zip(targets, rows) if row is None]
+            if missing:
+                raise ValueError(f"Countries not found: {', '.join(missing)}")
+            self.rows = np.array(rows, dtype=np.intp)
+
+        # Last row: the country's general visa penalty, for unknown visa types
+        self.visa_penalty = np.vstack([
+            self.adjustments.visa_penalty[:, self.rows], self.table.visa_penalty[self.rows]
+        ])
+
+    def score(self, sliders: np.ndarray, professions: np.ndarray, visas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores [profiles][targets] and a mask of the profiles that could be scored"""
+        given = ~np.isnan(sliders)
+        weights = np.where(given, sliders, np.array(DEFAULT_PREFERENCE_SLIDERS))
+        divisor = np.where(given, sliders, 0).sum(axis=1) / 10
+        valid = divisor != 0
+        divisor = np.where(valid, divisor, 1)
+
+        scores = np.empty((len(sliders), len(self.rows)))
+        for p in np.unique(professions):
+            members = professions == p
+            job_multiplier = None if p < 0 else self.adjustments.job_multiplier[p, self.rows]
+            # One visa penalty column per profile
+            scores[members] = self.table.scores(
+                self.rows, weights[members], divisor[members], job_multiplier, self.visa_penalty[visas[members]].T
+            ).T
+        return scores, valid
+
+    def rank(self, sliders: np.ndarray, professions: np.ndarray, visas: np.ndarray, top: int):
+        """Rows, rounded scores and recommendation levels of each profile's top targets"""
+        scores, valid = self.score(sliders, professions, visas)
+        deci = round_deci(scores).astype(np.int32)
+        # Like the route, rank by rounded score with ties in target order
+        top = min(top, len(self.rows))
+        order = np.argsort(-deci, axis=1, kind='stable')[:, :top]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        levels = recommendation_levels(top_scores)
+        return self.rows[order], np.take_along_axis(deci, order, axis=1) / 10, levels, valid
+
+def part_path(output_dir: str, chunk: int, fmt: str) -> str:
+    return os.path.join(output_dir, f"part-{chunk:06d}.{fmt}")
+
+def _write_csv(path: str, frame):
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        frame.to_csv(path, index=False)
+        return
+    # Several times faster than pandas, which dominates a chunk's time otherwise
+    pa_csv.write_csv(
+        pa.Table.from_pandas(frame, preserve_index=False), path,
+        pa_csv.WriteOptions(quoting_style="needed")
+    )
+
+def _write_part(path: str, frame, fmt: str):
+    tmp_path = f"{path}.tmp"
+    if fmt == "csv":
+        _write_csv(tmp_path, frame)
+    else:
+        frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+# Per-process state of the scoring workers
+_worker = {}
+
+def _init_worker(snapshot_file: str, targets: Optional[List[str]], top: int, output_dir: str, fmt: str):
+    _worker.update(
+        scorer=ProfileScorer(CountrySnapshot.open(snapshot_file), targets),
+        top=top, output_dir=output_dir, fmt=fmt
+    )
+
+def _score_chunk(chunk: int, encoded: Dict[str, np.ndarray]) -> Tuple[int, int, int]:
+    """Rank one chunk and write its part file; returns chunk, profiles ranked and skipped"""
+    import pandas as pd
+    scorer, top = _worker['scorer'], _worker['top']
+    rows, scores, levels, valid = scorer.rank(encoded['sliders'], encoded['professions'], encoded['visas'], top)
+    rows, scores, levels = rows[valid], scores[valid], levels[valid]
+    ids = encoded['ids'][valid]
+
+    per_profile = rows.shape[1]
+    codes = np.array(scorer.snapshot.codes, dtype=object)
+    frame = pd.DataFrame({
+        'profile_id': np.repeat(ids, per_profile),
+        'rank': np.tile(np.arange(1, per_profile + 1), len(ids)),
+        'code': codes[rows.reshape(-1)],
+        'score': scores.reshape(-1),
+        'recommendation': np.array(RECOMMENDATION_LEVELS, dtype=object)[levels.reshape(-1)]
+    })
+    _write_part(part_path(_worker['output_dir'], chunk, _worker['fmt']), frame, _worker['fmt'])
+    return chunk, int(valid.sum()), int((~valid).sum())
+
+class Checkpoint:
+    """Run parameters and finished chunks, saved after every chunk"""
+
+    def __init__(self, output_dir: str, params: Dict[str, Any]):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.params = params
+        self.done = set()
+        self.profiles = 0
+        self.skipped = 0
+        self.finished = False
+
+    def load(self, restart: bool) -> bool:
+        """Pick up an earlier run with the same parameters; returns whether one was found"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if restart:
+            return False
+        if saved.get('params') != self.params:
+            raise ValueError(
+                f"{self.path} belongs to a run with different input, data or parameters; "
+                f"use --restart to start over"
+            )
+        self.done = set(saved['done'])
+        self.profiles = saved['profiles']
+        self.skipped = saved['skipped']
+        self.finished = saved['finished']
+        return True
+
+    def save(self):
+        state = {
+            'params': self.params,
+            'done': sorted(self.done),
+            'profiles': self.profiles,
+            'skipped': self.skipped,
+            'finished': self.finished
+        }
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{self.path}.tmp", self.path)
+
+async def _current_snapshot_file(db_path: str, output_dir: str) -> Tuple[str, int]:
+    """Snapshot file of the database's current data, written out if it only exists in memory"""
+    from data_fetcher import DataFetcher
+    fetcher = DataFetcher(db_path)
+    # Seeds a database that does not exist yet, like the server's startup
+    await fetcher.initialize_database()
+    snapshot = await fetcher.get_snapshot()
+    if snapshot.path is not None:
+        return snapshot.path, snapshot.data_version
+    path = os.path.join(output_dir, f"snapshot.v{snapshot.data_version}")
+    write_snapshot(path, snapshot.records(), snapshot.data_version)
+    return path, snapshot.data_version
+
+def run(
+    input_path: str,
+    output_dir: str,
+    snapshot_file: str,
+    top: int = 10,
+    targets: Optional[List[str]] = None,
+    chunk_size: int = 10000,
+    workers: Optional[int] = None,
+    fmt: Optional[str] = None,
+    restart: bool = False
+) -> Dict[str, Any]:
+    """Rank every profile of an input file into output_dir, resuming an earlier run"""
+    started = time.perf_counter()
+    fmt = fmt or input_format(input_path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    # Validates the targets before any process starts
+    scorer = ProfileScorer(CountrySnapshot.open(snapshot_file), targets)
+    stat = os.stat(input_path)
+    checkpoint = Checkpoint(output_dir, {
+        'input': os.path.abspath(input_path),
+        'input_size': stat.st_size,
+        'input_mtime': stat.st_mtime,
+        'data_version': scorer.snapshot.data_version,
+        'targets': targets,
+        'top': top,
+        'chunk_size': chunk_size,
+        'format': fmt
+    })
+    if checkpoint.load(restart):
+        if checkpoint.finished:
+            logger.info(f"{output_dir} already holds the finished rankings")
+            return _summary(checkpoint, started)
+        logger.info(f"Resuming after {len(checkpoint.done)} finished chunks")
+    else:
+        # Parts of an abandoned run must not mix with this one's
+        for name in os.listdir(output_dir):
+            if name.startswith("part-"):
+                os.remove(os.path.join(output_dir, name))
+        checkpoint.save()
+
+    total = _count_profiles(input_path)
+    last_report = 0.0
+
+    def collect(futures) -> set:
+        nonlocal last_report
+        finished, pending = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            chunk, profiles, skipped = future.result()
+            checkpoint.done.add(chunk)
+            checkpoint.profiles += profiles
+            checkpoint.skipped += skipped
+        checkpoint.save()
+        if time.monotonic() - last_report >= 1:
+            last_report = time.monotonic()
+            done = checkpoint.profiles + checkpoint.skipped
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            progress = f"{done}/{total}" if total else f"{done}"
+            logger.info(f"Ranked {progress} profiles ({rate:,.0f}/s), {len(checkpoint.done)} chunks")
+        return pending
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=worker_context(),
+        initializer=_init_worker,
+        initargs=(snapshot_file, targets, top, output_dir, fmt)
+    ) as pool:
+        pending = set()
+        for chunk, frame in enumerate(_read_chunks(input_path, chunk_size)):
+            if chunk in checkpoint.done:
+                continue
+            pending.add(pool.submit(_score_chunk, chunk, encode_chunk(frame)))
+            del frame
+            while len(pending) >= workers * _CHUNKS_IN_FLIGHT_PER_WORKER:
+                pending = collect(pending)
+        while pending:
+            pending = collect(pending)
+
+    checkpoint.finished = True
+    checkpoint.save()
+    summary = _summary(checkpoint, started)
+    logger.info(
+        f"Ranked {summary['profiles']} profiles ({summary['skipped']} skipped) "
+        f"into {len(checkpoint.done)} parts in {summary['seconds']:.1f}s"
+    )
+    return summary
+
+def _summary(checkpoint: Checkpoint, started: float) -> Dict[str, Any]:
+    return {
+        'profiles': checkpoint.profiles,
+        'skipped': checkpoint.skipped,
+        'chunks': len(checkpoint.done),
+        'data_version': checkpoint.params['data_version'],
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank saved preference profiles against the current country data")
+    parser.add_argument("input", help="CSV or Parquet file of profiles")
+    parser.add_argument("output", help="Directory for ranking parts and the checkpoint")
+    parser.add_argument("--top", type=int, default=10, help="Countries ranked per profile")
+    parser.add_argument("--targets", help="Comma-separated country codes to rank (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Profiles per chunk")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes, 0 for one per CPU")
+    parser.add_argument("--format", choices=FORMATS, help="Output format (default: the input's)")
+    parser.add_argument("--snapshot", help="Snapshot file to score against instead of the database's")
+    parser.add_argument("--db", default=settings.DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot_file = args.snapshot
+    if snapshot_file is None:
+        os.makedirs(args.output, exist_ok=True)
+        snapshot_file, _ = asyncio.run(_current_snapshot_file(args.db, args.output))
+    targets = [code.strip() for code in args.targets.split(",") if code.strip()] if args.targets else None
+
+    try:
+        summary = run(
+            args.input, args.output, snapshot_file, args.top, targets,
+            args.chunk_size, args.workers or None, args.format, args.restart
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
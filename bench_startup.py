@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the API and the Streamlit dashboard.
+Measures cold import times, time until GET /api/health first returns 200
+and time until the Streamlit script finishes its first run, then checks
+the results against the budget recorded in startup_budget.json.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(ROOT, "startup_budget.json")
+
+def _free_port() -> int:
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import(module: str, runs: int) -> float:
+    """Median seconds to import a module in a fresh interpreter"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def measure_api_first_200(timeout: float) -> float:
+    """Seconds from launching uvicorn until /api/health answers 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    # An in-memory database keeps the benchmark off the disk and independent of local data
+    env = dict(os.environ, DATABASE_MODE="memory", DATABASE_PATH="bench_startup")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"/api/health did not return 200 within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def measure_streamlit_first_paint(timeout: float) -> float:
+    """Seconds for the first full run of streamlit_app.py in a fresh interpreter"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        "from streamlit.testing.v1 import AppTest; "
+        f"AppTest.from_file('streamlit_app.py', default_timeout={timeout}).run(); "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    """Run the startup benchmark and compare against the budget"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Runs per import measurement")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for a server")
+    parser.add_argument("--skip-streamlit", action="store_true", help="Skip the Streamlit measurements")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    results = {
+        "import_main_s": measure_import("main", args.runs),
+        "api_first_200_s": measure_api_first_200(args.timeout)
+    }
+    if not args.skip_streamlit:
+        results["import_streamlit_app_s"] = measure_import("streamlit_app", args.runs)
+        results["streamlit_first_paint_s"] = measure_streamlit_first_paint(args.timeout)
+
+    print("⏱️  Startup benchmark")
+    print("=" * 50)
+    over_budget = False
+    for name, seconds in results.items():
+        limit = budget.get(name)
+        ok = limit is None or seconds <= limit
+        over_budget |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: {seconds:.3f}s (budget {limit}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "budget": budget}, f, indent=2)
+
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Hierarchical catalog of countries, regions and cities.
+
+Every node is addressed by its path: "DE", "DE/BY", "DE/BY/MUC". Regions and
+cities store only the metrics that differ from their parent; resolve_nodes
+fills in the rest top-down when the catalog snapshot is built on refresh.
+
+CatalogIndex is built once per data version from that snapshot and answers
+hierarchy queries with array operations instead of walking the tree:
+
+    prefix index     rows sorted by path, so the descendants of a node are
+                     one binary search away
+    ancestor index   parent, depth and country row of every node
+    groups           membership masks for named groups such as EU
+    aggregates       leaf counts and per-metric mean/min/max over each
+                     subtree, accumulated bottom-up one depth at a time
+"""
+
+import logging
+from typing import Dict, Any, List, Optional
+import numpy as np
+from models import Country
+from snapshot import CountrySnapshot, KIND_VISA
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "/"
+LEVELS = ("country", "region", "city")
+
+# Named groups of countries, usable wherever a catalog path is
+GROUPS = {
+    'EU': (
+        'AT', 'BE', 'BG', 'HR', 'CY', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE',
+        'IT', 'LV', 'LT', 'LU', 'MT', 'NL', 'PL', 'PT', 'RO', 'SK', 'SI', 'ES', 'SE'
+    )
+}
+
+def depth_of(path: str) -> int:
+    """0 for countries, 1 for regions, 2 for cities"""
+    return path.count(SEPARATOR)
+
+def parent_path(path: str) -> Optional[str]:
+    """Path of a node's parent, None for countries"""
+    parent, separator, _ = path.rpartition(SEPARATOR)
+    return parent if separator else None
+
+def is_catalog_target(target: str) -> bool:
+    """Whether an analysis target needs the catalog rather than the country snapshot"""
+    return SEPARATOR in target or target in GROUPS
+
+def level_depth(level: Optional[str]) -> Optional[int]:
+    """Depth for a level name, None for no level"""
+    if level is None:
+        return None
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level: {level}")
+    return LEVELS.index(level)
+
+def resolve_nodes(countries: List[Country], places: List[Country]) -> List[Country]:
+    """Countries plus places with the metrics they inherit filled in"""
+    resolved = {country.code: country for country in countries}
+    for place in sorted(places, key=lambda place: depth_of(place.code)):
+        parent = resolved.get(parent_path(place.code))
+        if parent is None or depth_of(place.code) >= len(LEVELS):
+            logger.warning(f"Skipping catalog node without a known parent: {place.code}")
+            continue
+        metrics = parent.metrics.copy()
+        for name, value in place.metrics.items():
+            metrics.set(name, value)
+        resolved[place.code] = Country(
+            place.code, place.name, place.flag or parent.flag, metrics, place.pros, place.cons
+        )
+    return list(resolved.values())
+
+class CatalogIndex:
+    """Prefix, ancestor, group and aggregate indexes over a catalog snapshot"""
+
+    def __init__(self, snapshot: CountrySnapshot):
+        self.snapshot = snapshot
+        codes = snapshot.codes
+        n = len(codes)
+
+        self.depth = np.fromiter((depth_of(code) for code in codes), dtype=np.int8, count=n)
+        self.parent = np.fromiter(
+            (snapshot.index_of(parent_path(code)) if SEPARATOR in code else -1 for code in codes),
+            dtype=np.int32, count=n
+        )
+        # Parents are one level up, so each level copies its parents' country row
+        self.country = np.arange(n, dtype=np.int32)
+        max_depth = int(self.depth.max()) if n else 0
+        for depth in range(1, max_depth + 1):
+            rows = np.flatnonzero(self.depth == depth)
+            self.country[rows] = self.country[self.parent[rows]]
+
+        paths = np.array(codes, dtype=str) if n else np.array([], dtype=str)
+        self.order = np.argsort(paths, kind='stable')
+        self.sorted_paths = paths[self.order]
+        self.sorted_position = np.empty(n, dtype=np.intp)
+        self.sorted_position[self.order] = np.arange(n)
+
+        self.groups = {}
+        for name, members in GROUPS.items():
+            member_rows = [row for row in (snapshot.index_of(code) for code in members) if row is not None]
+            self.groups[name] = np.isin(self.country, member_rows)
+
+        self._aggregate(max_depth)
+
+    def _aggregate(self, max_depth: int):
+        """Leaf counts and metric totals over every subtree, deepest level first"""
+        columns = self.snapshot.columns
+        n = len(self.depth)
+        is_leaf = np.ones(n, dtype=bool)
+        is_leaf[self.parent[self.parent >= 0]] = False
+
+        present = ~np.isnan(columns) & is_leaf
+        self.leaf_count = is_leaf.astype(np.int64)
+        self.metric_count = present.astype(np.int64)
+        self.metric_sum = np.where(present, columns, 0.0)
+        self.metric_min = np.where(present, columns, np.inf)
+        self.metric_max = np.where(present, columns, -np.inf)
+
+        for depth in range(max_depth, 0, -1):
+            rows = np.flatnonzero(self.depth == depth)
+            parents = (slice(None), self.parent[rows])
+            np.add.at(self.leaf_count, self.parent[rows], self.leaf_count[rows])
+            np.add.at(self.metric_count, parents, self.metric_count[:, rows])
+            np.add.at(self.metric_sum, parents, self.metric_sum[:, rows])
+            np.minimum.at(self.metric_min, parents, self.metric_min[:, rows])
+            np.maximum.at(self.metric_max, parents, self.metric_max[:, rows])
+
+    def subtree(self, path: str) -> np.ndarray:
+        """Rows of a node and all its descendants, via the sorted paths"""
+        prefix = path + SEPARATOR
+        # Every path starting with prefix sorts before prefix with the separator bumped
+        bound = path + chr(ord(SEPARATOR) + 1)
+        lo, hi = np.searchsorted(self.sorted_paths, [prefix, bound])
+        descendants = self.order[lo:hi]
+        row = self.snapshot.index_of(path)
+        if row is None:
+            return descendants
+        return np.concatenate(([row], descendants)).astype(descendants.dtype)
+
+    def ancestors(self, row: int) -> List[int]:
+        """Rows from the country down to the node's parent"""
+        chain = []
+        parent = int(self.parent[row])
+        while parent >= 0:
+            chain.append(parent)
+            parent = int(self.parent[parent])
+        return chain[::-1]
+
+    def children(self, row: int) -> np.ndarray:
+        """Rows one level below a node, ordered by path"""
+        rows = self.subtree(self.snapshot.codes[row])
+        return rows[self.depth[rows] == self.depth[row] + 1]
+
+    def resolve(self, targets: List[str], level: Optional[str] = None) -> np.ndarray:
+        """Rows for paths and group names, expanded to one level if given
+
+        Without a level each path is the node itself and a group is its
+        countries. Unknown targets are skipped; duplicates are dropped.
+        """
+        depth = level_depth(level)
+        parts = []
+        for target in targets:
+            if target in self.groups:
+                mask = self.groups[target] & (self.depth == (0 if depth is None else depth))
+                parts.append(np.flatnonzero(mask))
+                continue
+            row = self.snapshot.index_of(target)
+            if row is None:
+                continue
+            if depth is None or depth == self.depth[row]:
+                parts.append(np.array([row]))
+            elif depth > self.depth[row]:
+                rows = self.subtree(target)
+                parts.append(rows[self.depth[rows] == depth])
+
+        if not parts:
+            return np.array([], dtype=np.intp)
+        rows = np.concatenate(parts).astype(np.intp)
+        _, first = np.unique(rows, return_index=True)
+        return rows[np.sort(first)]
+
+    def nodes(self, within: Optional[str] = None, level: Optional[str] = None) -> np.ndarray:
+        """Rows at a level, across the catalog or inside one path or group, ordered by path"""
+        if within is not None:
+            rows = self.resolve([within], level)
+            return rows[np.argsort(self.sorted_position[rows], kind='stable')]
+        rows = self.order
+        if level is not None:
+            rows = rows[self.depth[rows] == level_depth(level)]
+        return rows
+
+    def summary(self, row: int) -> Dict[str, str]:
+        """Code, name, flag and level of one node"""
+        return {**self.snapshot.summary(row), 'level': LEVELS[self.depth[row]]}
+
+    def aggregates(self, row: int) -> Dict[str, Any]:
+        """Leaf count and per-metric mean/min/max over a node's subtree"""
+        metrics = {}
+        for m, name in enumerate(self.snapshot.metric_names):
+            count = int(self.metric_count[m, row])
+            # Visa difficulty codes are levels, not quantities
+            if count == 0 or self.snapshot.metric_kinds[m] == KIND_VISA:
+                continue
+            metrics[name] = {
+                'mean': round(float(self.metric_sum[m, row]) / count, 2),
+                'min': float(self.metric_min[m, row]),
+                'max': float(self.metric_max[m, row]),
+                'count': count
+            }
+        return {'leaves': int(self.leaf_count[row]), 'metrics': metrics}
+
+    def node(self, path: str) -> Optional[Dict[str, Any]]:
+        """One node with its ancestors, children and subtree aggregates"""
+        row = self.snapshot.index_of(path)
+        if row is None:
+            return None
+        return {
+            'node': self.snapshot.country(row),
+            'level': LEVELS[self.depth[row]],
+            'ancestors': [self.summary(r) for r in self.ancestors(row)],
+            'children': [self.summary(int(r)) for r in self.children(row)],
+            'aggregates': self.aggregates(row)
+        }
@@ -0,0 +1,70 @@
+from typing import List, Dict, Any
+import numpy as np
+from snapshot import CountrySnapshot, KIND_INT, KIND_VISA
+
+class ComparisonMatrix:
+    """Per-metric differences and percentage changes for every country pair"""
+
+    def __init__(self, snapshot: CountrySnapshot):
+        self.snapshot = snapshot
+
+        # Categorical metrics such as visaDifficulty are not compared
+        self.metric_rows = [
+            m for m, kind in enumerate(snapshot.metric_kinds) if kind != KIND_VISA
+        ]
+        self.metric_names = [snapshot.metric_names[m] for m in self.metric_rows]
+        self._position = {name: i for i, name in enumerate(self.metric_names)}
+
+        # values[m, i] -> difference[m, source, target] = target - source
+        values = snapshot.columns[self.metric_rows]
+        self.difference = values[:, np.newaxis, :] - values[:, :, np.newaxis]
+        source = np.broadcast_to(values[:, :, np.newaxis], self.difference.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.percentage_change = np.where(
+                source != 0, self.difference / source * 100, 0.0
+            )
+
+    def _difference_value(self, m: int, value: float):
+        """Keep integer metrics integral in the response"""
+        if self.snapshot.metric_kinds[self.metric_rows[m]] == KIND_INT:
+            return int(value)
+        return float(value)
+
+    def metrics_comparison(self, source: int, target: int) -> Dict[str, Any]:
+        """Metric-by-metric comparison of two rows"""
+        comparison = {}
+        for m, name in enumerate(self.metric_names):
+            difference = self.difference[m, source, target]
+            if np.isnan(difference):
+                continue
+            comparison[name] = {
+                'source_value': self.snapshot.metric_value(source, self.metric_rows[m]),
+                'target_value': self.snapshot.metric_value(target, self.metric_rows[m]),
+                'difference': self._difference_value(m, difference),
+                'percentage_change': round(float(self.percentage_change[m, source, target]), 1)
+            }
+        return comparison
+
+    def metric_matrix(self, metric: str, rows: List[int]) -> Dict[str, Any]:
+        """N x N difference and percentage change matrices for one metric"""
+        if metric not in self._position:
+            raise ValueError(f"Unknown or non-numeric metric: {metric}")
+
+        m = self._position[metric]
+        index = np.array(rows, dtype=np.intp)
+        values = [self.snapshot.metric_value(row, self.metric_rows[m]) for row in rows]
+        difference = self.difference[m][np.ix_(index, index)]
+        percentage_change = np.round(self.percentage_change[m][np.ix_(index, index)], 1)
+
+        if self.snapshot.metric_kinds[self.metric_rows[m]] == KIND_INT and not np.isnan(difference).any():
+            difference_list = difference.astype(np.int64).tolist()
+        else:
+            difference_list = np.where(np.isnan(difference), None, difference).tolist()
+
+        return {
+            'metric': metric,
+            'codes': [self.snapshot.codes[row] for row in rows],
+            'values': values,
+            'difference': difference_list,
+            'percentage_change': np.where(np.isnan(percentage_change), None, percentage_change).tolist()
+        }
@@ -1,412 +1,157 @@
-import aiosqlite
-import httpx
 import asyncio
+import contextvars
+import functools
 import json
-from typing import List, Dict, Any
+import glob
+import hashlib
+import re
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+from contextlib import asynccontextmanager
+from models import Country, Metrics
+from ingestion import IngestionClient, apply_source_updates
+from catalog import SEPARATOR, resolve_nodes
+from ranking_table import RankingTableLoader
+import settings
+import tracing
+from snapshot import CountrySnapshot, KIND_INT, VISA_DIFFICULTY_LEVELS, write_snapshot, read_snapshot_version
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Versioned seed catalog; only read when the database needs (re)seeding
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "countries_seed.snap")
+
+# Seed regions and cities, merged over the seed countries like a source document
+PLACES_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "places_seed.json")
+
+DATABASE_MODES = ("rw", "ro", "memory")
+
+# The fetcher and data a reload is warming up in its worker thread, so derived
+# structures built there see the new data before it is swapped in
+_pending_load = contextvars.ContextVar("pending_load", default=None)
+
+class LoadedData:
+    """One data version's snapshots and the structures derived from them, swapped in as a unit"""
+
+    __slots__ = ('snapshot', 'catalog', 'updated_at', 'derived')
+
+    def __init__(self, snapshot: CountrySnapshot, catalog: CountrySnapshot, updated_at: Optional[float]):
+        self.snapshot = snapshot
+        # Countries, regions and cities keyed by catalog path
+        self.catalog = catalog
+        # When the data was stored, as recorded in data_version
+        self.updated_at = updated_at
+        # Structures precomputed from the snapshots, by name
+        self.derived: Dict[str, Any] = {}
+
 class DataFetcher:
-    def __init__(self, db_path: str = "migration_data.db"):
-        self.db_path = db_path
-        self.countries_data = self._get_initial_countries_data()
+    def __init__(
+        self, db_path: Optional[str] = None, mode: Optional[str] = None, sources: Optional[List[str]] = None,
+        immutable: Optional[bool] = None
+    ):
+        self.db_path = db_path or settings.DATABASE_PATH
+        self.mode = mode or settings.DATABASE_MODE
+        if self.mode not in DATABASE_MODES:
+            raise ValueError(f"Unknown database mode: {self.mode}")
+        # Only for ro files that nothing writes to while they are served
+        self.immutable = settings.DATABASE_IMMUTABLE if immutable is None else immutable
+        # Upstream documents merged over the seed catalog on refresh
+        self.sources = settings.INGESTION_SOURCES if sources is None else sources
+        self.ingestion = IngestionClient(
+            settings.INGESTION_CACHE_DIR, settings.INGESTION_OFFLINE, settings.INGESTION_TIMEOUT_SECONDS
+        )
+        # Versioned binary snapshots shared by all worker processes
+        self.snapshot_path = f"{self.db_path}.snapshot"
+        # Loaded data, replaced as a whole by every reload
+        self._data: Optional[LoadedData] = None
+        # Keeps a shared-cache in-memory database alive between connections
+        self._memory_keeper = None
+        # Derived structures rebuilt eagerly after every reload
+        self._warmers = {}
+        self.open_connections = 0
 
-    def _get_initial_countries_data(self) -> List[Dict[str, Any]]:
-        """Initial country data with comprehensive metrics"""
-        return [
-            {
-                "code": "NL", "name": "Netherlands", "flag": "🇳🇱",
-                "metrics": {
-                    "gdpPerCapita": 52331, "safetyIndex": 8.7, "healthcareQuality": 8.9,
-                    "educationQuality": 9.0, "costOfLiving": 88, "climateScore": 6.8,
-                    "languageBarrier": 4.0, "taxRate": 29, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.9, "jobMarket": 8.3
-                },
-                "pros": [
-                    "Excellent work-life balance and progressive work culture",
-                    "High-quality healthcare system with universal coverage",
-                    "Strong English proficiency among population",
-                    "Excellent cycling infrastructure and sustainable transport",
-                    "High quality of education and research institutions",
-                    "Stable political environment and strong rule of law"
-                ],
-                "cons": [
-                    "High cost of living, especially housing in major cities",
-                    "Complex tax system with relatively high tax rates",
-                    "Challenging housing market with limited availability",
-                    "Weather can be unpredictable with frequent rain",
-                    "Bureaucratic processes can be slow and complex",
-                    "Social integration may take time for non-EU citizens"
-                ]
-            },
-            {
-                "code": "FI", "name": "Finland", "flag": "🇫🇮",
-                "metrics": {
-                    "gdpPerCapita": 48810, "safetyIndex": 9.2, "healthcareQuality": 9.0,
-                    "educationQuality": 9.4, "costOfLiving": 90, "climateScore": 5.8,
-                    "languageBarrier": 8.0, "taxRate": 30, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.6, "jobMarket": 7.9
-                },
-                "pros": [
-                    "World-class education system and high literacy rates",
-                    "Excellent work-life balance with strong labor protections",
-                    "Very low crime rates and high personal safety",
-                    "Beautiful natural landscapes and clean environment",
-                    "Strong social safety net and universal healthcare",
-                    "High levels of government transparency and low corruption"
-                ],
-                "cons": [
-                    "Very challenging climate with long, dark winters",
-                    "Finnish language is extremely difficult to learn",
-                    "Limited job market in certain sectors",
-                    "High cost of living, especially alcohol and dining out",
-                    "Social culture can be reserved, making integration challenging",
-                    "Limited sunlight during winter months affecting mental health"
-                ]
-            },
-            {
-                "code": "PT", "name": "Portugal", "flag": "🇵🇹",
-                "metrics": {
-                    "gdpPerCapita": 23252, "safetyIndex": 8.5, "healthcareQuality": 7.8,
-                    "educationQuality": 7.8, "costOfLiving": 65, "climateScore": 9.0,
-                    "languageBarrier": 7.5, "taxRate": 21.5, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 7.5, "jobMarket": 6.5
-                },
-                "pros": [
-                    "Excellent climate with 300+ days of sunshine annually",
-                    "Relatively low cost of living compared to Western Europe",
-                    "Beautiful coastline and natural landscapes",
-                    "Growing tech sector and startup ecosystem",
-                    "Friendly and welcoming local population",
-                    "Strategic location with easy access to Europe and Africa"
-                ],
-                "cons": [
-                    "Lower average salaries compared to Northern Europe",
-                    "Limited job opportunities in specialized fields",
-                    "Bureaucratic processes can be slow and inefficient",
-                    "Portuguese language barrier for career advancement",
-                    "Economic instability and high youth unemployment",
-                    "Infrastructure gaps in rural areas and smaller cities"
-                ]
-            },
-            {
-                "code": "CA", "name": "Canada", "flag": "🇨🇦",
-                "metrics": {
-                    "gdpPerCapita": 43241, "safetyIndex": 8.9, "healthcareQuality": 8.5,
-                    "educationQuality": 8.7, "costOfLiving": 75, "climateScore": 6.2,
-                    "languageBarrier": 2.0, "taxRate": 26, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.2, "jobMarket": 8.1
-                },
-                "pros": [
-                    "Excellent immigration programs with clear pathways to citizenship",
-                    "Universal healthcare system",
-                    "Cultural diversity and multicultural society",
-                    "High quality of life and excellent education system",
-                    "Abundant natural resources and beautiful landscapes",
-                    "Strong economy with opportunities in multiple sectors"
-                ],
-                "cons": [
-                    "Extremely cold winters in most regions",
-                    "High cost of living in major cities like Toronto and Vancouver",
-                    "Long wait times for certain medical procedures",
-                    "Competitive job market requiring Canadian experience",
-                    "Geographic isolation from family/friends in other continents",
-                    "High taxes, especially in certain provinces"
-                ]
-            },
-            {
-                "code": "AU", "name": "Australia", "flag": "🇦🇺",
-                "metrics": {
-                    "gdpPerCapita": 55060, "safetyIndex": 8.4, "healthcareQuality": 8.3,
-                    "educationQuality": 8.8, "costOfLiving": 95, "climateScore": 8.5,
-                    "languageBarrier": 1.0, "taxRate": 32, "visaDifficulty": "HIGH",
-                    "infrastructure": 8.1, "jobMarket": 7.8
-                },
-                "pros": [
-                    "Excellent climate and outdoor lifestyle opportunities",
-                    "High wages and strong job market in key sectors",
-                    "World-class universities and education system",
-                    "Universal healthcare system (Medicare)",
-                    "Cultural diversity and English-speaking environment",
-                    "Beautiful natural landscapes and beaches"
-                ],
-                "cons": [
-                    "Extremely high cost of living in major cities",
-                    "Geographic isolation from rest of the world",
-                    "Strict and expensive visa requirements",
-                    "Natural disasters (bushfires, floods, cyclones)",
-                    "Expensive domestic travel due to large distances",
-                    "Competitive job market with preference for local experience"
-                ]
-            },
-            {
-                "code": "DE", "name": "Germany", "flag": "🇩🇪",
-                "metrics": {
-                    "gdpPerCapita": 46258, "safetyIndex": 8.6, "healthcareQuality": 8.7,
-                    "educationQuality": 8.5, "costOfLiving": 82, "climateScore": 6.5,
-                    "languageBarrier": 7.0, "taxRate": 35, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.8, "jobMarket": 8.4
-                },
-                "pros": [
-                    "Strong economy with excellent job opportunities in engineering and tech",
-                    "Excellent public transportation and infrastructure",
-                    "High-quality healthcare system",
-                    "Central location in Europe for travel and business",
-                    "Strong worker protections and benefits",
-                    "Rich cultural heritage and history"
-                ],
-                "cons": [
-                    "German language is essential for career advancement",
-                    "Bureaucratic processes can be complex and slow",
-                    "Relatively high tax rates",
-                    "Weather can be gray and cold for extended periods",
-                    "Formal business culture that may seem rigid",
-                    "Paperwork-heavy administrative processes"
-                ]
-            },
-            {
-                "code": "CH", "name": "Switzerland", "flag": "🇨🇭",
-                "metrics": {
-                    "gdpPerCapita": 81867, "safetyIndex": 9.5, "healthcareQuality": 9.2,
-                    "educationQuality": 8.9, "costOfLiving": 125, "climateScore": 7.2,
-                    "languageBarrier": 6.5, "taxRate": 22, "visaDifficulty": "HIGH",
-                    "infrastructure": 9.4, "jobMarket": 8.7
-                },
-                "pros": [
-                    "Highest wages globally with excellent job opportunities",
-                    "World-class infrastructure and public transportation",
-                    "Extremely safe with very low crime rates",
-                    "Beautiful alpine landscapes and outdoor recreation",
-                    "Political stability and excellent governance",
-                    "Central European location for business and travel"
-                ],
-                "cons": [
-                    "Extremely high cost of living (highest globally)",
-                    "Very difficult visa and residency requirements for non-EU citizens",
-                    "Multiple language requirements (German, French, Italian)",
-                    "Conservative social culture with strict social norms",
-                    "Limited social integration opportunities for foreigners",
-                    "Expensive healthcare despite high quality"
-                ]
-            },
-            {
-                "code": "SG", "name": "Singapore", "flag": "🇸🇬",
-                "metrics": {
-                    "gdpPerCapita": 59797, "safetyIndex": 9.8, "healthcareQuality": 9.1,
-                    "educationQuality": 8.6, "costOfLiving": 105, "climateScore": 7.8,
-                    "languageBarrier": 2.5, "taxRate": 17, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 9.6, "jobMarket": 8.0
-                },
-                "pros": [
-                    "Extremely safe with world-class law and order",
-                    "Strategic location as gateway to Asia",
-                    "Excellent infrastructure and smart city initiatives",
-                    "Low tax rates and business-friendly environment",
-                    "Cultural diversity with English as working language",
-                    "Excellent healthcare and education systems"
-                ],
-                "cons": [
-                    "Very high cost of living, especially housing and cars",
-                    "Hot and humid tropical climate year-round",
-                    "Strict laws and regulations with heavy penalties",
-                    "High stress and competitive work environment",
-                    "Limited space and dense urban living",
-                    "Expensive to maintain Western lifestyle"
-                ]
-            },
-            {
-                "code": "NZ", "name": "New Zealand", "flag": "🇳🇿",
-                "metrics": {
-                    "gdpPerCapita": 42084, "safetyIndex": 8.8, "healthcareQuality": 8.2,
-                    "educationQuality": 8.4, "costOfLiving": 85, "climateScore": 8.2,
-                    "languageBarrier": 1.0, "taxRate": 28, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 7.8, "jobMarket": 7.5
-                },
-                "pros": [
-                    "Stunning natural beauty and outdoor lifestyle",
-                    "Clean environment and low pollution",
-                    "Friendly and welcoming culture",
-                    "Good work-life balance",
-                    "English-speaking country",
-                    "Stable political system"
-                ],
-                "cons": [
-                    "Geographic isolation from rest of the world",
-                    "Limited job market in specialized fields",
-                    "High cost of living relative to wages",
-                    "Expensive to travel internationally",
-                    "Limited cultural diversity in smaller cities",
-                    "Earthquake risk in some regions"
-                ]
-            },
-            {
-                "code": "JP", "name": "Japan", "flag": "🇯🇵",
-                "metrics": {
-                    "gdpPerCapita": 39285, "safetyIndex": 9.4, "healthcareQuality": 8.8,
-                    "educationQuality": 8.3, "costOfLiving": 92, "climateScore": 7.0,
-                    "languageBarrier": 9.0, "taxRate": 30, "visaDifficulty": "HIGH",
-                    "infrastructure": 9.2, "jobMarket": 6.8
-                },
-                "pros": [
-                    "Extremely safe society with low crime rates",
-                    "Excellent public transportation system",
-                    "Rich culture and history",
-                    "High-quality healthcare system",
-                    "Advanced technology and innovation",
-                    "Clean and organized cities"
-                ],
-                "cons": [
-                    "Very difficult language barrier",
-                    "Rigid work culture with long hours",
-                    "Expensive cost of living in major cities",
-                    "Difficult visa requirements for permanent residency",
-                    "Natural disaster risks (earthquakes, tsunamis)",
-                    "Aging population and shrinking workforce"
-                ]
-            },
-            {
-                "code": "KR", "name": "South Korea", "flag": "🇰🇷",
-                "metrics": {
-                    "gdpPerCapita": 31846, "safetyIndex": 8.2, "healthcareQuality": 8.5,
-                    "educationQuality": 8.7, "costOfLiving": 78, "climateScore": 6.8,
-                    "languageBarrier": 8.5, "taxRate": 24, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.9, "jobMarket": 7.2
-                },
-                "pros": [
-                    "Advanced technology and digital infrastructure",
-                    "Excellent healthcare system",
-                    "Strong education system",
-                    "Growing international business opportunities",
-                    "Rich cultural heritage",
-                    "Efficient public transportation"
-                ],
-                "cons": [
-                    "Intense work culture and long hours",
-                    "Language barrier for non-Korean speakers",
-                    "High competition in job market",
-                    "Air pollution in major cities",
-                    "Social pressure and conformity expectations",
-                    "Limited international community outside Seoul"
-                ]
-            },
-            {
-                "code": "IN", "name": "India", "flag": "🇮🇳",
-                "metrics": {
-                    "gdpPerCapita": 2256, "safetyIndex": 6.2, "healthcareQuality": 6.8,
-                    "educationQuality": 6.5, "costOfLiving": 25, "climateScore": 6.5,
-                    "languageBarrier": 3.0, "taxRate": 30, "visaDifficulty": "LOW",
-                    "infrastructure": 5.8, "jobMarket": 6.0
-                },
-                "pros": [
-                    "Very low cost of living",
-                    "Growing tech and startup ecosystem",
-                    "English widely spoken in business",
-                    "Rich cultural diversity and heritage",
-                    "Large domestic market opportunities",
-                    "Relatively easy visa processes"
-                ],
-                "cons": [
-                    "Significant infrastructure challenges",
-                    "Air pollution in major cities",
-                    "Income inequality and poverty",
-                    "Bureaucratic processes can be slow",
-                    "Healthcare quality varies significantly",
-                    "Traffic congestion and transportation issues"
-                ]
-            },
-            {
-                "code": "US", "name": "United States", "flag": "🇺🇸",
-                "metrics": {
-                    "gdpPerCapita": 63544, "safetyIndex": 7.8, "healthcareQuality": 8.1,
-                    "educationQuality": 8.2, "costOfLiving": 100, "climateScore": 7.5,
-                    "languageBarrier": 1.0, "taxRate": 24, "visaDifficulty": "HIGH",
-                    "infrastructure": 7.9, "jobMarket": 8.5
-                },
-                "pros": [
-                    "World's largest economy with diverse job opportunities",
-                    "Leading universities and research institutions",
-                    "Cultural diversity and entrepreneurial spirit",
-                    "High salaries in tech and professional sectors",
-                    "Innovation hub with venture capital access",
-                    "English-speaking environment"
-                ],
-                "cons": [
-                    "Very expensive healthcare system",
-                    "Complex and lengthy visa processes",
-                    "High cost of living in major cities",
-                    "Limited social safety net compared to Europe",
-                    "Gun violence and safety concerns in some areas",
-                    "Work-life balance challenges in competitive sectors"
-                ]
-            },
-            {
-                "code": "GB", "name": "United Kingdom", "flag": "🇬🇧",
-                "metrics": {
-                    "gdpPerCapita": 42330, "safetyIndex": 8.2, "healthcareQuality": 8.4,
-                    "educationQuality": 8.6, "costOfLiving": 95, "climateScore": 6.0,
-                    "languageBarrier": 1.0, "taxRate": 32, "visaDifficulty": "HIGH",
-                    "infrastructure": 8.3, "jobMarket": 7.8
-                },
-                "pros": [
-                    "English-speaking country with rich cultural heritage",
-                    "Strong financial and tech sectors",
-                    "Universal healthcare system (NHS)",
-                    "Excellent universities and education system",
-                    "Gateway to Europe for business",
-                    "Diverse and multicultural society"
-                ],
-                "cons": [
-                    "High cost of living, especially in London",
-                    "Unpredictable weather and limited sunshine",
-                    "Post-Brexit visa complications for EU citizens",
-                    "High taxes and expensive public transport",
-                    "Housing shortage and expensive property market",
-                    "NHS waiting times for non-emergency procedures"
-                ]
-            },
-            {
-                "code": "FR", "name": "France", "flag": "🇫🇷",
-                "metrics": {
-                    "gdpPerCapita": 40493, "safetyIndex": 8.0, "healthcareQuality": 9.0,
-                    "educationQuality": 8.3, "costOfLiving": 85, "climateScore": 7.8,
-                    "languageBarrier": 8.0, "taxRate": 45, "visaDifficulty": "MEDIUM",
-                    "infrastructure": 8.7, "jobMarket": 7.2
-                },
-                "pros": [
-                    "Excellent healthcare system ranked #1 globally",
-                    "Strong work-life balance with 35-hour work week",
-                    "Rich culture, cuisine, and historical heritage",
-                    "Excellent public transportation and infrastructure",
-                    "Beautiful landscapes and climate diversity",
-                    "Strong social benefits and worker protections"
-                ],
-                "cons": [
-                    "French language essential for career advancement",
-                    "Very high tax rates, especially for high earners",
-                    "Bureaucratic processes can be complex",
-                    "High unemployment rates in certain sectors",
-                    "Strikes and labor disputes can disrupt services",
-                    "Formal business culture and social hierarchies"
-                ]
-            }
-        ]
+    @property
+    def read_only(self) -> bool:
+        """Whether this fetcher serves a database it must never write"""
+        return self.mode == "ro"
 
+    def _database_uri(self) -> str:
+        """SQLite URI for the ro and memory modes"""
+        if self.mode == "ro":
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            # immutable=1 turns off locking and change detection entirely,
+            # which is only safe while nothing writes to the file
+            return f"{uri}&immutable=1" if self.immutable else uri
+        return f"file:{quote(self.db_path)}?mode=memory&cache=shared"
+
+    @asynccontextmanager
+    async def _connect(self):
+        """Open a database connection, importing aiosqlite on first use"""
+        import aiosqlite
+        if self.mode == "rw":
+            connection = aiosqlite.connect(self.db_path)
+        else:
+            uri = self._database_uri()
+            if self.mode == "memory" and self._memory_keeper is None:
+                self._memory_keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            connection = aiosqlite.connect(uri, uri=True)
+        
+        self.open_connections += 1
+        try:
+            with tracing.span("sqlite", **{"db.system": "sqlite", "db.mode": self.mode}) as span:
+                async with connection as db:
+                    if span is None:
+                        yield db
+                        return
+                    # Called on aiosqlite's thread for every statement run
+                    statements = []
+                    await db.set_trace_callback(statements.append)
+                    try:
+                        yield db
+                    finally:
+                        span.set_attribute("db.statement_count", len(statements))
+                        if statements:
+                            span.set_attribute("db.statement", statements[0][:500])
+        finally:
+            self.open_connections -= 1
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Database {self.db_path} is opened read-only")
+
+    def _load_seed_countries(self) -> List[Country]:
+        """Initial country data with comprehensive metrics, read from the seed snapshot"""
+        seed = CountrySnapshot.open(SEED_PATH)
+        logger.info(f"Loaded {len(seed)} countries from seed revision {seed.data_version}")
+        return seed.records()
+
+    def _load_seed_places(self) -> bytes:
+        """Seed regions and cities as a source document"""
+        with open(PLACES_SEED_PATH, "rb") as f:
+            return f.read()
+
+    def _merge_sources(self, bodies: List[bytes]) -> Tuple[List[Country], List[Country]]:
+        """Seed countries and places with source documents merged over them, split by level"""
+        nodes = apply_source_updates(self._load_seed_countries(), [self._load_seed_places()] + bodies)
+        countries = [node for node in nodes if SEPARATOR not in node.code]
+        places = [node for node in nodes if SEPARATOR in node.code]
+        return countries, places
+
+    @tracing.traced()
     async def initialize_database(self):
         """Initialize SQLite database with country data"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS countries (
-                    code TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    flag TEXT NOT NULL,
-                    metrics TEXT NOT NULL,
-                    pros TEXT NOT NULL,
-                    cons TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+        if self.read_only:
+            # Replicas serve the database exactly as the writer left it
+            await self.reload()
+            return
+        
+        async with self._connect() as db:
+            await self._create_schema(db)
             
             # Check if data exists
             cursor = await db.execute("SELECT COUNT(*) FROM countries")
@@ -414,69 +159,779 @@ class DataFetcher:
             
             if count[0] == 0:
                 logger.info("Initializing database with country data...")
-                await self._store_countries_data(db)
+                version = await self._bump_data_version(db)
+                countries, places = self._merge_sources([])
+                await self._store_countries_data(db, version, countries)
+                await self._store_places_data(db, places)
+                await self._store_digests(db, version, self._seed_digests())
+            else:
+                cursor = await db.execute("SELECT COUNT(*) FROM country_text")
+                indexed = await cursor.fetchone()
+                if indexed[0] == 0:
+                    logger.info("Building full-text index for existing country data...")
+                    await self._rebuild_text_index(db)
+                
+                cursor = await db.execute("SELECT COUNT(*) FROM metric_history")
+                recorded = await cursor.fetchone()
+                if recorded[0] == 0:
+                    logger.info("Recording baseline metric history for existing country data...")
+                    await self._record_history_baseline(db)
+                
+                cursor = await db.execute("SELECT COUNT(*) FROM places")
+                places = await cursor.fetchone()
+                if places[0] == 0:
+                    logger.info("Adding seed regions and cities to existing country data...")
+                    await self._store_places_data(db, self._merge_sources([])[1])
+                elif not await self._places_text_indexed(db):
+                    logger.info("Adding regions and cities to the full-text index...")
+                    await self._index_places_text(db, await self._read_places(db))
             
             await db.commit()
+        
+        await self.reload()
+
+    async def _create_schema(self, db):
+        """Create all tables and indexes that do not exist yet"""
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS countries (
+                code TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                flag TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                pros TEXT NOT NULL,
+                cons TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Single-row version counter bumped by every refresh so other
+        # worker processes can detect new data with one cheap query
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        await db.execute(
+            "INSERT OR IGNORE INTO data_version (id, version, updated_at) VALUES (1, 0, ?)",
+            (time.time(),)
+        )
+        
+        # Full-text index over pros and cons, kept in sync by _store_countries_data
+        await db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS country_text USING fts5(
+                code UNINDEXED,
+                kind UNINDEXED,
+                text,
+                tokenize = 'porter unicode61'
+            )
+        ''')
+        
+        # Append-only metric history: one row per changed value per refresh
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS metric_names (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS metric_history (
+                code TEXT NOT NULL,
+                metric_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                recorded_at INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (code, metric_id, version)
+            ) WITHOUT ROWID
+        ''')
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_metric_history_version ON metric_history (version)"
+        )
+        
+        # Digest of each upstream document as last stored, so refreshes
+        # where no source changed can be skipped
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS source_digests (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                version INTEGER NOT NULL
+            )
+        ''')
+        
+        # Regions and cities by catalog path, with only the metrics that
+        # differ from their parent; the catalog snapshot resolves the rest
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS places (
+                path TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                flag TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                pros TEXT NOT NULL,
+                cons TEXT NOT NULL
+            )
+        ''')
+        
+        # Latest run of each leader job, so every worker can report it
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS job_status (
+                name TEXT PRIMARY KEY,
+                running INTEGER NOT NULL,
+                last_started TEXT,
+                last_finished TEXT,
+                last_duration_seconds REAL,
+                last_outcome TEXT,
+                last_error TEXT
+            )
+        ''')
 
-    async def _store_countries_data(self, db):
+    async def _store_countries_data(self, db, version: int, countries: List[Country]):
         """Store country data in database"""
-        for country in self.countries_data:
+        cursor = await db.execute("SELECT code, metrics FROM countries")
+        previous = {code: json.loads(metrics) for code, metrics in await cursor.fetchall()}
+        metric_ids = await self._metric_ids(db)
+        recorded_at = int(time.time())
+        
+        for country in countries:
+            metrics = country.metrics.to_dict()
+            await self._record_metric_changes(
+                db, country.code, previous.get(country.code, {}), metrics,
+                version, recorded_at, metric_ids
+            )
             await db.execute('''
                 INSERT OR REPLACE INTO countries (code, name, flag, metrics, pros, cons)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (
-                country['code'],
-                country['name'],
-                country['flag'],
-                json.dumps(country['metrics']),
-                json.dumps(country['pros']),
-                json.dumps(country['cons'])
+                country.code,
+                country.name,
+                country.flag,
+                json.dumps(metrics),
+                json.dumps(list(country.pros)),
+                json.dumps(list(country.cons))
             ))
+            await self._index_country_text(db, country.code, country.pros, country.cons)
+
+    async def _metric_ids(self, db) -> Dict[str, int]:
+        """Map of metric name to its id in metric_names"""
+        cursor = await db.execute("SELECT name, id FROM metric_names")
+        return dict(await cursor.fetchall())
+
+    def _history_value(self, name: str, value: Any) -> Optional[float]:
+        """Encode a metric value for the REAL history column"""
+        if value is None:
+            return None
+        if name == 'visaDifficulty':
+            return float(VISA_DIFFICULTY_LEVELS.index(value)) if value in VISA_DIFFICULTY_LEVELS else None
+        return float(value)
+
+    async def _record_metric_changes(
+        self, db, code: str, old: Dict[str, Any], new: Dict[str, Any],
+        version: int, recorded_at: int, metric_ids: Dict[str, int]
+    ):
+        """Append history rows for the metrics of one country that changed"""
+        changes = []
+        for name in list(new) + [name for name in old if name not in new]:
+            old_value = self._history_value(name, old.get(name))
+            new_value = self._history_value(name, new.get(name))
+            if name in old and old_value == new_value:
+                continue
+            if name not in metric_ids:
+                cursor = await db.execute("INSERT INTO metric_names (name) VALUES (?)", (name,))
+                metric_ids[name] = cursor.lastrowid
+            changes.append((code, metric_ids[name], version, recorded_at, new_value))
+        
+        if changes:
+            await db.executemany(
+                "INSERT OR REPLACE INTO metric_history (code, metric_id, version, recorded_at, value) VALUES (?, ?, ?, ?, ?)",
+                changes
+            )
+
+    async def _record_history_baseline(self, db):
+        """Record the stored metrics as the first history entry of each series"""
+        cursor = await db.execute("SELECT version, updated_at FROM data_version WHERE id = 1")
+        version, updated_at = await cursor.fetchone()
+        metric_ids = await self._metric_ids(db)
+        cursor = await db.execute("SELECT code, metrics FROM countries")
+        for code, metrics in await cursor.fetchall():
+            await self._record_metric_changes(
+                db, code, {}, json.loads(metrics), version, int(updated_at), metric_ids
+            )
 
-    async def fetch_and_store_data(self):
-        """Fetch data from external APIs and store in database"""
+    async def _index_country_text(self, db, code: str, pros: List[str], cons: List[str]):
+        """Replace the full-text index entries of one country"""
+        await db.execute("DELETE FROM country_text WHERE code = ?", (code,))
+        await db.executemany(
+            "INSERT INTO country_text (code, kind, text) VALUES (?, ?, ?)",
+            [(code, 'pro', text) for text in pros] + [(code, 'con', text) for text in cons]
+        )
+
+    async def _rebuild_text_index(self, db):
+        """Index the pros and cons of every stored country, region and city"""
+        cursor = await db.execute("SELECT code, pros, cons FROM countries")
+        for code, pros, cons in await cursor.fetchall():
+            await self._index_country_text(db, code, json.loads(pros), json.loads(cons))
+        await self._index_places_text(db, await self._read_places(db))
+
+    async def _index_places_text(self, db, places: List[Country]):
+        """Replace the full-text index entries of all regions and cities"""
+        # Only place paths contain the separator
+        await db.execute("DELETE FROM country_text WHERE code LIKE ?", (f"%{SEPARATOR}%",))
+        await db.executemany(
+            "INSERT INTO country_text (code, kind, text) VALUES (?, ?, ?)",
+            [(place.code, 'pro', text) for place in places for text in place.pros]
+            + [(place.code, 'con', text) for place in places for text in place.cons]
+        )
+
+    async def _places_text_indexed(self, db) -> bool:
+        """Whether the index holds place text, or no stored place has any"""
+        cursor = await db.execute("SELECT 1 FROM country_text WHERE code LIKE ? LIMIT 1", (f"%{SEPARATOR}%",))
+        if await cursor.fetchone():
+            return True
+        cursor = await db.execute("SELECT 1 FROM places WHERE pros != '[]' OR cons != '[]' LIMIT 1")
+        return await cursor.fetchone() is None
+
+    async def _read_places(self, db) -> List[Country]:
+        """Stored regions and cities"""
+        cursor = await db.execute("SELECT path, name, flag, metrics, pros, cons FROM places")
+        return [self._row_to_country(row) for row in await cursor.fetchall()]
+
+    async def _store_places_data(self, db, places: List[Country]):
+        """Replace the stored regions and cities"""
+        await db.execute("DELETE FROM places")
+        await db.executemany(
+            "INSERT INTO places (path, name, flag, metrics, pros, cons) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    place.code, place.name, place.flag, json.dumps(place.metrics.to_dict()),
+                    json.dumps(list(place.pros)), json.dumps(list(place.cons))
+                )
+                for place in places
+            ]
+        )
+        await self._index_places_text(db, places)
+
+    async def _bump_data_version(self, db) -> int:
+        """Increment the shared data version inside the current transaction"""
+        await db.execute(
+            "UPDATE data_version SET version = version + 1, updated_at = ? WHERE id = 1",
+            (time.time(),)
+        )
+        cursor = await db.execute("SELECT version FROM data_version WHERE id = 1")
+        row = await cursor.fetchone()
+        return row[0]
+
+    def _seed_digests(self) -> Dict[str, str]:
+        """Digests of the seed countries and places, keyed like source URLs"""
+        return {
+            'seed': f"revision {read_snapshot_version(SEED_PATH)}",
+            'places_seed': hashlib.sha256(self._load_seed_places()).hexdigest()
+        }
+
+    async def _store_digests(self, db, version: int, digests: Dict[str, str]):
+        """Replace the stored source digests inside the current transaction"""
+        await db.execute("DELETE FROM source_digests")
+        await db.executemany(
+            "INSERT INTO source_digests (url, digest, version) VALUES (?, ?, ?)",
+            [(url, digest, version) for url, digest in digests.items()]
+        )
+
+    @tracing.traced()
+    async def fetch_and_store_data(self) -> bool:
+        """Fetch data from external sources and store in database, False if nothing changed upstream"""
+        self._check_writable()
         logger.info("Refreshing country data...")
         
-        async with aiosqlite.connect(self.db_path) as db:
-            # For now, we'll use our comprehensive static data
-            # In production, you could fetch from REST Countries API and World Bank API
-            await self._store_countries_data(db)
+        # The seed revision and seed places count as sources too, so a
+        # refresh without configured sources is skipped the same way
+        digests = self._seed_digests()
+        results = await self.ingestion.fetch_all(self.sources) if self.sources else []
+        digests.update((result.url, result.digest) for result in results)
+        async with self._connect() as db:
+            cursor = await db.execute("SELECT url, digest FROM source_digests")
+            stored = dict(await cursor.fetchall())
+        if stored == digests:
+            logger.info("Sources unchanged, skipping refresh")
+            return False
+        countries, places = self._merge_sources([result.body for result in results])
+        
+        async with self._connect() as db:
+            version = await self._bump_data_version(db)
+            await self._store_countries_data(db, version, countries)
+            await self._store_places_data(db, places)
+            await self._store_digests(db, version, digests)
             await db.commit()
         
+        await self.reload()
         logger.info("Country data refreshed successfully")
+        return True
+
+    @tracing.traced()
+    async def get_data_version(self) -> int:
+        """Get the data version currently stored in the database"""
+        async with self._connect() as db:
+            cursor = await db.execute("SELECT version FROM data_version WHERE id = 1")
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+    async def store_job_status(self, name: str, status: Dict[str, Any]):
+        """Record the state of a leader job for all workers to read"""
+        self._check_writable()
+        async with self._connect() as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO job_status (name, running, last_started, last_finished, "
+                "last_duration_seconds, last_outcome, last_error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name, int(status['running']), status['last_started'], status['last_finished'],
+                    status['last_duration_seconds'], status['last_outcome'], status['last_error']
+                )
+            )
+            await db.commit()
 
-    async def get_all_countries(self) -> List[Dict[str, Any]]:
-        """Get all countries from database"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_job_statuses(self) -> Dict[str, Dict[str, Any]]:
+        """State of each leader job as last recorded, by job name"""
+        async with self._connect() as db:
+            try:
+                cursor = await db.execute(
+                    "SELECT name, running, last_started, last_finished, last_duration_seconds, "
+                    "last_outcome, last_error FROM job_status"
+                )
+            except sqlite3.OperationalError:
+                # A read-only database written before job status was recorded
+                return {}
+            rows = await cursor.fetchall()
+        return {
+            row[0]: {
+                'running': bool(row[1]),
+                'last_started': row[2],
+                'last_finished': row[3],
+                'last_duration_seconds': row[4],
+                'last_outcome': row[5],
+                'last_error': row[6]
+            }
+            for row in rows
+        }
+
+    def _snapshot_file(self, version: int) -> str:
+        """Path of the snapshot file for one data version"""
+        return f"{self.snapshot_path}.v{version}"
+
+    def _catalog_file(self, version: int) -> str:
+        """Path of the catalog snapshot file for one data version"""
+        return f"{self.snapshot_path}.catalog.v{version}"
+
+    def _snapshots_on_disk(self, version: int) -> bool:
+        return (
+            read_snapshot_version(self._snapshot_file(version)) == version
+            and read_snapshot_version(self._catalog_file(version)) == version
+        )
+
+    @tracing.traced()
+    async def reload(self):
+        """Map the snapshots for the current data version and swap them in"""
+        version = await self.get_data_version()
+        
+        if self.mode == "memory" or (self.read_only and not self._snapshots_on_disk(version)):
+            # Nothing may be written here, so build the snapshots in memory
+            version, countries, places = await self._read_stored_data()
+            open_snapshots = functools.partial(self._build_snapshots, countries, places, version)
+        else:
+            if not self._snapshots_on_disk(version):
+                await self._export_snapshot()
+                version = await self.get_data_version()
+            open_snapshots = functools.partial(self._open_snapshots, version)
+        updated_at = await self._get_updated_at(version)
+        
+        # Building snapshots and derived structures is CPU work, so it runs
+        # off the event loop; requests keep reading the old data meanwhile
+        data = await asyncio.to_thread(self._load, open_snapshots, updated_at)
+        
+        current = self._data
+        if current is not None and current.snapshot.data_version > data.snapshot.data_version:
+            # A concurrent reload already swapped in newer data
+            return
+        # Rebinding one attribute swaps the snapshots and everything derived
+        # from them at once; the old mappings stay valid until the last
+        # reference to them is dropped
+        self._data = data
+        logger.info(f"Loaded {len(data.snapshot)} countries at data version {data.snapshot.data_version}")
+
+    def _build_snapshots(self, countries: List[Country], places: List[Country], version: int):
+        return (
+            CountrySnapshot.from_countries(countries, version),
+            CountrySnapshot.from_countries(resolve_nodes(countries, places), version)
+        )
+
+    def _open_snapshots(self, version: int):
+        return (
+            CountrySnapshot.open(self._snapshot_file(version)),
+            CountrySnapshot.open(self._catalog_file(version))
+        )
+
+    def _load(self, open_snapshots, updated_at: Optional[float]) -> LoadedData:
+        """Open or build the snapshots and warm them up; runs in a worker thread"""
+        snapshot, catalog = open_snapshots()
+        data = LoadedData(snapshot, catalog, updated_at)
+        token = _pending_load.set((self, data))
+        try:
+            self.warm_up()
+        finally:
+            _pending_load.reset(token)
+        return data
+
+    async def _get_updated_at(self, version: int) -> Optional[float]:
+        """When a data version was stored, None if it has been replaced since"""
+        async with self._connect() as db:
+            cursor = await db.execute("SELECT updated_at FROM data_version WHERE id = 1 AND version = ?", (version,))
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+    async def _read_stored_data(self) -> Tuple[int, List[Country], List[Country]]:
+        """Data version, stored countries and stored places, read consistently"""
+        async with self._connect() as db:
+            # Read the version and the rows in one transaction so they match
+            await db.execute("BEGIN")
+            cursor = await db.execute("SELECT version FROM data_version WHERE id = 1")
+            row = await cursor.fetchone()
+            version = row[0] if row else 0
             cursor = await db.execute("SELECT * FROM countries ORDER BY name")
             rows = await cursor.fetchall()
+            try:
+                cursor = await db.execute("SELECT path, name, flag, metrics, pros, cons FROM places")
+                place_rows = await cursor.fetchall()
+            except sqlite3.OperationalError:
+                # A read-only database written before places existed
+                place_rows = []
+            await db.execute("COMMIT")
+        return (
+            version,
+            [self._row_to_country(row) for row in rows],
+            [self._row_to_country(row) for row in place_rows]
+        )
+
+    async def _export_snapshot(self):
+        """Write the snapshot files for the data version currently stored"""
+        version, countries, places = await self._read_stored_data()
+        
+        await asyncio.to_thread(self._write_snapshots, version, countries, places)
+
+    def _write_snapshots(self, version: int, countries: List[Country], places: List[Country]):
+        """Write one data version's snapshot files and remove older ones; runs in a worker thread"""
+        # Each version gets its own files, so a slow writer can never
+        # overwrite a newer snapshot with older data
+        write_snapshot(self._catalog_file(version), resolve_nodes(countries, places), version)
+        write_snapshot(self._snapshot_file(version), countries, version)
+        
+        old_paths = glob.glob(f"{glob.escape(self.snapshot_path)}.v*")
+        old_paths += glob.glob(f"{glob.escape(self.snapshot_path)}.catalog.v*")
+        for old_path in old_paths:
+            old_version = old_path.rsplit(".v", 1)[-1]
+            if old_version.isdigit() and int(old_version) < version:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    @tracing.traced()
+    async def get_catalog(self) -> CountrySnapshot:
+        """Get the current catalog snapshot, loading it on first use"""
+        await self.get_snapshot()
+        return self.catalog
+
+    @tracing.traced()
+    async def get_snapshot(self) -> CountrySnapshot:
+        """Get the current snapshot, loading it on first use"""
+        if self.snapshot is None:
+            await self.reload()
+        return self.snapshot
+
+    def _current(self) -> Optional[LoadedData]:
+        """The data being warmed up in this context, else the loaded data"""
+        pending = _pending_load.get()
+        if pending is not None and pending[0] is self:
+            return pending[1]
+        return self._data
+
+    @property
+    def snapshot(self) -> Optional[CountrySnapshot]:
+        """Snapshot of the loaded countries, None before the first load"""
+        data = self._current()
+        return data.snapshot if data else None
+
+    @property
+    def catalog(self) -> Optional[CountrySnapshot]:
+        """Snapshot of the loaded countries, regions and cities, None before the first load"""
+        data = self._current()
+        return data.catalog if data else None
+
+    @property
+    def data_updated_at(self) -> Optional[float]:
+        """When the loaded data was stored, as recorded in data_version"""
+        data = self._current()
+        return data.updated_at if data else None
+
+    def get_derived(self, name: str, builder):
+        """Get a structure built from the current snapshot, once per data version"""
+        data = self._current()
+        if data is None:
+            return builder(None)
+        if name in data.derived:
+            return data.derived[name]
+        
+        # A request that finds a structure cold pays for building it
+        with tracing.span(f"build:{name}"):
+            value = builder(data.snapshot)
+        data.derived[name] = value
+        return value
+
+    def register_warm(self, name: str, builder):
+        """Build a derived structure eagerly whenever new data is loaded"""
+        self._warmers[name] = builder
+
+    @tracing.traced()
+    def warm_up(self):
+        """Build every registered derived structure for the current snapshot"""
+        for name, builder in self._warmers.items():
+            try:
+                self.get_derived(name, builder)
+            except Exception as e:
+                logger.error(f"Error building {name}: {e}")
+
+    def cold_structures(self) -> List[str]:
+        """Registered derived structures not yet built for the current snapshot"""
+        data = self._data
+        return [name for name in self._warmers if data is None or name not in data.derived]
+
+    def get_ranking_table(self):
+        """Materialized ranking table of the current snapshot, None until it is built"""
+        if not settings.RANKING_TABLE_ENABLED or self.snapshot is None or self.snapshot.path is None:
+            return None
+        return self.get_derived('ranking_table', lambda snapshot: RankingTableLoader(snapshot.path)).get()
+
+    @tracing.traced()
+    async def reload_if_changed(self) -> bool:
+        """Reload the in-memory view if another process stored newer data"""
+        version = await self.get_data_version()
+        if version == self.data_version:
+            return False
+        await self.reload()
+        return True
+
+    @property
+    def data_version(self) -> Optional[int]:
+        """Data version of the in-memory view, None before the first load"""
+        return self.snapshot.data_version if self.snapshot else None
+
+    def _row_to_country(self, row) -> Country:
+        """Convert a countries table row to a Country record"""
+        return Country(
+            row[0], row[1], row[2],
+            Metrics.from_dict(json.loads(row[3])),
+            json.loads(row[4]),
+            json.loads(row[5])
+        )
+
+    @tracing.traced()
+    async def get_country_details(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """Pros and cons of the given countries, regions or cities, skipping unknown codes"""
+        catalog = await self.get_catalog()
+        rows = [catalog.index_of(code) for code in codes]
+        return [catalog.details(row) for row in rows if row is not None]
+
+    @tracing.traced()
+    async def search_text(
+        self,
+        query: str,
+        codes: Optional[List[str]] = None,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Ranked full-text search over the pros and cons of countries, regions and cities"""
+        # Quote each word so user input cannot use FTS5 query syntax; any
+        # word may match and bm25 ranks lines that match more of them first
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        
+        sql = '''
+            SELECT code, kind, text,
+                   snippet(country_text, 2, '<mark>', '</mark>', '…', 12),
+                   bm25(country_text)
+            FROM country_text
+            WHERE country_text MATCH ?
+        '''
+        params = [match]
+        if codes:
+            sql += f" AND code IN ({', '.join('?' for _ in codes)})"
+            params.extend(codes)
+        sql += " ORDER BY bm25(country_text) LIMIT ?"
+        params.append(limit)
+        
+        async with self._connect() as db:
+            cursor = await db.execute(sql, params)
+            rows = await cursor.fetchall()
+        
+        # The catalog holds regions and cities as well as countries
+        catalog = await self.get_catalog()
+        results = []
+        for code, kind, text, snippet, rank in rows:
+            row = catalog.index_of(code)
+            country = catalog.summary(row) if row is not None else {'code': code}
+            results.append({
+                'country': country,
+                'kind': kind,
+                'text': text,
+                'snippet': snippet,
+                'rank': round(-rank, 4)
+            })
+        return results
+
+    def _decode_history_value(self, name: str, value: Optional[float]) -> Any:
+        """Turn a stored history value back into the metric's own type"""
+        if value is None:
+            return None
+        if name == 'visaDifficulty':
+            return VISA_DIFFICULTY_LEVELS[int(value)]
+        snapshot = self.snapshot
+        if snapshot and snapshot.has_metric(name) and snapshot.metric_kind(name) == KIND_INT:
+            return int(value)
+        return value
+
+    @tracing.traced()
+    async def get_metric_history(
+        self,
+        code: str,
+        metric: str,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Values of one metric over time, one point per change"""
+        async with self._connect() as db:
+            cursor = await db.execute("SELECT id FROM metric_names WHERE name = ?", (metric,))
+            row = await cursor.fetchone()
+            if not row:
+                raise ValueError(f"Unknown metric: {metric}")
+            metric_id = row[0]
             
-            countries = []
-            for row in rows:
-                countries.append({
-                    'code': row[0],
-                    'name': row[1],
-                    'flag': row[2],
-                    'metrics': json.loads(row[3]),
-                    'pros': json.loads(row[4]),
-                    'cons': json.loads(row[5])
-                })
+            points = []
+            if since is not None:
+                # The value in effect at 'since' is the last change before it
+                cursor = await db.execute('''
+                    SELECT version, recorded_at, value FROM metric_history
+                    WHERE code = ? AND metric_id = ? AND recorded_at < ?
+                    ORDER BY version DESC LIMIT 1
+                ''', (code, metric_id, since))
+                points.extend(await cursor.fetchall())
             
-            return countries
+            cursor = await db.execute('''
+                SELECT version, recorded_at, value FROM metric_history
+                WHERE code = ? AND metric_id = ? AND recorded_at >= ? AND recorded_at <= ?
+                ORDER BY version LIMIT ?
+            ''', (code, metric_id, since or 0, until if until is not None else 2 ** 62, limit))
+            points.extend(await cursor.fetchall())
+        
+        return [
+            {'version': version, 'recorded_at': recorded_at, 'value': self._decode_history_value(metric, value)}
+            for version, recorded_at, value in points
+        ]
 
-    async def get_country_by_code(self, code: str) -> Dict[str, Any]:
-        """Get specific country by code"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT * FROM countries WHERE code = ?", (code,))
-            row = await cursor.fetchone()
+    @tracing.traced()
+    async def get_changes_since(
+        self,
+        since_version: int,
+        codes: Optional[List[str]] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Every metric value that changed after the given data version"""
+        sql = '''
+            SELECT h.code, n.name, h.version, h.recorded_at, h.value,
+                   (SELECT p.value FROM metric_history p
+                    WHERE p.code = h.code AND p.metric_id = h.metric_id AND p.version < h.version
+                    ORDER BY p.version DESC LIMIT 1)
+            FROM metric_history h JOIN metric_names n ON n.id = h.metric_id
+            WHERE h.version > ?
+        '''
+        params = [since_version]
+        if codes:
+            sql += f" AND h.code IN ({', '.join('?' for _ in codes)})"
+            params.extend(codes)
+        sql += " ORDER BY h.version, h.code, n.name LIMIT ?"
+        params.append(limit)
+        
+        async with self._connect() as db:
+            cursor = await db.execute(sql, params)
+            rows = await cursor.fetchall()
+        
+        return [
+            {
+                'code': code,
+                'metric': name,
+                'version': version,
+                'recorded_at': recorded_at,
+                'value': self._decode_history_value(name, value),
+                'previous_value': self._decode_history_value(name, previous)
+            }
+            for code, name, version, recorded_at, value, previous in rows
+        ]
+
+    @tracing.traced()
+    async def export_database(self, path: str) -> int:
+        """Save the live country data to a snapshot file, returns its data version"""
+        version, countries, _ = await self._read_stored_data()
+        write_snapshot(path, countries, version)
+        return version
+
+    @tracing.traced()
+    async def import_database(self, path: str) -> int:
+        """Replace the live country data with a snapshot file as a new data version"""
+        self._check_writable()
+        countries = CountrySnapshot.open(path).records()
+        codes = [country.code for country in countries]
+        if not codes:
+            raise ValueError(f"Snapshot contains no countries: {path}")
+        
+        async with self._connect() as db:
+            await self._create_schema(db)
+            version = await self._bump_data_version(db)
+            await self._store_countries_data(db, version, countries)
+            
+            # Countries missing from the snapshot are removed, closing their history
+            cursor = await db.execute(
+                f"SELECT code, metrics FROM countries WHERE code NOT IN ({', '.join('?' for _ in codes)})",
+                codes
+            )
+            metric_ids = await self._metric_ids(db)
+            for code, metrics in await cursor.fetchall():
+                await self._record_metric_changes(
+                    db, code, json.loads(metrics), {}, version, int(time.time()), metric_ids
+                )
+                await db.execute("DELETE FROM countries WHERE code = ?", (code,))
+                await db.execute("DELETE FROM country_text WHERE code = ?", (code,))
             
-            if row:
-                return {
-                    'code': row[0],
-                    'name': row[1],
-                    'flag': row[2],
-                    'metrics': json.loads(row[3]),
-                    'pros': json.loads(row[4]),
-                    'cons': json.loads(row[5])
-                }
-            return None
\ No newline at end of file
+            # The import becomes the data the sources were last stored as, so
+            # refreshes keep it until the seed or an upstream source changes
+            cursor = await db.execute("SELECT url, digest FROM source_digests")
+            digests = {**dict(await cursor.fetchall()), **self._seed_digests()}
+            await self._store_digests(db, version, digests)
+            await db.commit()
+        
+        return version
+
+async def _run_command(args):
+    """Run an export or import command against the database"""
+    fetcher = DataFetcher(args.db)
+    if args.command == "export":
+        version = await fetcher.export_database(args.path)
+        print(f"Exported data version {version} to {args.path}")
+    else:
+        version = await fetcher.import_database(args.path)
+        print(f"Imported {args.path} as data version {version}")
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Snapshot and restore the country database")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot file to write or read")
+    parser.add_argument("--db", default=settings.DATABASE_PATH, help="SQLite database path")
+    asyncio.run(_run_command(parser.parse_args()))
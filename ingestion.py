@@ -0,0 +1,213 @@
+"""
+Conditional-request client for upstream data sources.
+
+Every response body is kept on disk with its ETag and Last-Modified, and the
+next fetch of the same URL sends them back as If-None-Match and
+If-Modified-Since. A 304 serves the cached body without downloading it again.
+Every result carries a digest of its body, which the data fetcher compares
+with the digests it last stored to decide whether anything changed.
+
+Files, one pair per URL under the cache directory:
+
+    <key>.body    response body as received
+    <key>.json    url, validators and digest of the body, written last;
+                  the entry exists once it does
+
+In offline mode nothing is requested and every fetch is served from the
+cache, for tests and air-gapped environments.
+
+Each source is a JSON document of country updates, a list or an object with
+"countries" and/or "places" lists:
+
+    [{"code": "NL", "metrics": {"gdpPerCapita": 57000}}, ...]
+
+Listed metrics and fields overwrite the seed country's; an unknown country
+code must give a complete country. Regions and cities are addressed by
+catalog path ("DE/BY/MUC") and need only a name and the metrics that differ
+from their parent.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional
+from models import Country, Metrics
+from catalog import SEPARATOR
+import tracing
+
+logger = logging.getLogger(__name__)
+
+def _cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+def _digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+class CachedResponse:
+    """A cached response body with its validators"""
+
+    __slots__ = ('url', 'body', 'etag', 'last_modified', 'digest', 'fetched_at')
+
+    def __init__(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str], fetched_at: float):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = _digest(body)
+        self.fetched_at = fetched_at
+
+class ResponseCache:
+    """Response bodies and validators on disk, keyed by URL"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{_cache_key(url)}.{suffix}")
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Cached response for a URL, None if missing or damaged"""
+        try:
+            with open(self._path(url, "json")) as f:
+                meta = json.load(f)
+            with open(self._path(url, "body"), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or meta.get('digest') != _digest(body):
+            return None
+        return CachedResponse(url, body, meta.get('etag'), meta.get('last_modified'), meta.get('fetched_at', 0.0))
+
+    def put(self, entry: CachedResponse, write_body: bool = True):
+        """Store a response; the metadata is replaced last so readers never see a mismatch"""
+        os.makedirs(self.directory, exist_ok=True)
+        if write_body:
+            body_path = self._path(entry.url, "body")
+            with open(f"{body_path}.tmp", "wb") as f:
+                f.write(entry.body)
+            os.replace(f"{body_path}.tmp", body_path)
+
+        meta = {
+            'url': entry.url,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'digest': entry.digest,
+            'fetched_at': entry.fetched_at
+        }
+        meta_path = self._path(entry.url, "json")
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+class FetchResult:
+    """Outcome of fetching one source"""
+
+    __slots__ = ('url', 'body', 'digest', 'status', 'downloaded')
+
+    def __init__(self, url: str, body: bytes, digest: str, status: Optional[int], downloaded: int):
+        self.url = url
+        self.body = body
+        self.digest = digest
+        # HTTP status, None when replayed offline
+        self.status = status
+        self.downloaded = downloaded
+
+class IngestionClient:
+    """Fetches upstream sources with conditional requests against a disk cache"""
+
+    def __init__(self, cache_dir: str, offline: bool = False, timeout: float = 30):
+        self.cache = ResponseCache(cache_dir)
+        self.offline = offline
+        self.timeout = timeout
+
+    def _replay(self, url: str) -> FetchResult:
+        cached = self.cache.get(url)
+        if cached is None:
+            raise LookupError(f"No cached response for {url} in offline mode")
+        return FetchResult(url, cached.body, cached.digest, None, 0)
+
+    async def _fetch(self, client, url: str) -> FetchResult:
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        with tracing.span("ingestion.fetch", url=url) as span:
+            response = await client.get(url, headers=headers)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+        if response.status_code == 304 and cached is not None:
+            # Servers may send fresher validators along with a 304
+            cached.etag = response.headers.get('etag', cached.etag)
+            cached.last_modified = response.headers.get('last-modified', cached.last_modified)
+            cached.fetched_at = time.time()
+            self.cache.put(cached, write_body=False)
+            return FetchResult(url, cached.body, cached.digest, 304, 0)
+        response.raise_for_status()
+
+        entry = CachedResponse(
+            url, response.content, response.headers.get('etag'),
+            response.headers.get('last-modified'), time.time()
+        )
+        self.cache.put(entry)
+        return FetchResult(url, entry.body, entry.digest, response.status_code, len(entry.body))
+
+    async def fetch_all(self, urls: List[str]) -> List[FetchResult]:
+        """Fetch every source concurrently, in the order given"""
+        if self.offline:
+            return [self._replay(url) for url in urls]
+
+        import httpx
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
+            results = await asyncio.gather(*(self._fetch(client, url) for url in urls))
+
+        logger.info(
+            f"Fetched {len(results)} sources: "
+            f"{sum(result.status == 304 for result in results)} not modified, "
+            f"{sum(result.downloaded for result in results)} bytes downloaded"
+        )
+        return results
+
+def _source_countries(document: Any) -> List[Dict[str, Any]]:
+    if isinstance(document, dict):
+        document = (document.get('countries') or []) + (document.get('places') or [])
+    if not isinstance(document, list):
+        raise ValueError("A source must be a list of countries or an object with 'countries' or 'places' lists")
+    return document
+
+def _new_node(update: Dict[str, Any]) -> Country:
+    if SEPARATOR not in update['code']:
+        return Country.from_dict(update)
+    # Places inherit everything they leave out from their parent
+    return Country(
+        update['code'], update['name'], update.get('flag', ""),
+        Metrics.from_dict(update.get('metrics') or {}),
+        update.get('pros', ()), update.get('cons', ())
+    )
+
+def apply_source_updates(countries: List[Country], bodies: List[bytes]) -> List[Country]:
+    """Merge source documents, in order, over a list of country and place records"""
+    by_code = {country.code: country for country in countries}
+    for body in bodies:
+        for update in _source_countries(json.loads(body)):
+            code = update.get('code')
+            country = by_code.get(code)
+            if country is None:
+                by_code[code] = _new_node(update)
+                continue
+
+            for name, value in (update.get('metrics') or {}).items():
+                country.metrics.set(name, value)
+            for field in ('name', 'flag'):
+                if field in update:
+                    setattr(country, field, update[field])
+            for field in ('pros', 'cons'):
+                if field in update:
+                    setattr(country, field, tuple(update[field]))
+    return list(by_code.values())
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from migration_analyzer import MigrationAnalyzer
+
+logger = logging.getLogger(__name__)
+
+_active_sessions = 0
+
+def parse_weights(weights: Any) -> Dict[str, float]:
+    """Preference weights of a message as floats; ValueError if malformed"""
+    if not isinstance(weights, dict):
+        raise ValueError("weights must be an object of preference: value")
+    parsed = {}
+    for name, value in weights.items():
+        try:
+            parsed[str(name)] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Weight for {name} must be a number")
+    return parsed
+
+class RankingSession:
+    """Targets, profession, visa type and weights held for one connection"""
+
+    def __init__(self, analyzer: MigrationAnalyzer):
+        self.analyzer = analyzer
+        self.target_countries: Optional[List[str]] = None
+        self.current_country = None
+        self.profession = None
+        self.visa_type = "Work Visa"
+        self.preferences: Dict[str, float] = {}
+        # code -> (rank, score) as last sent to the client
+        self._sent: Dict[str, tuple] = {}
+
+    def configure(self, message: Dict[str, Any]):
+        """Start over with the targets and settings of an init message
+
+        Everything is validated before anything is set, so a bad init leaves
+        the previous session as it was.
+        """
+        targets = message.get('target_countries')
+        if not isinstance(targets, list) or not targets:
+            raise ValueError("init needs a non-empty target_countries list")
+        preferences = parse_weights(message.get('preferences', {}))
+        self.target_countries = [str(code) for code in targets]
+        self.current_country = message.get('current_country')
+        self.profession = message.get('profession')
+        self.visa_type = message.get('visa_type', "Work Visa")
+        self.preferences = preferences
+        self._sent = {}
+
+    def apply(self, weights: Dict[str, Any]):
+        """Overwrite the preference weights named in a delta, all or none"""
+        self.preferences.update(parse_weights(weights))
+
+    async def changes(self) -> List[Dict[str, Any]]:
+        """Re-rank and return only the countries whose rank or score moved"""
+        results = await self.analyzer.analyze_migration(
+            current_country=self.current_country,
+            target_countries=self.target_countries,
+            profession=self.profession,
+            visa_type=self.visa_type,
+            preferences=self.preferences,
+            detail="lean"
+        )
+        ranking = {result['code']: (rank, result['score']) for rank, result in enumerate(results, 1)}
+        changed = [
+            {'code': code, 'rank': rank, 'score': score}
+            for code, (rank, score) in ranking.items()
+            if self._sent.get(code) != (rank, score)
+        ]
+        self._sent = ranking
+        return changed
+
+    async def handle(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a batch of coalesced messages and build the reply"""
+        if 'init' in batch:
+            self.configure(batch['init'])
+        if self.target_countries is None:
+            raise ValueError("Send an init message first")
+        self.apply(batch.get('weights', {}))
+        return {'type': 'update', 'seq': batch.get('seq'), 'changes': await self.changes()}
+
+async def serve(websocket: WebSocket, session: RankingSession):
+    """Run one live-ranking connection until the client goes away
+
+    Messages are read on their own task and merged into a single pending
+    batch, so however fast a client sends, at most one update is waiting
+    and every reply reflects the latest weights. Malformed messages are
+    answered with an error each and never discard the valid ones.
+    """
+    global _active_sessions
+    pending: Dict[str, Any] = {}
+    errors: List[Dict[str, Any]] = []
+    ready = asyncio.Event()
+
+    def reject(message: Dict[str, Any], detail: str):
+        errors.append({'type': 'error', 'seq': message.get('seq'), 'detail': detail})
+        ready.set()
+
+    async def receive():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                message = None
+            if not isinstance(message, dict):
+                message = {'type': None}
+            kind = message.get('type')
+            if kind == 'init':
+                # A new session supersedes anything not yet applied
+                pending.clear()
+                pending['init'] = message
+            elif kind == 'delta':
+                try:
+                    weights = parse_weights(message.get('weights', {}))
+                except ValueError as e:
+                    reject(message, str(e))
+                    continue
+                pending.setdefault('weights', {}).update(weights)
+            else:
+                reject(message, f"Unknown message type: {kind}")
+                continue
+            if 'seq' in message:
+                pending['seq'] = message['seq']
+            ready.set()
+
+    _active_sessions += 1
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            waiter = asyncio.ensure_future(ready.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if not ready.is_set():
+                break
+            ready.clear()
+            batch = dict(pending)
+            pending.clear()
+            rejected = list(errors)
+            errors.clear()
+
+            for reply in rejected:
+                await websocket.send_json(reply)
+            if not batch:
+                continue
+            try:
+                reply = await session.handle(batch)
+            except (ValueError, TypeError) as e:
+                reply = {'type': 'error', 'seq': batch.get('seq'), 'detail': str(e)}
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _active_sessions -= 1
+        receiver.cancel()
+        try:
+            await receiver
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            pass
+        except Exception as e:
+            logger.warning(f"Live ranking connection closed: {e}")
+
+def metrics() -> Dict[str, Any]:
+    """Open live-ranking connections in this worker"""
+    return {'active_sessions': _active_sessions}
@@ -1,16 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response, WebSocket
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import sqlite3
-import json
-import asyncio
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict
 from contextlib import asynccontextmanager
-from scheduler import start_scheduler
 from data_fetcher import DataFetcher
 from migration_analyzer import MigrationAnalyzer
+from adjustments import PROFESSIONS, VISA_TYPES
+from admission import AdmissionController, AdmissionRejected, route_priority
+from singleflight import SingleFlight, canonical_key
+import live_ranking
+from sensitivity import MAX_GRID_STEPS
+import schemas
+import settings
+import tracing
+import asyncio
+import time
 
 # Pydantic models
 class AnalysisRequest(BaseModel):
@@ -19,14 +25,53 @@ class AnalysisRequest(BaseModel):
     profession: Optional[str] = None
     visa_type: str = "Work Visa"
     preferences: Dict[str, float]
+    detail: str = "full"
+    level: Optional[str] = None
+    limit: Optional[int] = None
+
+class SensitivityRequest(BaseModel):
+    target_countries: Optional[List[str]] = None
+    profession: Optional[str] = None
+    visa_type: str = "Work Visa"
+    preferences: Dict[str, float]
+    mode: str = "monte_carlo"
+    samples: int = 2000
+    spread: int = 2
+    grid_steps: int = Field(4, ge=2, le=MAX_GRID_STEPS)
+    top_k: int = 3
+    seed: Optional[int] = None
+    budget_ms: float = 250
 
-class Country(BaseModel):
-    code: str
-    name: str
-    flag: str
-    metrics: Dict[str, Any]
-    pros: List[str]
-    cons: List[str]
+def _split_list(value: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated query parameter"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _parse_weights(value: Optional[str]) -> Optional[Dict[str, float]]:
+    """Parse a 'metric:weight,metric:weight' query parameter"""
+    items = _split_list(value)
+    if not items:
+        return None
+    weights = {}
+    for item in items:
+        name, _, weight = item.partition(":")
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
+
+# Pros and cons only change on a data refresh, so clients may reuse them for a while
+DETAILS_MAX_AGE_SECONDS = 300
+
+def _cache_headers() -> Dict[str, str]:
+    """Caching headers for responses that only change with the data version"""
+    return {
+        "ETag": f'"v{data_fetcher.data_version}"',
+        "Cache-Control": f"public, max-age={DETAILS_MAX_AGE_SECONDS}"
+    }
+
+def _countries_body(snapshot) -> bytes:
+    """The country list only changes with the data version, so it is serialized once per version"""
+    return schemas.to_json(schemas.CountryListResponse, {"countries": snapshot.countries()})
 
 # Global variables
 data_fetcher = None
@@ -36,17 +81,22 @@ migration_analyzer = None
 async def lifespan(app: FastAPI):
     # Startup
     global data_fetcher, migration_analyzer
+    # APScheduler is only needed once the app starts, not at import time
+    from scheduler import start_scheduler, stop_scheduler
     data_fetcher = DataFetcher()
-    migration_analyzer = MigrationAnalyzer()
+    migration_analyzer = MigrationAnalyzer(data_fetcher)
+    data_fetcher.register_warm('countries_json', _countries_body)
     
-    # Initialize database and start scheduler
+    # Initialize database and start scheduler; only one worker process
+    # becomes the refresh leader, the others hot-reload its data
     await data_fetcher.initialize_database()
     start_scheduler(data_fetcher)
     
     yield
     
     # Shutdown
-    pass
+    stop_scheduler()
+    await asyncio.to_thread(tracing.exporter.shutdown)
 
 app = FastAPI(
     title="Global Relocation Analyzer API",
@@ -55,72 +105,365 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Bounded concurrency with load shedding in front of the API routes
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENCY,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+
+# Identical analyses arriving together share one computation
+analysis_flights = SingleFlight()
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    priority = route_priority(request.url.path)
+    if priority is None:
+        return await call_next(request)
+    try:
+        async with admission.admit(priority):
+            return await call_next(request)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Registered last, so the trace includes time spent waiting for admission
+    with tracing.start_trace(
+        f"{request.method} {request.url.path}", request.headers.get("traceparent"), tracing.KIND_SERVER
+    ) as span:
+        response = await call_next(request)
+        if span is None:
+            return response
+        route = request.scope.get("route")
+        if route is not None:
+            # The route template keeps span names few, unlike raw paths
+            span.name = f"{request.method} {route.path}"
+        span.set_attribute("http.method", request.method)
+        span.set_attribute("http.target", request.url.path)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f"HTTP {response.status_code}")
+        response.headers["traceparent"] = span.traceparent
+        return response
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+templates = None
+
+def _get_templates():
+    """Create the Jinja2 environment on the first page render"""
+    global templates
+    if templates is None:
+        from fastapi.templating import Jinja2Templates
+        templates = Jinja2Templates(directory="templates")
+    return templates
 
 @app.get("/")
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _get_templates().TemplateResponse("index.html", {"request": request})
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "message": "Global Relocation Analyzer API is running"}
 
-@app.get("/api/countries")
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 503 until data is loaded and precomputations are warm"""
+    # Started by the lifespan, so APScheduler is already imported here
+    import scheduler
+    snapshot = data_fetcher.snapshot
+    cold = data_fetcher.cold_structures()
+    load = admission.metrics()
+    saturated = (
+        load['active'] >= load['max_concurrency'] and load['queue_depth'] >= load['max_queue']
+    )
+    checks = {
+        "data_loaded": snapshot is not None and len(snapshot) > 0,
+        "precomputations_warm": not cold,
+        "accepting_requests": not saturated
+    }
+    
+    updated_at = data_fetcher.data_updated_at
+    jobs = await scheduler.stored_job_statuses(data_fetcher)
+    if scheduler.is_leader():
+        role = "leader"
+    elif data_fetcher.read_only:
+        role = "replica"
+    else:
+        role = "follower"
+    
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "checks": checks,
+            "data": {
+                "data_version": data_fetcher.data_version,
+                "countries": len(snapshot) if snapshot is not None else 0,
+                "updated_at": updated_at,
+                "age_seconds": round(time.time() - updated_at, 1) if updated_at else None,
+                "cold_precomputations": cold
+            },
+            "refresh": {
+                "role": role,
+                "last_refresh": jobs[scheduler.refresh_status.name],
+                "ranking_table_build": jobs[scheduler.ranking_build_status.name]
+            },
+            "pools": {
+                "admission": {
+                    "active": load['active'],
+                    "max_concurrency": load['max_concurrency'],
+                    "utilization": round(load['active'] / load['max_concurrency'], 3),
+                    "queue_depth": load['queue_depth'],
+                    "max_queue": load['max_queue'],
+                    "queue_utilization": round(load['queue_depth'] / load['max_queue'], 3) if load['max_queue'] else None
+                },
+                "database": {
+                    "mode": data_fetcher.mode,
+                    "open_connections": data_fetcher.open_connections
+                },
+                "live_ranking": live_ranking.metrics(),
+                "singleflight": analysis_flights.metrics()
+            }
+        }
+    )
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "admission": admission.metrics(),
+        "singleflight": analysis_flights.metrics(),
+        "live_ranking": live_ranking.metrics(),
+        "tracing": tracing.exporter.metrics()
+    }
+
+@app.get("/api/countries", response_model=schemas.CountryListResponse)
 async def get_countries():
     try:
-        countries = await data_fetcher.get_all_countries()
-        return {"countries": countries}
+        await data_fetcher.get_snapshot()
+        return schemas.JSONBytesResponse(data_fetcher.get_derived('countries_json', _countries_body))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/countries/{code}/details")
+async def get_country_details(code: str, request: Request, response: Response):
+    try:
+        # Names and aliases are accepted as well as codes
+        match = (await migration_analyzer.resolve([code]))[0]
+        details = await data_fetcher.get_country_details([match["code"] if match else code])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not details:
+        raise HTTPException(status_code=404, detail=f"Country not found: {code}")
+    headers = _cache_headers()
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return details[0]
+
+@app.get("/api/details")
+async def get_bulk_details(request: Request, response: Response, codes: Optional[str] = None):
+    try:
+        codes = _split_list(codes)
+        if codes is None:
+            snapshot = await data_fetcher.get_snapshot()
+            codes = snapshot.codes
+        details = await data_fetcher.get_country_details(codes)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    headers = _cache_headers()
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"details": details}
+
+@app.get("/api/search")
+async def search_countries(q: str, codes: Optional[str] = None, limit: int = 20):
+    try:
+        results = await data_fetcher.search_text(q, _split_list(codes), limit)
+        return {"results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/history/{code}/{metric}")
+async def get_metric_history(
+    code: str,
+    metric: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    limit: int = 1000
+):
+    try:
+        points = await data_fetcher.get_metric_history(code, metric, since, until, min(limit, 10000))
+        return {"code": code, "metric": metric, "points": points}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/changes")
+async def get_changes(since_version: int = 0, codes: Optional[str] = None, limit: int = 1000):
+    try:
+        changes = await data_fetcher.get_changes_since(since_version, _split_list(codes), min(limit, 10000))
+        return {"data_version": data_fetcher.data_version, "changes": changes}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/professions")
 async def get_professions():
-    professions = [
-        "Software Engineer", "Data Scientist", "Product Manager", "Marketing Manager",
-        "Financial Analyst", "Mechanical Engineer", "Registered Nurse", "Teacher",
-        "Graphic Designer", "Sales Manager", "Consultant", "Researcher",
-        "Project Manager", "Business Analyst", "UX/UI Designer", "Operations Manager",
-        "HR Manager", "Accountant", "Civil Engineer", "Healthcare Professional",
-        "Doctor", "Lawyer", "Architect", "Chef", "Pharmacist"
-    ]
-    return {"professions": professions}
+    return {"professions": PROFESSIONS}
 
 @app.get("/api/visa-types")
 async def get_visa_types():
-    visa_types = [
-        "Work Visa", "Student Visa", "Investment Visa", "Family Reunification",
-        "Skilled Migrant Visa", "Startup Visa", "Freelancer Visa", "Tourist Visa"
-    ]
-    return {"visa_types": visa_types}
+    return {"visa_types": VISA_TYPES}
 
-@app.post("/api/analyze")
+@app.post("/api/analyze", response_model=schemas.AnalysisResponse)
 async def analyze_migration(request: AnalysisRequest):
     try:
-        results = await migration_analyzer.analyze_migration(
-            current_country=request.current_country,
+        # Target order does not change the ranking, so it is not part of the key
+        key = canonical_key({
+            "current_country": request.current_country,
+            "target_countries": sorted(request.target_countries),
+            "profession": request.profession,
+            "visa_type": request.visa_type,
+            "preferences": {name: float(value) for name, value in request.preferences.items()},
+            "detail": request.detail,
+            "level": request.level,
+            "limit": request.limit,
+            "data_version": data_fetcher.data_version
+        })
+        
+        async def analyze():
+            results = await migration_analyzer.analyze_migration(
+                current_country=request.current_country,
+                target_countries=request.target_countries,
+                profession=request.profession,
+                visa_type=request.visa_type,
+                preferences=request.preferences,
+                detail=request.detail,
+                level=request.level,
+                limit=request.limit
+            )
+            return schemas.to_json(schemas.AnalysisResponse, {"results": results})
+        
+        # Coalesced callers share the serialized body too
+        return schemas.JSONBytesResponse(await analysis_flights.do(key, analyze))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/catalog")
+async def list_catalog(within: Optional[str] = None, level: Optional[str] = None, limit: int = 1000):
+    try:
+        nodes = await migration_analyzer.catalog_nodes(within, level, min(limit, 10000))
+        return {"nodes": nodes}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/catalog/{path:path}")
+async def get_catalog_node(path: str):
+    try:
+        node = await migration_analyzer.catalog_node(path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Catalog node not found: {path}")
+    return node
+
+@app.get("/api/resolve")
+async def resolve_countries(q: str):
+    try:
+        queries = _split_list(q) or []
+        matches = await migration_analyzer.resolve(queries)
+        return {"resolved": [{"query": query, "match": match} for query, match in zip(queries, matches)]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/autocomplete")
+async def autocomplete_countries(q: str, limit: int = 10, level: Optional[str] = None):
+    try:
+        return {"suggestions": await migration_analyzer.autocomplete(q, min(limit, 100), level)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/ws/rank")
+async def live_rank(websocket: WebSocket):
+    await websocket.accept()
+    await live_ranking.serve(websocket, live_ranking.RankingSession(migration_analyzer))
+
+@app.post("/api/sensitivity")
+async def analyze_sensitivity(request: SensitivityRequest):
+    try:
+        sensitivity = await migration_analyzer.analyze_sensitivity(
             target_countries=request.target_countries,
+            preferences=request.preferences,
             profession=request.profession,
             visa_type=request.visa_type,
-            preferences=request.preferences
+            mode=request.mode,
+            samples=request.samples,
+            spread=request.spread,
+            grid_steps=request.grid_steps,
+            top_k=request.top_k,
+            seed=request.seed,
+            budget_ms=request.budget_ms
         )
-        return {"results": results}
+        return {"sensitivity": sensitivity}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/compare/{source}/{target}")
+@app.get("/api/compare/{source}/{target}", response_model=schemas.ComparisonResponse)
 async def compare_countries(source: str, target: str):
     try:
         comparison = await migration_analyzer.compare_countries(source, target)
-        return {"comparison": comparison}
+        return schemas.JSONBytesResponse(schemas.to_json(schemas.ComparisonResponse, {"comparison": comparison}))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/compare/{source}", response_model=schemas.ManyComparisonResponse)
+async def compare_with_many(source: str, targets: Optional[str] = None):
+    try:
+        comparison = await migration_analyzer.compare_with_many(source, _split_list(targets))
+        return schemas.JSONBytesResponse(schemas.to_json(schemas.ManyComparisonResponse, {"comparison": comparison}))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/compare-matrix/{metric}")
+async def compare_matrix(metric: str, codes: Optional[str] = None):
+    try:
+        matrix = await migration_analyzer.metric_matrix(metric, _split_list(codes))
+        return {"matrix": matrix}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/similar/{code}")
+async def find_similar(
+    code: str,
+    k: Optional[int] = None,
+    radius: Optional[float] = None,
+    weights: Optional[str] = None
+):
+    try:
+        similar = await migration_analyzer.find_similar(code, k=k, radius=radius, weights=_parse_weights(weights))
+        return {"similar": similar}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/skyline")
+async def get_skyline(metrics: Optional[str] = None, preset: Optional[str] = None):
+    try:
+        skyline = await migration_analyzer.skyline(_split_list(metrics), preset)
+        return {"skyline": skyline}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/refresh-data")
 async def refresh_data():
     try:
-        await data_fetcher.fetch_and_store_data()
+        if not await data_fetcher.fetch_and_store_data():
+            return {"message": "Upstream data unchanged, nothing to refresh"}
         return {"message": "Data refreshed successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
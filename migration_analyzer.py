@@ -1,151 +1,329 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from data_fetcher import DataFetcher
-import math
+from comparison import ComparisonMatrix
+from similarity import SimilarityIndex
+from skyline import Skyline, DEFAULT_SKYLINES, parse_criteria
+from scoring import ScoringTable, RECOMMENDATION_LEVELS, RECOMMENDATION_THRESHOLDS
+from adjustments import AdjustmentTables
+from sensitivity import run_sensitivity
+from catalog import CatalogIndex, is_catalog_target
+from resolver import ResolverIndex
+import tracing
+import numpy as np
+from bisect import bisect_right
+
+def _skyline_builder(criteria):
+    return lambda snapshot: Skyline(snapshot, criteria).to_dict()
 
 class MigrationAnalyzer:
-    def __init__(self):
-        self.data_fetcher = DataFetcher()
-
-    def _normalize_metric(self, value: float, min_val: float, max_val: float) -> float:
-        """Normalize metric to 0-10 scale"""
-        if max_val == min_val:
-            return 5.0
-        normalized = ((value - min_val) / (max_val - min_val)) * 10
-        return max(0, min(10, normalized))
-
-    def _calculate_economic_score(self, metrics: Dict[str, Any]) -> float:
-        """Calculate economic opportunities score"""
-        gdp_score = self._normalize_metric(metrics['gdpPerCapita'], 2000, 85000)
-        job_score = metrics['jobMarket']
-        tax_penalty = (100 - metrics['taxRate']) / 10  # Lower tax = higher score
-        
-        return (gdp_score * 0.4 + job_score * 0.4 + tax_penalty * 0.2)
-
-    def _calculate_quality_score(self, metrics: Dict[str, Any]) -> float:
-        """Calculate quality of life score"""
-        healthcare = metrics['healthcareQuality']
-        education = metrics['educationQuality']
-        infrastructure = metrics['infrastructure']
-        cost_penalty = (150 - metrics['costOfLiving']) / 15  # Lower cost = higher score
-        
-        return (healthcare * 0.3 + education * 0.2 + infrastructure * 0.3 + cost_penalty * 0.2)
-
-    def _calculate_migration_score(self, country: Dict[str, Any], preferences: Dict[str, float]) -> float:
-        """Calculate overall migration score based on user preferences"""
-        metrics = country['metrics']
-        
-        # Calculate component scores
-        economic_score = self._calculate_economic_score(metrics)
-        quality_score = self._calculate_quality_score(metrics)
-        safety_score = metrics['safetyIndex']
-        healthcare_score = metrics['healthcareQuality']
-        climate_score = metrics['climateScore']
-        
-        # Apply user preference weights (normalize to 0-1)
-        weights = {k: v / 10 for k, v in preferences.items()}
-        
-        # Calculate weighted score
-        weighted_score = (
-            economic_score * weights.get('economicOpportunities', 0.7) +
-            quality_score * weights.get('qualityOfLife', 0.8) +
-            safety_score * weights.get('safetyAndSecurity', 0.6) +
-            healthcare_score * weights.get('healthcareQuality', 0.7) +
-            climate_score * weights.get('climateSuitability', 0.5)
-        ) / sum(weights.values())
-        
-        # Apply visa difficulty penalty
-        visa_penalties = {'LOW': 0, 'MEDIUM': -0.5, 'HIGH': -1.0}
-        visa_penalty = visa_penalties.get(metrics['visaDifficulty'], -0.5)
-        
-        # Apply language barrier penalty
-        language_penalty = -metrics['languageBarrier'] * 0.1
-        
-        final_score = weighted_score + visa_penalty + language_penalty
-        return max(0, min(10, final_score))
+    def __init__(self, data_fetcher: Optional[DataFetcher] = None):
+        # Share the caller's fetcher so both see the same in-memory data
+        self.data_fetcher = data_fetcher or DataFetcher()
+        # Build the shared precomputations on every reload rather than on
+        # the first request that needs them
+        self.data_fetcher.register_warm('scoring_table', ScoringTable)
+        self.data_fetcher.register_warm('adjustment_tables', AdjustmentTables)
+        self.data_fetcher.register_warm('comparison_matrix', ComparisonMatrix)
+        self.data_fetcher.register_warm('similarity_index', SimilarityIndex)
+        for name, criteria in DEFAULT_SKYLINES.items():
+            self.data_fetcher.register_warm(f'skyline:{name}', _skyline_builder(criteria))
+        self.data_fetcher.register_warm('catalog_index', self._build_catalog_index)
+        self.data_fetcher.register_warm('catalog_scoring_table', self._build_catalog_scoring_table)
+        self.data_fetcher.register_warm('catalog_adjustment_tables', self._build_catalog_adjustments)
+        self.data_fetcher.register_warm('resolver_index', self._build_resolver_index)
+
+    # The catalog is swapped together with the snapshot, so catalog structures
+    # are cached against the snapshot like everything else
+    def _build_catalog_index(self, snapshot) -> CatalogIndex:
+        return CatalogIndex(self.data_fetcher.catalog)
+
+    def _build_catalog_scoring_table(self, snapshot) -> ScoringTable:
+        return ScoringTable(self.data_fetcher.catalog)
+
+    def _build_catalog_adjustments(self, snapshot) -> AdjustmentTables:
+        index = self.data_fetcher.get_derived('catalog_index', self._build_catalog_index)
+        return AdjustmentTables(index.snapshot, index.country)
+
+    def _build_resolver_index(self, snapshot) -> ResolverIndex:
+        return ResolverIndex(self.data_fetcher.get_derived('catalog_index', self._build_catalog_index))
 
     def _get_recommendation(self, score: float) -> str:
         """Get recommendation based on score"""
-        if score >= 8.5:
-            return "Strongly recommended"
-        elif score >= 7.0:
-            return "Recommended"
-        elif score >= 5.5:
-            return "Consider with caution"
-        else:
-            return "Not recommended"
+        return RECOMMENDATION_LEVELS[bisect_right(RECOMMENDATION_THRESHOLDS, score)]
 
+    @tracing.traced()
     async def analyze_migration(
         self,
         current_country: Optional[str],
         target_countries: List[str],
         profession: Optional[str],
         visa_type: str,
-        preferences: Dict[str, float]
+        preferences: Dict[str, float],
+        detail: str = "full",
+        level: Optional[str] = None,
+        limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Analyze migration options and return ranked results"""
-        
-        results = []
+        """Analyze migration options and return ranked results
+
+        With detail="lean" each result carries only the country code instead
+        of the full country; pros and cons are served by the details endpoints.
+
+        Targets may also be catalog paths ("DE/BY/MUC") and groups ("EU");
+        a level ("region", "city") expands each target to its descendants at
+        that level. limit keeps only the best results.
+        """
+        if detail not in ("full", "lean"):
+            raise ValueError(f"Unknown detail level: {detail}")
         
-        for country_code in target_countries:
-            country = await self.data_fetcher.get_country_by_code(country_code)
-            if not country:
-                continue
-            
-            # Calculate migration score
-            score = self._calculate_migration_score(country, preferences)
-            
-            # Get recommendation
-            recommendation = self._get_recommendation(score)
+        await self.data_fetcher.get_snapshot()
+        # Names, aliases and any-case codes become codes; unresolved targets
+        # stay as given, so groups still expand and unknown codes are skipped
+        resolver = self.data_fetcher.get_derived('resolver_index', self._build_resolver_index)
+        target_countries = [
+            code or target for code, target in zip(resolver.resolve(target_countries), target_countries)
+        ]
+        ranked = None
+        if level is not None or any(is_catalog_target(code) for code in target_countries):
+            index = self.data_fetcher.get_derived('catalog_index', self._build_catalog_index)
+            table = self.data_fetcher.get_derived('catalog_scoring_table', self._build_catalog_scoring_table)
+            adjustments = self.data_fetcher.get_derived('catalog_adjustment_tables', self._build_catalog_adjustments)
+            snapshot = table.snapshot
+            rows = index.resolve(target_countries, level)
+        else:
+            table = self.data_fetcher.get_derived('scoring_table', ScoringTable)
+            adjustments = self.data_fetcher.get_derived('adjustment_tables', AdjustmentTables)
+            snapshot = table.snapshot
             
-            # Calculate component scores for display
-            economic_score = self._calculate_economic_score(country['metrics'])
-            quality_score = self._calculate_quality_score(country['metrics'])
-            safety_score = country['metrics']['safetyIndex']
+            # Unknown codes are skipped rather than failing the whole analysis
+            rows = [snapshot.index_of(code) for code in target_countries]
+            rows = np.array([row for row in rows if row is not None], dtype=np.intp)
             
+            if profession not in adjustments.profession_index:
+                ranked = self._lookup_ranking(rows, preferences, visa_type)
+        
+        if ranked is not None:
+            rounded, recommendations = ranked
+            components = table.components_for(rows)
+        else:
+            # Profession and visa type become one array lookup per candidate
+            job_multiplier, visa_penalty = adjustments.lookup(rows, profession, visa_type)
+            scores, components = table.score(rows, preferences, job_multiplier, visa_penalty)
+            rounded = [round(float(score), 1) for score in scores]
+            recommendations = [self._get_recommendation(float(score)) for score in scores]
+        
+        # Sort by score (highest first); the sort is stable, so ties keep target order
+        order = sorted(range(len(rows)), key=lambda i: rounded[i], reverse=True)
+        if limit is not None:
+            order = order[:max(0, limit)]
+        
+        results = []
+        for i in order:
+            row = rows[i]
+            if detail == "lean":
+                identity = {'code': snapshot.codes[row]}
+            else:
+                identity = {'country': snapshot.country(int(row))}
             results.append({
-                'country': country,
-                'score': round(score, 1),
-                'recommendation': recommendation,
+                **identity,
+                'score': rounded[i],
+                'recommendation': recommendations[i],
                 'component_scores': {
-                    'economic': round(economic_score, 1),
-                    'quality': round(quality_score, 1),
-                    'safety': round(safety_score, 1)
+                    'economic': round(float(components[i, 0]), 1),
+                    'quality': round(float(components[i, 1]), 1),
+                    'safety': round(float(components[i, 2]), 1)
                 }
             })
         
-        # Sort by score (highest first)
-        results.sort(key=lambda x: x['score'], reverse=True)
-        
         return results
 
+    def _lookup_ranking(
+        self, rows: np.ndarray, preferences: Dict[str, float], visa_type: str
+    ) -> Optional[Tuple[List[float], List[str]]]:
+        """Rounded scores and recommendations of rows from the ranking table
+
+        None when the table is not built, does not cover the preferences, or
+        does not list every requested row among its top entries.
+        """
+        ranking = self.data_fetcher.get_ranking_table()
+        if ranking is None:
+            return None
+        hit = ranking.lookup(preferences, visa_type)
+        if hit is None:
+            return None
+        
+        top_rows, scores, levels = hit
+        position = {int(row): i for i, row in enumerate(top_rows)}
+        positions = [position.get(int(row)) for row in rows]
+        if None in positions:
+            return None
+        return (
+            [float(scores[p]) for p in positions],
+            [RECOMMENDATION_LEVELS[levels[p]] for p in positions]
+        )
+
+    def _lookup_rows(self, snapshot, codes: Optional[List[str]]) -> np.ndarray:
+        """Snapshot row indices for codes, or every row when codes is None"""
+        if codes is None:
+            return np.arange(len(snapshot))
+        
+        rows = [snapshot.index_of(code) for code in codes]
+        missing = [code for code, row in zip(codes, rows) if row is None]
+        if missing:
+            raise ValueError(f"Countries not found: {', '.join(missing)}")
+        return np.array(rows, dtype=np.intp)
+
+    @tracing.traced()
+    async def catalog_node(self, path: str) -> Optional[Dict[str, Any]]:
+        """A catalog node with its ancestors, children and subtree aggregates"""
+        await self.data_fetcher.get_snapshot()
+        index = self.data_fetcher.get_derived('catalog_index', self._build_catalog_index)
+        return index.node(path)
+
+    @tracing.traced()
+    async def catalog_nodes(
+        self, within: Optional[str] = None, level: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Catalog nodes at a level, optionally inside one path or group, ordered by path"""
+        await self.data_fetcher.get_snapshot()
+        index = self.data_fetcher.get_derived('catalog_index', self._build_catalog_index)
+        rows = index.nodes(within, level)
+        if limit is not None:
+            rows = rows[:max(0, limit)]
+        return [index.summary(int(row)) for row in rows]
+
+    @tracing.traced()
+    async def resolve(self, queries: List[str]) -> List[Optional[Dict[str, str]]]:
+        """Catalog node each query names exactly, by code, ISO3 code, name, alias or flag"""
+        await self.data_fetcher.get_snapshot()
+        resolver = self.data_fetcher.get_derived('resolver_index', self._build_resolver_index)
+        rows = [resolver.lookup(query) for query in queries]
+        return [None if row is None else resolver.index.summary(row) for row in rows]
+
+    @tracing.traced()
+    async def autocomplete(self, prefix: str, limit: int = 10, level: Optional[str] = None) -> List[Dict[str, str]]:
+        """Catalog nodes whose code, name or alias starts with prefix"""
+        await self.data_fetcher.get_snapshot()
+        resolver = self.data_fetcher.get_derived('resolver_index', self._build_resolver_index)
+        return resolver.complete(prefix, limit, level)
+
+    async def _comparison_matrix(self) -> ComparisonMatrix:
+        """All-pairs comparison matrix for the current data version"""
+        await self.data_fetcher.get_snapshot()
+        return self.data_fetcher.get_derived('comparison_matrix', ComparisonMatrix)
+
+    @tracing.traced()
     async def compare_countries(self, source: str, target: str) -> Dict[str, Any]:
         """Compare two countries directly"""
-        source_country = await self.data_fetcher.get_country_by_code(source)
-        target_country = await self.data_fetcher.get_country_by_code(target)
+        matrix = await self._comparison_matrix()
+        snapshot = matrix.snapshot
+        source_row = snapshot.index_of(source)
+        target_row = snapshot.index_of(target)
         
-        if not source_country or not target_country:
+        if source_row is None or target_row is None:
             raise ValueError("One or both countries not found")
         
-        comparison = {
-            'source': source_country,
-            'target': target_country,
-            'metrics_comparison': {}
+        return {
+            'source': snapshot.country(source_row),
+            'target': snapshot.country(target_row),
+            'metrics_comparison': matrix.metrics_comparison(source_row, target_row)
         }
+
+    @tracing.traced()
+    async def compare_with_many(self, source: str, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Compare one source country against many targets, or all others"""
+        matrix = await self._comparison_matrix()
+        snapshot = matrix.snapshot
+        source_row = snapshot.index_of(source)
         
-        # Compare each metric
-        for metric in source_country['metrics']:
-            source_val = source_country['metrics'][metric]
-            target_val = target_country['metrics'][metric]
-            
-            if isinstance(source_val, (int, float)) and isinstance(target_val, (int, float)):
-                difference = target_val - source_val
-                percentage_change = (difference / source_val * 100) if source_val != 0 else 0
-                
-                comparison['metrics_comparison'][metric] = {
-                    'source_value': source_val,
-                    'target_value': target_val,
-                    'difference': difference,
-                    'percentage_change': round(percentage_change, 1)
+        if source_row is None:
+            raise ValueError(f"Country not found: {source}")
+        
+        target_rows = self._lookup_rows(snapshot, targets)
+        if targets is None:
+            target_rows = target_rows[target_rows != source_row]
+        
+        return {
+            'source': snapshot.country(source_row),
+            'comparisons': [
+                {
+                    'target': snapshot.country(int(target_row)),
+                    'metrics_comparison': matrix.metrics_comparison(source_row, int(target_row))
                 }
+                for target_row in target_rows
+            ]
+        }
+
+    @tracing.traced()
+    async def metric_matrix(self, metric: str, codes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """N x N comparison of one metric across the given or all countries"""
+        matrix = await self._comparison_matrix()
+        rows = self._lookup_rows(matrix.snapshot, codes)
+        return matrix.metric_matrix(metric, rows.tolist())
+
+    @tracing.traced()
+    async def find_similar(
+        self,
+        code: str,
+        k: Optional[int] = None,
+        radius: Optional[float] = None,
+        weights: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """Countries closest to the given one on normalized metrics"""
+        await self.data_fetcher.get_snapshot()
+        index = self.data_fetcher.get_derived('similarity_index', SimilarityIndex)
+        row = index.snapshot.index_of(code)
+        
+        if row is None:
+            raise ValueError(f"Country not found: {code}")
+        if k is None and radius is None:
+            k = 5
+        if k is not None and k < 1:
+            raise ValueError("k must be at least 1")
+        
+        return {
+            'country': index.snapshot.summary(row),
+            'neighbours': index.query(row, k=k, radius=radius, weights=weights)
+        }
+
+    @tracing.traced()
+    async def skyline(self, metrics: Optional[List[str]] = None, preset: Optional[str] = None) -> Dict[str, Any]:
+        """Pareto frontier over the chosen metrics or a default metric set"""
+        snapshot = await self.data_fetcher.get_snapshot()
         
-        return comparison
\ No newline at end of file
+        if metrics:
+            criteria = parse_criteria(metrics, snapshot)
+        else:
+            preset = preset or 'essentials'
+            if preset not in DEFAULT_SKYLINES:
+                raise ValueError(f"Unknown skyline preset: {preset}")
+            criteria = DEFAULT_SKYLINES[preset]
+        
+        # Only the default sets are cached, so arbitrary queries cannot grow the cache
+        for name, default_criteria in DEFAULT_SKYLINES.items():
+            if criteria == default_criteria:
+                return self.data_fetcher.get_derived(f'skyline:{name}', _skyline_builder(criteria))
+        
+        return Skyline(snapshot, criteria).to_dict()
+
+    @tracing.traced()
+    async def analyze_sensitivity(
+        self,
+        target_countries: Optional[List[str]],
+        preferences: Dict[str, float],
+        profession: Optional[str] = None,
+        visa_type: Optional[str] = "Work Visa",
+        **options
+    ) -> Dict[str, Any]:
+        """How stable the ranking is when the preference weights move
+
+        Scores include the same profession and visa-type adjustments as
+        analyze_migration, so the base ranking is the one it returns.
+        """
+        await self.data_fetcher.get_snapshot()
+        table = self.data_fetcher.get_derived('scoring_table', ScoringTable)
+        adjustments = self.data_fetcher.get_derived('adjustment_tables', AdjustmentTables)
+        rows = self._lookup_rows(table.snapshot, target_countries)
+        job_multiplier, visa_penalty = adjustments.lookup(rows, profession, visa_type)
+        return run_sensitivity(
+            table, rows, preferences, job_multiplier=job_multiplier, visa_penalty=visa_penalty, **options
+        )
@@ -0,0 +1,147 @@
+"""
+Compact in-process representation of the country catalog.
+
+Countries travel between the data layer and the analyzer as slotted
+records rather than nested dicts: metric access is an attribute lookup,
+visaDifficulty is an enum code, and no instance carries a __dict__.
+The API still speaks the original JSON shape, produced by to_dict().
+"""
+
+from enum import IntEnum
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+class VisaDifficulty(IntEnum):
+    """Visa difficulty levels; the code is what the snapshot stores"""
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+
+    @classmethod
+    def parse(cls, value: Any) -> Optional["VisaDifficulty"]:
+        """Level for 'LOW'/'MEDIUM'/'HIGH' or a stored code, None if unknown"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            return cls.__members__.get(value)
+        try:
+            return cls(int(value))
+        except (TypeError, ValueError):
+            return None
+
+# Metrics every catalog entry is expected to have, in the seed's column order
+METRIC_NAMES = (
+    'gdpPerCapita', 'safetyIndex', 'healthcareQuality', 'educationQuality',
+    'costOfLiving', 'climateScore', 'languageBarrier', 'taxRate',
+    'visaDifficulty', 'infrastructure', 'jobMarket'
+)
+
+class Metrics:
+    """Metric values of one country; a missing metric is None"""
+
+    # Metrics outside METRIC_NAMES go to `extra`, which stays None normally
+    __slots__ = METRIC_NAMES + ('extra',)
+
+    def __init__(self, **values: Any):
+        self.extra = None
+        for name in METRIC_NAMES:
+            setattr(self, name, None)
+        for name, value in values.items():
+            self.set(name, value)
+
+    @classmethod
+    def from_dict(cls, metrics: Dict[str, Any]) -> "Metrics":
+        """Build from the API's metrics dict"""
+        return cls(**metrics)
+
+    def set(self, name: str, value: Any):
+        """Set one metric, coercing visaDifficulty to its enum code"""
+        if name == 'visaDifficulty':
+            value = VisaDifficulty.parse(value) if value is not None else None
+        if name in METRIC_NAMES:
+            setattr(self, name, value)
+        elif value is not None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def get(self, name: str) -> Any:
+        """Value of one metric by name, None if missing"""
+        if name in METRIC_NAMES:
+            return getattr(self, name)
+        return self.extra.get(name) if self.extra else None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """(name, value) for every metric that is present"""
+        for name in METRIC_NAMES:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        if self.extra:
+            yield from self.extra.items()
+
+    def copy(self) -> "Metrics":
+        """Independent copy, without re-parsing any value"""
+        clone = Metrics.__new__(Metrics)
+        for name in METRIC_NAMES:
+            setattr(clone, name, getattr(self, name))
+        clone.extra = dict(self.extra) if self.extra else None
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metrics dict as served by the API"""
+        return {
+            name: value.name if name == 'visaDifficulty' else value
+            for name, value in self.items()
+        }
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Metrics) and dict(self.items()) == dict(other.items())
+
+class Country:
+    """One catalog entry"""
+
+    __slots__ = ('code', 'name', 'flag', 'metrics', 'pros', 'cons')
+
+    def __init__(
+        self,
+        code: str,
+        name: str,
+        flag: str,
+        metrics: Metrics,
+        pros: Tuple[str, ...] = (),
+        cons: Tuple[str, ...] = ()
+    ):
+        self.code = code
+        self.name = name
+        self.flag = flag
+        self.metrics = metrics
+        self.pros = tuple(pros)
+        self.cons = tuple(cons)
+
+    @classmethod
+    def from_dict(cls, country: Dict[str, Any]) -> "Country":
+        """Build from the API's country dict"""
+        return cls(
+            country['code'], country['name'], country['flag'],
+            Metrics.from_dict(country['metrics']),
+            country.get('pros', ()), country.get('cons', ())
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Country dict as served by the API"""
+        return {
+            'code': self.code,
+            'name': self.name,
+            'flag': self.flag,
+            'metrics': self.metrics.to_dict(),
+            'pros': list(self.pros),
+            'cons': list(self.cons)
+        }
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Country) and all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return f"Country({self.code!r}, {self.name!r})"
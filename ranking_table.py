@@ -0,0 +1,212 @@
+"""
+Materialized rankings for every integer slider setting.
+
+The five preference sliders take integer values 1-10, so there are only
+10^5 weight vectors. For each visa type and each vector the table keeps the
+top-N catalog rows with their rounded score and recommendation level, so a
+baseline analysis (no profession, all five sliders set) is a table lookup.
+
+Files, next to the snapshot of the data version they were built from:
+
+    <base>.rows.npy    uint16/uint32 [visa types][10^5 vectors][N] snapshot rows
+    <base>.scores.npy  uint16        [visa types][10^5 vectors][N] score * 40 + level
+    <base>.json        metadata, written last; the table exists once it does
+"""
+
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+from snapshot import CountrySnapshot
+from scoring import ScoringTable, PREFERENCE_KEYS, recommendation_levels, round_deci
+from adjustments import AdjustmentTables, VISA_TYPES
+
+logger = logging.getLogger(__name__)
+
+SLIDER_LEVELS = 10
+VECTOR_COUNT = SLIDER_LEVELS ** len(PREFERENCE_KEYS)
+
+# Score cells computed per block; bounds worker memory for large catalogs
+_BLOCK_CELLS = 4_000_000
+
+def table_base(snapshot_path: str) -> str:
+    """Path prefix of the ranking table built from one snapshot file"""
+    return f"{snapshot_path}.ranking"
+
+def vector_index(sliders) -> int:
+    """Position of a slider vector (values 1-10, PREFERENCE_KEYS order) in the table"""
+    index = 0
+    for value in sliders:
+        index = index * SLIDER_LEVELS + (int(value) - 1)
+    return index
+
+def _all_vectors(start: int, stop: int) -> np.ndarray:
+    """Slider vectors with table indices start..stop-1, one per row"""
+    indices = np.arange(start, stop)
+    digits = [(indices // SLIDER_LEVELS ** p) % SLIDER_LEVELS for p in reversed(range(len(PREFERENCE_KEYS)))]
+    return np.column_stack(digits).astype(float) + 1
+
+def worker_context():
+    """Start method for worker pools: forkserver, or spawn where it is unavailable
+
+    Pools may start from a threaded server, where forking can copy held
+    locks into the workers; workers open their snapshot themselves, so a
+    fresh process has everything it needs.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+# Per-process state of the build workers
+_worker = {}
+
+def _init_worker(snapshot_file: str, base: str, top_n: int):
+    snapshot = CountrySnapshot.open(snapshot_file)
+    _worker.update(
+        table=ScoringTable(snapshot),
+        adjustments=AdjustmentTables(snapshot),
+        rows=np.load(f"{base}.rows.npy.tmp", mmap_mode="r+"),
+        scores=np.load(f"{base}.scores.npy.tmp", mmap_mode="r+"),
+        top_n=top_n
+    )
+
+def _build_block(start: int, stop: int):
+    """Fill the table for vectors start..stop-1"""
+    table, adjustments, top_n = _worker['table'], _worker['adjustments'], _worker['top_n']
+    rows = np.arange(len(table.snapshot))
+    # The weighted part is shared by every visa type; only the penalty differs
+    weighted = table.weighted_scores(rows, _all_vectors(start, stop))
+    n = weighted.shape[0]
+
+    for v in range(len(VISA_TYPES)):
+        scores = table.penalized(rows, weighted, adjustments.visa_penalty[v])
+        if top_n < n:
+            top = np.argpartition(-scores, top_n - 1, axis=0)[:top_n]
+        else:
+            top = np.broadcast_to(np.arange(n)[:, np.newaxis], scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0, kind='stable')
+        top = np.take_along_axis(top, order, axis=0)
+        top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+        levels = recommendation_levels(top_scores)
+        _worker['rows'][v, start:stop] = top.T
+        _worker['scores'][v, start:stop] = (round_deci(top_scores) * 4 + levels).T
+
+    _worker['rows'].flush()
+    _worker['scores'].flush()
+
+def build_ranking_table(snapshot_file: str, top_n: int, workers: Optional[int] = None) -> float:
+    """Build the ranking table for a snapshot file, returns seconds taken"""
+    started = time.perf_counter()
+    snapshot = CountrySnapshot.open(snapshot_file)
+    base = table_base(snapshot_file)
+    n = len(snapshot)
+    top_n = max(1, min(top_n, n))
+    shape = (len(VISA_TYPES), VECTOR_COUNT, top_n)
+
+    row_dtype = np.uint16 if n <= np.iinfo(np.uint16).max else np.uint32
+    np.lib.format.open_memmap(f"{base}.rows.npy.tmp", mode="w+", dtype=row_dtype, shape=shape).flush()
+    np.lib.format.open_memmap(f"{base}.scores.npy.tmp", mode="w+", dtype=np.uint16, shape=shape).flush()
+
+    block = max(1, min(VECTOR_COUNT, _BLOCK_CELLS // max(1, n)))
+    blocks = [(start, min(start + block, VECTOR_COUNT)) for start in range(0, VECTOR_COUNT, block)]
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=worker_context(),
+        initializer=_init_worker,
+        initargs=(snapshot_file, base, top_n)
+    ) as pool:
+        for future in [pool.submit(_build_block, start, stop) for start, stop in blocks]:
+            future.result()
+
+    os.replace(f"{base}.rows.npy.tmp", f"{base}.rows.npy")
+    os.replace(f"{base}.scores.npy.tmp", f"{base}.scores.npy")
+    meta = {
+        'data_version': snapshot.data_version,
+        'rows': n,
+        'top_n': top_n,
+        'visa_types': list(VISA_TYPES),
+        'preference_keys': list(PREFERENCE_KEYS)
+    }
+    with open(f"{base}.json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{base}.json.tmp", f"{base}.json")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Built ranking table for data version {snapshot.data_version} in {elapsed:.1f}s")
+    return elapsed
+
+def remove_ranking_tables(snapshot_path: str, keep_version: int):
+    """Delete ranking tables of data versions older than keep_version"""
+    for path in glob.glob(f"{glob.escape(snapshot_path)}.v*.ranking*"):
+        version = path[len(snapshot_path) + 2:].split(".", 1)[0]
+        if version.isdigit() and int(version) < keep_version:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class RankingTable:
+    """Memory-mapped ranking table of one data version"""
+
+    def __init__(self, base: str, meta: Dict[str, Any]):
+        self.data_version = meta['data_version']
+        self.top_n = meta['top_n']
+        self.rows = np.load(f"{base}.rows.npy", mmap_mode="r")
+        self.scores = np.load(f"{base}.scores.npy", mmap_mode="r")
+        self._visa_index = {name: i for i, name in enumerate(meta['visa_types'])}
+
+    @classmethod
+    def open(cls, snapshot_file: str) -> Optional["RankingTable"]:
+        """Open the table built from a snapshot file, None if it is missing or stale"""
+        base = table_base(snapshot_file)
+        try:
+            with open(f"{base}.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('preference_keys') != list(PREFERENCE_KEYS) or meta.get('visa_types') != list(VISA_TYPES):
+            return None
+        return cls(base, meta)
+
+    def lookup(self, preferences: Dict[str, float], visa_type: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Rows, rounded scores and recommendation levels for one query, best first
+
+        Only queries that set all five sliders to integers 1-10 and nothing
+        else are in the table; anything else returns None.
+        """
+        v = self._visa_index.get(visa_type)
+        if v is None or set(preferences) != set(PREFERENCE_KEYS):
+            return None
+        sliders = [preferences[key] for key in PREFERENCE_KEYS]
+        if not all(float(value).is_integer() and 1 <= value <= SLIDER_LEVELS for value in sliders):
+            return None
+
+        i = vector_index(sliders)
+        codes = self.scores[v, i]
+        return self.rows[v, i], (codes // 4) / 10, codes % 4
+
+class RankingTableLoader:
+    """Opens the ranking table of a snapshot once it has been built
+
+    Another process builds the table, so a missing table is looked for again
+    at most every few seconds rather than on every request.
+    """
+
+    RETRY_SECONDS = 5
+
+    def __init__(self, snapshot_file: str):
+        self.snapshot_file = snapshot_file
+        self.table = None
+        self._checked = 0.0
+
+    def get(self) -> Optional[RankingTable]:
+        if self.table is None and time.monotonic() - self._checked > self.RETRY_SECONDS:
+            self._checked = time.monotonic()
+            self.table = RankingTable.open(self.snapshot_file)
+        return self.table
@@ -0,0 +1,145 @@
+"""
+Resolver index from what people type to catalog codes.
+
+Built once per data version over the catalog, so regions and cities resolve
+too. Every node is reachable by its code or path, its name and any aliases
+below; countries also by ISO 3166 alpha-3 code and flag emoji. Keys are
+compared case- and accent-insensitively ("munchen" finds München).
+
+    exact    one dict lookup per query; codes win over names, and on equal
+             footing countries win over regions and cities
+    prefix   one sorted key list per level, so autocomplete is a binary
+             search per level followed by at most limit steps
+"""
+
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Tuple
+from catalog import CatalogIndex, LEVELS, level_depth
+
+# ISO 3166 alpha-3 codes by the alpha-2 codes the catalog uses
+ISO3 = {
+    'AT': 'AUT', 'AU': 'AUS', 'BE': 'BEL', 'BG': 'BGR', 'CA': 'CAN', 'CH': 'CHE', 'CY': 'CYP',
+    'CZ': 'CZE', 'DE': 'DEU', 'DK': 'DNK', 'EE': 'EST', 'ES': 'ESP', 'FI': 'FIN', 'FR': 'FRA',
+    'GB': 'GBR', 'GR': 'GRC', 'HR': 'HRV', 'HU': 'HUN', 'IE': 'IRL', 'IN': 'IND', 'IT': 'ITA',
+    'JP': 'JPN', 'KR': 'KOR', 'LT': 'LTU', 'LU': 'LUX', 'LV': 'LVA', 'MT': 'MLT', 'NL': 'NLD',
+    'NO': 'NOR', 'NZ': 'NZL', 'PL': 'POL', 'PT': 'PRT', 'RO': 'ROU', 'SE': 'SWE', 'SG': 'SGP',
+    'SI': 'SVN', 'SK': 'SVK', 'US': 'USA'
+}
+
+# Other names people commonly use, by catalog code
+ALIASES = {
+    'CH': ('Schweiz', 'Suisse', 'Svizzera'),
+    'DE': ('Deutschland',),
+    'FI': ('Suomi',),
+    'GB': ('UK', 'Great Britain', 'Britain'),
+    'IN': ('Bharat',),
+    'JP': ('Nippon', 'Nihon'),
+    'KR': ('Korea', 'Republic of Korea'),
+    'NL': ('Holland', 'Nederland', 'The Netherlands'),
+    'NZ': ('Aotearoa',),
+    'US': ('USA', 'America', 'United States of America'),
+    'DE/BY/MUC': ('München',),
+    'IN/KA/BLR': ('Bangalore',),
+    'IN/MH/BOM': ('Bombay',),
+    'US/NY/NYC': ('NYC',)
+}
+
+# Key kinds, in the order exact lookups prefer them
+KIND_CODE = 0
+KIND_ISO3 = 1
+KIND_NAME = 2
+KIND_ALIAS = 3
+KIND_FLAG = 4
+KIND_NAMES = ("code", "iso3", "name", "alias", "flag")
+
+def normalize(text: str) -> str:
+    """Lookup key for text: accents stripped, case folded, whitespace collapsed"""
+    if text.isascii():
+        return " ".join(text.lower().split())
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+class ResolverIndex:
+    """Exact and prefix lookups over the codes, names and aliases of every catalog node"""
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        snapshot = index.snapshot
+
+        entries = []
+        depths = index.depth.tolist()
+        for row, (code, name) in enumerate(zip(snapshot.codes, snapshot.names())):
+            keys = [(KIND_CODE, code), (KIND_NAME, name)]
+            keys += [(KIND_ALIAS, alias) for alias in ALIASES.get(code, ())]
+            if depths[row] == 0:
+                if code in ISO3:
+                    keys.append((KIND_ISO3, ISO3[code]))
+                # Places inherit their country's flag, so it only names the country
+                flag = snapshot.summary(row)['flag']
+                if flag:
+                    keys.append((KIND_FLAG, flag))
+            for kind, text in keys:
+                key = normalize(text)
+                if key:
+                    entries.append((kind, depths[row], key, row))
+
+        # Preference order decides which node an ambiguous exact key means
+        entries.sort()
+        self.exact: Dict[str, Tuple[int, int]] = {}
+        for kind, depth, key, row in entries:
+            self.exact.setdefault(key, (row, kind))
+
+        # Per level: keys sorted for prefix search, with their rows and kinds
+        self.keys: List[List[str]] = [[] for _ in LEVELS]
+        self.rows: List[List[int]] = [[] for _ in LEVELS]
+        self.kinds: List[List[int]] = [[] for _ in LEVELS]
+        for key, kind, depth, row in sorted((key, kind, depth, row) for kind, depth, key, row in entries):
+            self.keys[depth].append(key)
+            self.rows[depth].append(row)
+            self.kinds[depth].append(kind)
+
+    def lookup(self, query: str) -> Optional[int]:
+        """Row of the node a query names exactly, None if none"""
+        match = self.exact.get(normalize(query))
+        return None if match is None else match[0]
+
+    def resolve(self, queries: List[str]) -> List[Optional[str]]:
+        """Code for each query, None where nothing matches"""
+        codes = self.index.snapshot.codes
+        return [None if row is None else codes[row] for row in map(self.lookup, queries)]
+
+    def complete(self, prefix: str, limit: int = 10, level: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Nodes with a key starting with prefix, for autocomplete
+
+        The node the prefix names exactly comes first, then countries before
+        regions before cities, each in key order.
+        """
+        key = normalize(prefix)
+        if not key or limit <= 0:
+            return []
+        depth = level_depth(level)
+
+        seen = set()
+        results = []
+
+        def add(row: int, kind: int, matched: str):
+            if row in seen or (depth is not None and self.index.depth[row] != depth):
+                return
+            seen.add(row)
+            results.append({**self.index.summary(row), 'match': KIND_NAMES[kind], 'matched': matched})
+
+        match = self.exact.get(key)
+        if match is not None:
+            add(match[0], match[1], key)
+
+        for d in (range(len(LEVELS)) if depth is None else (depth,)):
+            keys = self.keys[d]
+            i = bisect_left(keys, key)
+            while i < len(keys) and len(results) < limit and keys[i].startswith(key):
+                add(self.rows[d][i], self.kinds[d][i], keys[i])
+                i += 1
+            if len(results) >= limit:
+                break
+        return results[:limit]
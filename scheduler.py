@@ -4,44 +4,242 @@ from apscheduler.triggers.date import DateTrigger
 import asyncio
 from datetime import datetime, timedelta
 import logging
+import os
+import time
+from typing import Any, Dict, Optional
+import settings
+import tracing
+from ranking_table import RankingTable, build_ranking_table, remove_ranking_tables
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
+# Open handle of the leader lock file while this process is the leader
+_leader_lock = None
+
+class JobStatus:
+    """Timing and outcome of the latest run of a job, stored for every worker to read"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.running = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration_seconds = None
+        self.last_outcome = None
+        self.last_error = None
+        self._started_monotonic = None
+
+    def start(self):
+        self.running = True
+        self.last_started = datetime.now().isoformat()
+        self._started_monotonic = time.monotonic()
+
+    def finish(self, error: Optional[Exception] = None, outcome: str = "success"):
+        self.running = False
+        self.last_finished = datetime.now().isoformat()
+        self.last_duration_seconds = round(time.monotonic() - self._started_monotonic, 3)
+        self.last_outcome = "error" if error else outcome
+        self.last_error = str(error) if error else None
+
+    def to_dict(self):
+        return {
+            'running': self.running,
+            'last_started': self.last_started,
+            'last_finished': self.last_finished,
+            'last_duration_seconds': self.last_duration_seconds,
+            'last_outcome': self.last_outcome,
+            'last_error': self.last_error
+        }
+
+    async def store(self, data_fetcher):
+        """Record the current state in the database; a failure only loses the report"""
+        try:
+            await data_fetcher.store_job_status(self.name, self.to_dict())
+        except Exception as e:
+            logger.error(f"Error recording {self.name} status: {e}")
+
+# Latest data refresh and ranking table build run by this process
+refresh_status = JobStatus("refresh_data")
+ranking_build_status = JobStatus("ranking_table_build")
+
+async def stored_job_statuses(data_fetcher) -> Dict[str, Dict[str, Any]]:
+    """Latest refresh and ranking table build as the leader recorded them, by job name"""
+    # Followers never run the jobs, so they report what the leader stored
+    stored = await data_fetcher.get_job_statuses()
+    return {
+        status.name: stored.get(status.name) or JobStatus(status.name).to_dict()
+        for status in (refresh_status, ranking_build_status)
+    }
+
+def _acquire_leadership(lock_path: Optional[str]) -> bool:
+    """Try to become the refresh leader by taking an exclusive file lock"""
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+
+    if lock_path is None or fcntl is None:
+        # Without a lock file or flock there is nothing to coordinate with
+        _leader_lock = True
+        return True
+
+    lock_file = open(lock_path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    # The OS drops the lock if this process dies, letting a follower take over
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _leader_lock = lock_file
+    return True
+
+def _release_leadership():
+    """Release the leader lock if this process holds it"""
+    global _leader_lock
+    if _leader_lock is not None and _leader_lock is not True:
+        fcntl.flock(_leader_lock, fcntl.LOCK_UN)
+        _leader_lock.close()
+    _leader_lock = None
+
+def is_leader() -> bool:
+    """Whether this process currently runs the refresh jobs"""
+    return _leader_lock is not None
+
+async def ensure_ranking_table(data_fetcher):
+    """Build the ranking table for the current data version if it is missing"""
+    if not settings.RANKING_TABLE_ENABLED or ranking_build_status.running:
+        return
+
+    snapshot = await data_fetcher.get_snapshot()
+    if snapshot.path is None or RankingTable.open(snapshot.path) is not None:
+        return
+
+    ranking_build_status.start()
+    await ranking_build_status.store(data_fetcher)
+    try:
+        # Jobs are rare and slow, so every run is traced when tracing is on
+        with tracing.start_trace("job:ranking_table_build", sample=True) as span:
+            if span is not None:
+                span.set_attribute("data_version", snapshot.data_version)
+            # The build fans out to worker processes; keep the event loop free meanwhile
+            await asyncio.to_thread(
+                build_ranking_table, snapshot.path,
+                settings.RANKING_TABLE_TOP_N, settings.RANKING_TABLE_WORKERS or None
+            )
+            remove_ranking_tables(data_fetcher.snapshot_path, snapshot.data_version)
+    except Exception as e:
+        logger.error(f"Error building ranking table: {e}")
+        ranking_build_status.finish(e)
+    else:
+        ranking_build_status.finish()
+    await ranking_build_status.store(data_fetcher)
+
 def start_scheduler(data_fetcher):
     """Start the scheduler for periodic data updates"""
-    
+    # Read-only replicas never refresh; an in-memory database belongs to
+    # this process alone, so it needs no lock file to lead
+    can_lead = not data_fetcher.read_only
+    lock_path = f"{data_fetcher.db_path}.leader.lock" if data_fetcher.mode == "rw" else None
+
     async def refresh_data_job():
         """Job to refresh country data"""
+        refresh_status.start()
+        await refresh_status.store(data_fetcher)
         try:
             logger.info("Starting scheduled data refresh...")
-            await data_fetcher.fetch_and_store_data()
+            with tracing.start_trace("job:refresh_data", sample=True) as span:
+                changed = await data_fetcher.fetch_and_store_data()
+                if span is not None:
+                    span.set_attribute("changed", changed)
             logger.info("Scheduled data refresh completed successfully")
         except Exception as e:
             logger.error(f"Error during scheduled data refresh: {e}")
-    
-    # Schedule first run after 1 minute
-    first_run = datetime.now() + timedelta(minutes=1)
-    scheduler.add_job(
-        refresh_data_job,
-        DateTrigger(run_date=first_run),
-        id='first_data_refresh',
-        name='First Data Refresh'
-    )
-    
-    # Schedule recurring job every 6 hours
+            refresh_status.finish(e)
+            await refresh_status.store(data_fetcher)
+            return
+        refresh_status.finish(outcome="success" if changed else "unchanged")
+        await refresh_status.store(data_fetcher)
+        await ensure_ranking_table(data_fetcher)
+
+    def schedule_refresh_jobs():
+        """Add the refresh jobs that only the leader runs"""
+        # Build the ranking table for the data already stored, if enabled
+        scheduler.add_job(
+            ensure_ranking_table,
+            args=[data_fetcher],
+            id='ranking_table_build',
+            name='Ranking Table Build',
+            replace_existing=True
+        )
+        
+        # Schedule first run shortly after becoming leader
+        first_run = datetime.now() + timedelta(minutes=settings.FIRST_REFRESH_DELAY_MINUTES)
+        scheduler.add_job(
+            refresh_data_job,
+            DateTrigger(run_date=first_run),
+            id='first_data_refresh',
+            name='First Data Refresh',
+            replace_existing=True
+        )
+
+        # Schedule recurring refresh job
+        scheduler.add_job(
+            refresh_data_job,
+            IntervalTrigger(hours=settings.REFRESH_INTERVAL_HOURS),
+            id='recurring_data_refresh',
+            name='Recurring Data Refresh',
+            replace_existing=True
+        )
+
+    async def sync_data_job():
+        """Job to pick up data stored by other workers and retry leadership"""
+        try:
+            if can_lead and not is_leader() and _acquire_leadership(lock_path):
+                logger.info(f"Worker {os.getpid()} took over as refresh leader")
+                schedule_refresh_jobs()
+
+            if await data_fetcher.reload_if_changed():
+                logger.info(f"Reloaded country data at version {data_fetcher.data_version}")
+            
+            # Data stored through the API or the import command needs a table too
+            if is_leader():
+                await ensure_ranking_table(data_fetcher)
+        except Exception as e:
+            logger.error(f"Error during data version check: {e}")
+
+    if can_lead and _acquire_leadership(lock_path):
+        schedule_refresh_jobs()
+        logger.info(f"Worker {os.getpid()} is the refresh leader")
+    else:
+        logger.info(f"Worker {os.getpid()} is a follower, watching for new data")
+
+    # Every worker, leader included, polls the version so refreshes
+    # triggered through the API in any worker reach all of them
     scheduler.add_job(
-        refresh_data_job,
-        IntervalTrigger(hours=6),
-        id='recurring_data_refresh',
-        name='Recurring Data Refresh'
+        sync_data_job,
+        IntervalTrigger(seconds=settings.DATA_POLL_SECONDS),
+        id='data_version_sync',
+        name='Data Version Sync'
     )
-    
+
     scheduler.start()
-    logger.info("Scheduler started - first refresh in 1 minute, then every 6 hours")
+    logger.info(
+        f"Scheduler started - refresh every {settings.REFRESH_INTERVAL_HOURS} hours on the leader, "
+        f"version check every {settings.DATA_POLL_SECONDS} seconds"
+    )
 
 def stop_scheduler():
     """Stop the scheduler"""
     scheduler.shutdown()
-    logger.info("Scheduler stopped")
\ No newline at end of file
+    _release_leadership()
+    logger.info("Scheduler stopped")
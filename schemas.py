@@ -0,0 +1,87 @@
+"""
+Typed API response models.
+
+Routes declare these as response_model, which gives the OpenAPI schema, but
+return JSONBytesResponse bodies so FastAPI never validates or re-encodes the
+result. The payloads come from data validated when it was stored, so they
+go straight from dicts to JSON bytes without building model instances:
+pydantic's model_construct runs per object in Python and costs about as much
+as validating. Set VALIDATE_RESPONSES=1 to check every body against its
+model, in tests for example.
+"""
+
+from typing import Any, Dict, List, Optional, Type, Union
+import pydantic_core
+from fastapi import Response
+from pydantic import BaseModel
+import settings
+import tracing
+
+MetricValue = Union[int, float, str]
+
+class CountrySchema(BaseModel):
+    code: str
+    name: str
+    flag: str
+    metrics: Dict[str, MetricValue]
+    pros: List[str]
+    cons: List[str]
+
+class CountryListResponse(BaseModel):
+    countries: List[CountrySchema]
+
+class ComponentScores(BaseModel):
+    economic: float
+    quality: float
+    safety: float
+
+class AnalysisResult(BaseModel):
+    country: Optional[CountrySchema] = None
+    # Set instead of country for detail="lean"
+    code: Optional[str] = None
+    score: float
+    recommendation: str
+    component_scores: ComponentScores
+
+class AnalysisResponse(BaseModel):
+    results: List[AnalysisResult]
+
+class MetricComparison(BaseModel):
+    source_value: MetricValue
+    target_value: MetricValue
+    difference: Union[int, float]
+    percentage_change: float
+
+class Comparison(BaseModel):
+    source: CountrySchema
+    target: CountrySchema
+    metrics_comparison: Dict[str, MetricComparison]
+
+class ComparisonResponse(BaseModel):
+    comparison: Comparison
+
+class TargetComparison(BaseModel):
+    target: CountrySchema
+    metrics_comparison: Dict[str, MetricComparison]
+
+class ManyComparison(BaseModel):
+    source: CountrySchema
+    comparisons: List[TargetComparison]
+
+class ManyComparisonResponse(BaseModel):
+    comparison: ManyComparison
+
+def to_json(model: Type[BaseModel], payload: Dict[str, Any]) -> bytes:
+    """Serialize a response payload that already has a model's shape"""
+    with tracing.span("serialize", model=model.__name__) as span:
+        body = pydantic_core.to_json(payload)
+        if span is not None:
+            span.set_attribute("bytes", len(body))
+    if settings.VALIDATE_RESPONSES:
+        model.model_validate_json(body)
+    return body
+
+class JSONBytesResponse(Response):
+    """A response whose body is already serialized JSON"""
+
+    media_type = "application/json"
@@ -0,0 +1,174 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+from snapshot import CountrySnapshot, VISA_DIFFICULTY_LEVELS
+
+# Preference keys in the order of the component score columns
+PREFERENCE_KEYS = (
+    'economicOpportunities', 'qualityOfLife', 'safetyAndSecurity',
+    'healthcareQuality', 'climateSuitability'
+)
+
+# Slider (1-10) and weight (0-1) used for a preference the request does not mention
+DEFAULT_PREFERENCE_SLIDERS = (7, 8, 6, 7, 5)
+DEFAULT_PREFERENCE_WEIGHTS = tuple(slider / 10 for slider in DEFAULT_PREFERENCE_SLIDERS)
+
+VISA_PENALTIES = {'LOW': 0, 'MEDIUM': -0.5, 'HIGH': -1.0}
+
+# Recommendation labels by level, and the lowest score of levels 1 and up
+RECOMMENDATION_LEVELS = ("Not recommended", "Consider with caution", "Recommended", "Strongly recommended")
+RECOMMENDATION_THRESHOLDS = (5.5, 7.0, 8.5)
+
+def recommendation_levels(scores: np.ndarray) -> np.ndarray:
+    """Index into RECOMMENDATION_LEVELS of each score"""
+    return np.searchsorted(RECOMMENDATION_THRESHOLDS, scores, side='right')
+
+def round_deci(scores: np.ndarray) -> np.ndarray:
+    """round(score, 1) * 10 as integers, matching Python's round() exactly"""
+    scaled = scores * 10
+    deci = np.rint(scaled)
+    # np.rint can disagree with Python's correctly rounded round() only
+    # right at a half, so settle those few values one by one
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9)
+    flat_scores, flat_deci = scores.reshape(-1), deci.reshape(-1)
+    for i in ties:
+        flat_deci[i] = round(round(float(flat_scores[i]), 1) * 10)
+    return deci.astype(np.uint16)
+
+def preference_divisor(preferences: Dict[str, float]) -> float:
+    """Sum of the weights (0-1) a request gives; sliders left out do not count, other keys do"""
+    return sum(value / 10 for value in preferences.values())
+
+def _normalize(values: np.ndarray, min_val: float, max_val: float) -> np.ndarray:
+    """Scale values to 0-10 between fixed bounds, 5 when the bounds coincide"""
+    if max_val == min_val:
+        return np.full_like(values, 5.0)
+    return np.clip((values - min_val) / (max_val - min_val) * 10, 0, 10)
+
+class ScoringTable:
+    """Preference-independent parts of the migration score for every country
+
+    One column per preference, so any number of weight vectors can be
+    scored with one matrix product.
+    """
+
+    def __init__(self, snapshot: CountrySnapshot):
+        self.snapshot = snapshot
+        column = snapshot.column
+
+        # The job market part is kept apart so profession multipliers can scale it
+        self.job_market = column('jobMarket')
+        self.economic_base = (
+            _normalize(column('gdpPerCapita'), 2000, 85000) * 0.4
+            + (100 - column('taxRate')) / 10 * 0.2
+        )
+        economic = self.economic_base + self.job_market * 0.4
+        quality = (
+            column('healthcareQuality') * 0.3
+            + column('educationQuality') * 0.2
+            + column('infrastructure') * 0.3
+            + (150 - column('costOfLiving')) / 15 * 0.2
+        )
+
+        # components[i] = economic, quality, safety, healthcare, climate
+        self.components = np.column_stack([
+            economic, quality, column('safetyIndex'),
+            column('healthcareQuality'), column('climateScore')
+        ])
+
+        visa_codes = column('visaDifficulty')
+        visa_lookup = np.array([VISA_PENALTIES[level] for level in VISA_DIFFICULTY_LEVELS])
+        self.visa_penalty = np.where(
+            np.isnan(visa_codes), -0.5, visa_lookup[np.nan_to_num(visa_codes, nan=1).astype(np.intp)]
+        )
+        self.language_penalty = -column('languageBarrier') * 0.1
+
+    def weights(self, preferences: Dict[str, float]) -> Tuple[np.ndarray, float]:
+        """Weight vector and divisor for one preferences dict
+
+        Like the scalar scoring, missing keys fall back to the defaults in the
+        numerator while the divisor only sums the weights actually given.
+        """
+        vector = np.array([
+            preferences[key] / 10 if key in preferences else default
+            for key, default in zip(PREFERENCE_KEYS, DEFAULT_PREFERENCE_WEIGHTS)
+        ])
+        divisor = preference_divisor(preferences)
+        if divisor == 0:
+            raise ValueError("At least one preference weight must be non-zero")
+        return vector, divisor
+
+    def components_for(self, rows: np.ndarray, job_multiplier: Optional[np.ndarray] = None) -> np.ndarray:
+        """Component scores for rows, with the job market scaled per row if given"""
+        components = self.components[rows]
+        if job_multiplier is not None:
+            components = components.copy()
+            job_score = np.clip(self.job_market[rows] * job_multiplier, 0, 10)
+            components[:, 0] = self.economic_base[rows] + job_score * 0.4
+        return components
+
+    def score(
+        self,
+        rows: np.ndarray,
+        preferences: Dict[str, float],
+        job_multiplier: Optional[np.ndarray] = None,
+        visa_penalty: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Final 0-10 scores and component scores for rows under one preferences dict
+
+        job_multiplier and visa_penalty are per-row profession and visa-type
+        adjustments; without them the country's general values are used.
+        """
+        weights, divisor = self.weights(preferences)
+        components = self.components_for(rows, job_multiplier)
+        if visa_penalty is None:
+            visa_penalty = self.visa_penalty[rows]
+        scores = components @ weights / divisor + visa_penalty + self.language_penalty[rows]
+        return np.clip(scores, 0, 10), components
+
+    def slider_vector(self, preferences: Dict[str, float]) -> np.ndarray:
+        """Slider values (1-10) in column order, defaults for missing keys"""
+        return np.array([
+            preferences.get(key, default)
+            for key, default in zip(PREFERENCE_KEYS, DEFAULT_PREFERENCE_SLIDERS)
+        ], dtype=float)
+
+    def weighted_scores(
+        self,
+        rows: np.ndarray,
+        weight_matrix: np.ndarray,
+        divisors: Optional[np.ndarray] = None,
+        job_multiplier: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Preference-weighted part of the scores of scores(), before any penalty"""
+        weight_matrix = weight_matrix / 10
+        if divisors is None:
+            divisors = weight_matrix.sum(axis=1)
+        return self.components_for(rows, job_multiplier) @ weight_matrix.T / divisors
+
+    def penalized(self, rows: np.ndarray, weighted: np.ndarray, visa_penalty: Optional[np.ndarray] = None) -> np.ndarray:
+        """Final 0-10 scores from weighted_scores() with the visa and language penalties"""
+        if visa_penalty is None:
+            visa_penalty = self.visa_penalty[rows]
+        if visa_penalty.ndim == 1:
+            visa_penalty = visa_penalty[:, np.newaxis]
+        return np.clip(weighted + visa_penalty + self.language_penalty[rows][:, np.newaxis], 0, 10)
+
+    def scores(
+        self,
+        rows: np.ndarray,
+        weight_matrix: np.ndarray,
+        divisors: Optional[np.ndarray] = None,
+        job_multiplier: Optional[np.ndarray] = None,
+        visa_penalty: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Final 0-10 scores for rows under many slider vectors at once
+
+        weight_matrix holds one complete set of slider values (1-10) per row
+        and the result has shape (len(rows), len(weight_matrix)). divisors
+        are the matching preference_divisor() values; by default all five
+        sliders count. job_multiplier and visa_penalty are per-row
+        adjustments as in score(); visa_penalty may also hold one column per
+        slider vector.
+        """
+        weighted = self.weighted_scores(rows, weight_matrix, divisors, job_multiplier)
+        return self.penalized(rows, weighted, visa_penalty)
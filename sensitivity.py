@@ -0,0 +1,147 @@
+import time
+from typing import Dict, Any, Optional
+import numpy as np
+from scoring import ScoringTable, PREFERENCE_KEYS, preference_divisor
+
+MAX_SAMPLES = 100000
+
+# Levels per slider in grid mode; 10 levels over five sliders is MAX_SAMPLES points
+MAX_GRID_STEPS = 10
+
+# Rank histograms are countries x countries, so keep the candidate set bounded
+MAX_COUNTRIES = 2000
+
+# Weight vectors scored per matrix product; also the budget check interval
+_CHUNK_SIZE = 512
+
+def _monte_carlo_weights(base: np.ndarray, given: np.ndarray, samples: int, spread: int, rng) -> np.ndarray:
+    """Slider vectors with the given sliders jittered by up to spread around the base"""
+    weights = np.tile(base, (samples, 1))
+    jitter = rng.integers(-spread, spread + 1, size=(samples, int(given.sum())))
+    weights[:, given] = np.clip(np.rint(base[given]) + jitter, 1, 10)
+    return weights
+
+def _grid_weights(base: np.ndarray, given: np.ndarray, steps: int, samples: int, rng) -> np.ndarray:
+    """Evenly spaced levels over 1-10 for the given sliders, in random order
+
+    Only the sampled grid points are decoded, never the whole grid, and the
+    random order keeps a sweep cut short by the latency budget unbiased.
+    """
+    levels = np.linspace(1, 10, steps)
+    shape = (steps,) * int(given.sum())
+    total = steps ** len(shape)
+    if samples >= total:
+        points = rng.permutation(total)
+    else:
+        points = rng.choice(total, size=samples, replace=False)
+    weights = np.tile(base, (len(points), 1))
+    weights[:, given] = levels[np.stack(np.unravel_index(points, shape), axis=1)]
+    return weights
+
+def _percentile_rank(histogram: np.ndarray, q: float) -> np.ndarray:
+    """Per-row rank at quantile q from a rows x ranks histogram (ranks 1-based)"""
+    cumulative = np.cumsum(histogram, axis=1)
+    threshold = q * cumulative[:, -1:]
+    return (cumulative < threshold).sum(axis=1) + 1
+
+def run_sensitivity(
+    table: ScoringTable,
+    rows: np.ndarray,
+    preferences: Dict[str, float],
+    mode: str = "monte_carlo",
+    samples: int = 2000,
+    spread: int = 2,
+    grid_steps: int = 4,
+    top_k: int = 3,
+    seed: Optional[int] = None,
+    budget_ms: float = 250,
+    job_multiplier: Optional[np.ndarray] = None,
+    visa_penalty: Optional[np.ndarray] = None
+) -> Dict[str, Any]:
+    """Rank stability of rows under perturbed preference weights
+
+    job_multiplier and visa_penalty are the per-row profession and visa-type
+    adjustments of ScoringTable.score, applied to every sample.
+    """
+    if samples < 1 or samples > MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+    if len(rows) == 0:
+        raise ValueError("No countries to analyze")
+    if len(rows) > MAX_COUNTRIES:
+        raise ValueError(f"At most {MAX_COUNTRIES} countries can be analyzed at once")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    base = table.slider_vector(preferences)
+    # Like /api/analyze, sliders left out keep their default weight but do
+    # not count towards the divisor, so only the given ones are perturbed
+    given = np.array([key in preferences for key in PREFERENCE_KEYS])
+    if not given.any():
+        raise ValueError("At least one preference weight must be given")
+
+    if mode == "monte_carlo":
+        weights = _monte_carlo_weights(base, given, samples, spread, rng)
+    elif mode == "grid":
+        if grid_steps < 2 or grid_steps > MAX_GRID_STEPS:
+            raise ValueError(f"grid_steps must be between 2 and {MAX_GRID_STEPS}")
+        weights = _grid_weights(base, given, grid_steps, samples, rng)
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+    # Keys outside the sliders never move but still count, as in preference_divisor
+    extra = preference_divisor({k: v for k, v in preferences.items() if k not in PREFERENCE_KEYS})
+    divisors = weights[:, given].sum(axis=1) / 10 + extra
+
+    n = len(rows)
+    top_k = max(1, min(top_k, n))
+    rank_histogram = np.zeros((n, n), dtype=np.int64)
+    score_sum = np.zeros(n)
+    evaluated = 0
+    deadline = started + budget_ms / 1000
+
+    for start in range(0, len(weights), _CHUNK_SIZE):
+        scores = table.scores(
+            rows, weights[start:start + _CHUNK_SIZE], divisors[start:start + _CHUNK_SIZE],
+            job_multiplier, visa_penalty
+        )
+        # ranks[i, s] is the 0-based position of row i under sample s
+        ranks = np.argsort(np.argsort(-scores, axis=0, kind='stable'), axis=0)
+        chunk = scores.shape[1]
+        flat = (np.arange(n)[:, np.newaxis] * n + ranks).ravel()
+        rank_histogram += np.bincount(flat, minlength=n * n).reshape(n, n)
+        score_sum += scores.sum(axis=1)
+        evaluated += chunk
+        if time.perf_counter() > deadline:
+            break
+
+    base_scores, _ = table.score(rows, preferences, job_multiplier, visa_penalty)
+    # /api/analyze ranks by rounded score, ties in target order
+    rounded = np.array([round(float(score), 1) for score in base_scores])
+    base_ranks = np.argsort(np.argsort(-rounded, kind='stable'), kind='stable') + 1
+    top_k_frequency = rank_histogram[:, :top_k].sum(axis=1) / evaluated
+    mean_rank = (rank_histogram * np.arange(1, n + 1)).sum(axis=1) / evaluated
+    p5 = _percentile_rank(rank_histogram, 0.05)
+    median = _percentile_rank(rank_histogram, 0.5)
+    p95 = _percentile_rank(rank_histogram, 0.95)
+
+    results = []
+    for i, row in enumerate(rows):
+        results.append({
+            'country': table.snapshot.summary(int(row)),
+            'base_rank': int(base_ranks[i]),
+            'base_score': float(rounded[i]),
+            'mean_score': round(float(score_sum[i] / evaluated), 2),
+            'top_k_frequency': round(float(top_k_frequency[i]), 4),
+            'mean_rank': round(float(mean_rank[i]), 2),
+            'rank_interval': {'p5': int(p5[i]), 'median': int(median[i]), 'p95': int(p95[i])}
+        })
+    results.sort(key=lambda r: (-r['top_k_frequency'], r['base_rank']))
+
+    return {
+        'mode': mode,
+        'top_k': top_k,
+        'samples_requested': len(weights),
+        'samples_evaluated': evaluated,
+        'truncated': evaluated < len(weights),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'results': results
+    }
@@ -0,0 +1,91 @@
+import os
+from typing import List
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+def _env_str(name: str, default: str) -> str:
+    """Read a string setting from the environment"""
+    return os.environ.get(name) or default
+
+def _env_list(name: str) -> List[str]:
+    """Read a comma-separated list setting from the environment"""
+    return [item.strip() for item in os.environ.get(name, "").split(",") if item.strip()]
+
+# SQLite database file, or the shared in-memory database's name in memory mode
+DATABASE_PATH = _env_str("DATABASE_PATH", "migration_data.db")
+
+# "rw" (default), "ro" for replicas serving a file nothing writes to,
+# or "memory" for a private in-memory database in tests and benchmarks
+DATABASE_MODE = _env_str("DATABASE_MODE", "rw")
+
+# Open an ro database with immutable=1 (no locks, no change detection); only
+# for files that are never written while served
+DATABASE_IMMUTABLE = _env_float("DATABASE_IMMUTABLE", 0) != 0
+
+# How often the leader worker refreshes country data
+REFRESH_INTERVAL_HOURS = _env_float("REFRESH_INTERVAL_HOURS", 6)
+
+# Delay before the leader's first refresh after boot
+FIRST_REFRESH_DELAY_MINUTES = _env_float("FIRST_REFRESH_DELAY_MINUTES", 1)
+
+# How often every worker checks the data version and retries leadership
+DATA_POLL_SECONDS = _env_float("DATA_POLL_SECONDS", 30)
+
+# Requests the admission controller lets run at once per worker
+ADMISSION_MAX_CONCURRENCY = int(_env_float("ADMISSION_MAX_CONCURRENCY", 16))
+
+# Requests allowed to wait for a slot before new ones are shed with 429
+ADMISSION_MAX_QUEUE = int(_env_float("ADMISSION_MAX_QUEUE", 64))
+
+# How long a queued request may wait before it is shed with 503
+ADMISSION_QUEUE_TIMEOUT_SECONDS = _env_float("ADMISSION_QUEUE_TIMEOUT_SECONDS", 2)
+
+# Precompute rankings for every integer slider vector after each refresh
+RANKING_TABLE_ENABLED = _env_float("RANKING_TABLE_ENABLED", 0) != 0
+
+# Countries kept per slider vector and visa type in the ranking table
+RANKING_TABLE_TOP_N = int(_env_float("RANKING_TABLE_TOP_N", 100))
+
+# Processes used to build the ranking table; 0 uses every CPU
+RANKING_TABLE_WORKERS = int(_env_float("RANKING_TABLE_WORKERS", 0))
+
+# Check every typed response body against its model; meant for tests
+VALIDATE_RESPONSES = _env_float("VALIDATE_RESPONSES", 0) != 0
+
+# URLs of JSON country updates merged over the seed on each refresh; none
+# means refreshes store the seed catalog as is
+INGESTION_SOURCES = _env_list("INGESTION_SOURCES")
+
+# Directory of cached upstream responses and their validators
+INGESTION_CACHE_DIR = _env_str("INGESTION_CACHE_DIR", "ingestion_cache")
+
+# Serve refreshes purely from the response cache, without network access
+INGESTION_OFFLINE = _env_float("INGESTION_OFFLINE", 0) != 0
+
+# Timeout for each upstream request
+INGESTION_TIMEOUT_SECONDS = _env_float("INGESTION_TIMEOUT_SECONDS", 30)
+
+# Record sampled request and job traces to local files
+TRACING_ENABLED = _env_float("TRACING_ENABLED", 0) != 0
+
+# Share of new traces recorded; requests with a traceparent header keep the caller's decision
+TRACING_SAMPLE_RATE = _env_float("TRACING_SAMPLE_RATE", 0.01)
+
+# Directory of each worker's trace files
+TRACING_DIR = _env_str("TRACING_DIR", "traces")
+
+# Size at which a trace file is rotated, and rotated files kept
+TRACING_MAX_BYTES = int(_env_float("TRACING_MAX_BYTES", 10 * 1024 * 1024))
+TRACING_BACKUP_COUNT = int(_env_float("TRACING_BACKUP_COUNT", 5))
+
+# Spans written per batch, and the longest a finished span waits to be written
+TRACING_BATCH_SIZE = int(_env_float("TRACING_BATCH_SIZE", 512))
+TRACING_EXPORT_INTERVAL_SECONDS = _env_float("TRACING_EXPORT_INTERVAL_SECONDS", 5)
+
+# Finished spans held for the exporter before new ones are dropped
+TRACING_MAX_QUEUE = int(_env_float("TRACING_MAX_QUEUE", 8192))
@@ -0,0 +1,78 @@
+from typing import List, Dict, Any, Optional
+import numpy as np
+from snapshot import CountrySnapshot
+
+def normalize_columns(columns: np.ndarray) -> np.ndarray:
+    """Scale each metric row to 0-10, using the catalog minimum and maximum
+    of that metric as the bounds"""
+    with np.errstate(invalid='ignore'):
+        min_val = np.nanmin(columns, axis=1, keepdims=True)
+        max_val = np.nanmax(columns, axis=1, keepdims=True)
+    span = max_val - min_val
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.clip((columns - min_val) / span * 10, 0, 10)
+    normalized = np.where(span == 0, 5.0, normalized)
+
+    # A missing value sits in the middle of the scale rather than at an edge
+    return np.where(np.isnan(columns), 5.0, normalized)
+
+class SimilarityIndex:
+    """Normalized metric vectors for nearest-neighbour queries"""
+
+    def __init__(self, snapshot: CountrySnapshot):
+        self.snapshot = snapshot
+        self.metric_names = list(snapshot.metric_names)
+        self._metric_index = {name: m for m, name in enumerate(self.metric_names)}
+
+        # One contiguous row per country so a query is a single pass over memory
+        self.vectors = np.ascontiguousarray(normalize_columns(snapshot.columns).T)
+
+    def _weight_vector(self, weights: Optional[Dict[str, float]]) -> np.ndarray:
+        """Per-metric weights, 1 for every metric not mentioned"""
+        vector = np.ones(len(self.metric_names))
+        for name, weight in (weights or {}).items():
+            if name not in self._metric_index:
+                raise ValueError(f"Unknown metric: {name}")
+            if weight < 0:
+                raise ValueError(f"Weight for {name} must not be negative")
+            vector[self._metric_index[name]] = weight
+        if vector.sum() == 0:
+            raise ValueError("At least one metric weight must be positive")
+        return vector
+
+    def distances(self, row: int, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Weighted RMS distance on the 0-10 scale from one row to every row"""
+        w = self._weight_vector(weights)
+        diff = self.vectors - self.vectors[row]
+        return np.sqrt((diff * diff) @ w / w.sum())
+
+    def query(
+        self,
+        row: int,
+        k: Optional[int] = None,
+        radius: Optional[float] = None,
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """k nearest neighbours and/or all neighbours within radius of a row"""
+        distances = self.distances(row, weights)
+        distances[row] = np.inf
+
+        candidates = np.arange(len(distances))
+        if radius is not None:
+            candidates = candidates[distances <= radius]
+
+        if k is not None and k < len(candidates):
+            nearest = np.argpartition(distances[candidates], k)[:k]
+            candidates = candidates[nearest]
+
+        candidates = candidates[np.argsort(distances[candidates], kind='stable')]
+        candidates = candidates[np.isfinite(distances[candidates])]
+
+        return [
+            {
+                'country': self.snapshot.summary(int(i)),
+                'distance': round(float(distances[i]), 3)
+            }
+            for i in candidates
+        ]
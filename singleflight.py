@@ -0,0 +1,50 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+def canonical_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of a JSON-serializable request description"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one computation
+
+    Only calls that overlap in time share work: the key is forgotten as soon
+    as the computation finishes, so this is not a result cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or wait for the identical call already running"""
+        task = self._calls.get(key)
+        if task is None:
+            # A separate task, so one caller disconnecting cannot cancel
+            # the computation the others are waiting for
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def metrics(self) -> Dict[str, Any]:
+        """In-flight and coalescing counters"""
+        return {
+            'in_flight': len(self._calls),
+            'executed': self.executed,
+            'coalesced': self.coalesced
+        }
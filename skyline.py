@@ -0,0 +1,110 @@
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from snapshot import CountrySnapshot
+
+# Whether a higher or a lower value of each metric is better
+METRIC_DIRECTIONS = {
+    'gdpPerCapita': 'max',
+    'safetyIndex': 'max',
+    'healthcareQuality': 'max',
+    'educationQuality': 'max',
+    'costOfLiving': 'min',
+    'climateScore': 'max',
+    'languageBarrier': 'min',
+    'taxRate': 'min',
+    'visaDifficulty': 'min',
+    'infrastructure': 'max',
+    'jobMarket': 'max'
+}
+
+# Metric sets offered by the UI; their frontiers are cached per data version
+DEFAULT_SKYLINES = {
+    'essentials': (('safetyIndex', 'max'), ('costOfLiving', 'min'), ('jobMarket', 'max')),
+    'career': (('gdpPerCapita', 'max'), ('jobMarket', 'max'), ('taxRate', 'min')),
+    'family': (('safetyIndex', 'max'), ('healthcareQuality', 'max'), ('educationQuality', 'max')),
+    'lifestyle': (('climateScore', 'max'), ('costOfLiving', 'min'), ('languageBarrier', 'min'))
+}
+
+Criteria = Tuple[Tuple[str, str], ...]
+
+_CHUNK_SIZE = 1024
+
+def _dominated(candidates: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+    """Which candidate rows are dominated by at least one frontier row"""
+    if len(frontier) == 0:
+        return np.zeros(len(candidates), dtype=bool)
+    at_least = (frontier[np.newaxis, :, :] >= candidates[:, np.newaxis, :]).all(axis=2)
+    better = (frontier[np.newaxis, :, :] > candidates[:, np.newaxis, :]).any(axis=2)
+    return (at_least & better).any(axis=1)
+
+def parse_criteria(metrics: List[str], snapshot: CountrySnapshot) -> Criteria:
+    """Turn ['safetyIndex:max', 'costOfLiving'] into validated (metric, direction) pairs"""
+    criteria = []
+    for item in metrics:
+        name, _, direction = item.partition(":")
+        direction = direction or METRIC_DIRECTIONS.get(name, 'max')
+        if not snapshot.has_metric(name):
+            raise ValueError(f"Unknown metric: {name}")
+        if direction not in ('max', 'min'):
+            raise ValueError(f"Direction for {name} must be 'max' or 'min'")
+        criteria.append((name, direction))
+    if len(criteria) < 2:
+        raise ValueError("A skyline needs at least two metrics")
+    return tuple(criteria)
+
+class Skyline:
+    """Countries not dominated on a set of metrics, with dominance counts"""
+
+    def __init__(self, snapshot: CountrySnapshot, criteria: Criteria):
+        self.snapshot = snapshot
+        self.criteria = criteria
+
+        # Orient every column so that larger is better
+        values = np.column_stack([
+            snapshot.column(name) if direction == 'max' else -snapshot.column(name)
+            for name, direction in criteria
+        ])
+        complete = np.flatnonzero(~np.isnan(values).any(axis=1))
+        values = values[complete]
+
+        # Sort-filter skyline: a row can only be dominated by a row with a
+        # strictly larger sum, so after sorting by sum each block only has
+        # to be checked against the frontier found so far and itself
+        order = np.argsort(-values.sum(axis=1), kind='stable')
+        frontier = np.empty(0, dtype=np.intp)
+        for start in range(0, len(order), _CHUNK_SIZE):
+            block = order[start:start + _CHUNK_SIZE]
+            block = block[~_dominated(values[block], values[frontier])]
+            survivors = []
+            for i in block:
+                if not _dominated(values[i:i + 1], values[survivors])[0]:
+                    survivors.append(i)
+            frontier = np.concatenate([frontier, np.array(survivors, dtype=np.intp)])
+
+        self.evaluated = len(values)
+        self.rows = complete[frontier]
+        self.dominates = np.zeros(len(frontier), dtype=np.int64)
+
+        # Bound the temporary comparison array to a few million cells
+        step = max(1, 4_000_000 // max(1, len(values) * len(criteria)))
+        for start in range(0, len(frontier), step):
+            points = values[frontier[start:start + step]]
+            at_least = (points[:, np.newaxis, :] >= values[np.newaxis, :, :]).all(axis=2)
+            better = (points[:, np.newaxis, :] > values[np.newaxis, :, :]).any(axis=2)
+            self.dominates[start:start + len(points)] = (at_least & better).sum(axis=1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Frontier rows with their metric values and dominance counts"""
+        positions = {name: self.snapshot.metric_names.index(name) for name, _ in self.criteria}
+        frontier = []
+        for row, count in sorted(zip(self.rows, self.dominates), key=lambda item: -item[1]):
+            frontier.append({
+                'country': self.snapshot.summary(int(row)),
+                'values': {name: self.snapshot.metric_value(int(row), m) for name, m in positions.items()},
+                'dominates': int(count)
+            })
+        return {
+            'metrics': [{'metric': name, 'direction': direction} for name, direction in self.criteria],
+            'evaluated': self.evaluated,
+            'frontier': frontier
+        }
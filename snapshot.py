@@ -0,0 +1,291 @@
+"""
+Compact binary snapshot of the country catalog.
+
+The refresh step writes one file per data version. Every worker process
+memory-maps it read-only, so the metric columns and strings exist once in
+the page cache no matter how many workers run on the machine.
+
+Layout (little-endian, sections aligned to 8 bytes):
+
+    header          magic, format version, data version, counts, section offsets
+    metric kinds    uint8 per metric (float, int or visa difficulty code)
+    metric columns  float64[n_metrics][n_rows], one contiguous column per metric
+    row table       int32[n_rows][7]: code, name, flag, pros start/count, cons start/count
+    string offsets  uint64[n_strings + 1] byte offsets into the string blob
+    string blob     UTF-8 text; the first n_metrics strings are the metric names
+"""
+
+import mmap
+import os
+import struct
+from typing import List, Dict, Any, Optional
+import numpy as np
+from models import Country, Metrics, VisaDifficulty
+
+MAGIC = b"GRSNAP01"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIQIIIQQQQQ")
+
+# Metric kinds stored alongside each column
+KIND_FLOAT = 0
+KIND_INT = 1
+KIND_VISA = 2
+
+# visaDifficulty is stored as its VisaDifficulty code, the index in this tuple
+VISA_DIFFICULTY_LEVELS = tuple(level.name for level in VisaDifficulty)
+
+_ROW_FIELDS = 7
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next multiple of 8"""
+    return (offset + 7) & ~7
+
+def _metric_kind(name: str, values: List[Any]) -> int:
+    """Pick the storage kind for a metric from its values"""
+    if name == "visaDifficulty":
+        return KIND_VISA
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return KIND_INT
+    return KIND_FLOAT
+
+def build_snapshot(countries: List[Country], data_version: int) -> bytes:
+    """Encode countries into the snapshot binary format"""
+    countries = sorted(countries, key=lambda c: c.name)
+
+    # Metric names in first-seen order so columns follow the source layout
+    metric_names = []
+    for country in countries:
+        for name, _ in country.metrics.items():
+            if name not in metric_names:
+                metric_names.append(name)
+
+    strings = list(metric_names)
+    rows = []
+    for country in countries:
+        row = [len(strings), len(strings) + 1, len(strings) + 2]
+        strings.extend([country.code, country.name, country.flag])
+        row.extend([len(strings), len(country.pros)])
+        strings.extend(country.pros)
+        row.extend([len(strings), len(country.cons)])
+        strings.extend(country.cons)
+        rows.append(row)
+
+    n_rows = len(countries)
+    n_metrics = len(metric_names)
+    kinds = np.zeros(n_metrics, dtype="<u1")
+    columns = np.full((n_metrics, n_rows), np.nan, dtype="<f8")
+    for m, name in enumerate(metric_names):
+        values = [country.metrics.get(name) for country in countries]
+        kinds[m] = _metric_kind(name, values)
+        for i, value in enumerate(values):
+            if value is not None:
+                columns[m, i] = value
+
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    string_offsets[1:] = np.cumsum([len(s) for s in encoded]) if encoded else []
+    row_table = np.array(rows, dtype="<i4").reshape(n_rows, _ROW_FIELDS)
+
+    kinds_offset = _align(_HEADER.size)
+    columns_offset = _align(kinds_offset + kinds.nbytes)
+    rows_offset = _align(columns_offset + columns.nbytes)
+    strings_index_offset = _align(rows_offset + row_table.nbytes)
+    blob_offset = _align(strings_index_offset + string_offsets.nbytes)
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, data_version, n_rows, n_metrics, len(encoded),
+        kinds_offset, columns_offset, rows_offset, strings_index_offset, blob_offset
+    )
+
+    out = bytearray(blob_offset + int(string_offsets[-1]))
+    out[:len(header)] = header
+    out[kinds_offset:kinds_offset + kinds.nbytes] = kinds.tobytes()
+    out[columns_offset:columns_offset + columns.nbytes] = columns.tobytes()
+    out[rows_offset:rows_offset + row_table.nbytes] = row_table.tobytes()
+    out[strings_index_offset:strings_index_offset + string_offsets.nbytes] = string_offsets.tobytes()
+    out[blob_offset:] = b"".join(encoded)
+    return bytes(out)
+
+def write_snapshot(path: str, countries: List[Country], data_version: int):
+    """Write a snapshot file atomically so readers never see a partial file"""
+    data = build_snapshot(countries, data_version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_snapshot_version(path: str) -> Optional[int]:
+    """Read only the data version from a snapshot header, None if unreadable"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, format_version, data_version = _HEADER.unpack(header)[:3]
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        return None
+    return data_version
+
+class CountrySnapshot:
+    """Read-only, zero-copy view over a snapshot buffer"""
+
+    def __init__(self, buffer, path: Optional[str] = None):
+        (magic, format_version, data_version, n_rows, n_metrics, n_strings,
+         kinds_offset, columns_offset, rows_offset, strings_index_offset,
+         blob_offset) = _HEADER.unpack_from(buffer, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"Not a country snapshot: {path or 'buffer'}")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {format_version}")
+
+        self.path = path
+        self.data_version = data_version
+        self._buffer = buffer
+        self._blob_offset = blob_offset
+
+        # Arrays below share memory with the mapping; nothing is copied
+        self.metric_kinds = np.frombuffer(buffer, dtype="<u1", count=n_metrics, offset=kinds_offset)
+        self.columns = np.frombuffer(
+            buffer, dtype="<f8", count=n_metrics * n_rows, offset=columns_offset
+        ).reshape(n_metrics, n_rows)
+        self._rows = np.frombuffer(
+            buffer, dtype="<i4", count=n_rows * _ROW_FIELDS, offset=rows_offset
+        ).reshape(n_rows, _ROW_FIELDS)
+        self._string_offsets = np.frombuffer(
+            buffer, dtype="<u8", count=n_strings + 1, offset=strings_index_offset
+        )
+
+        self.metric_names = [self.string(m) for m in range(n_metrics)]
+        self._metric_index = {name: m for m, name in enumerate(self.metric_names)}
+        self.codes = [self.string(int(row[0])) for row in self._rows]
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def open(cls, path: str) -> "CountrySnapshot":
+        """Memory-map a snapshot file read-only"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, path)
+
+    @classmethod
+    def from_countries(cls, countries: List[Country], data_version: int) -> "CountrySnapshot":
+        """Build an in-memory snapshot without touching disk"""
+        return cls(build_snapshot(countries, data_version))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def string(self, index: int) -> str:
+        """Decode one entry of the string table"""
+        start = self._blob_offset + int(self._string_offsets[index])
+        end = self._blob_offset + int(self._string_offsets[index + 1])
+        return self._buffer[start:end].decode("utf-8")
+
+    def _strings(self, start: int, count: int) -> List[str]:
+        return [self.string(i) for i in range(start, start + count)]
+
+    def index_of(self, code: str) -> Optional[int]:
+        """Row index for a country code"""
+        return self._code_index.get(code)
+
+    def column(self, metric: str) -> np.ndarray:
+        """Read-only metric column across all rows"""
+        return self.columns[self._metric_index[metric]]
+
+    def has_metric(self, metric: str) -> bool:
+        return metric in self._metric_index
+
+    def metric_kind(self, metric: str) -> int:
+        """Storage kind of a metric column"""
+        return int(self.metric_kinds[self._metric_index[metric]])
+
+    def metric_value(self, row: int, m: int) -> Any:
+        """Decode one stored metric value back to its original type"""
+        value = self.columns[m, row]
+        if np.isnan(value):
+            return None
+        kind = self.metric_kinds[m]
+        if kind == KIND_VISA:
+            return VISA_DIFFICULTY_LEVELS[int(value)]
+        if kind == KIND_INT:
+            return int(value)
+        return float(value)
+
+    def metrics(self, row: int) -> Dict[str, Any]:
+        """Metrics dict for one row"""
+        metrics = {}
+        for m, name in enumerate(self.metric_names):
+            value = self.metric_value(row, m)
+            if value is not None:
+                metrics[name] = value
+        return metrics
+
+    def record(self, row: int) -> Country:
+        """Materialize one row as a Country record"""
+        code, name, flag, pros_start, pros_count, cons_start, cons_count = (int(v) for v in self._rows[row])
+        metrics = Metrics()
+        for m, metric in enumerate(self.metric_names):
+            value = self.columns[m, row]
+            if np.isnan(value):
+                continue
+            kind = self.metric_kinds[m]
+            if kind == KIND_VISA:
+                value = VisaDifficulty(int(value))
+            elif kind == KIND_INT:
+                value = int(value)
+            else:
+                value = float(value)
+            metrics.set(metric, value)
+        return Country(
+            self.string(code), self.string(name), self.string(flag), metrics,
+            self._strings(pros_start, pros_count), self._strings(cons_start, cons_count)
+        )
+
+    def records(self) -> List[Country]:
+        """Every row as a Country record, ordered by name"""
+        return [self.record(i) for i in range(len(self))]
+
+    def country(self, row: int) -> Dict[str, Any]:
+        """Encode one row straight into the country dict served by the API"""
+        code, name, flag, pros_start, pros_count, cons_start, cons_count = (int(v) for v in self._rows[row])
+        return {
+            'code': self.string(code),
+            'name': self.string(name),
+            'flag': self.string(flag),
+            'metrics': self.metrics(row),
+            'pros': self._strings(pros_start, pros_count),
+            'cons': self._strings(cons_start, cons_count)
+        }
+
+    def summary(self, row: int) -> Dict[str, str]:
+        """Code, name and flag of one row without metrics or text"""
+        code, name, flag = (int(v) for v in self._rows[row][:3])
+        return {'code': self.string(code), 'name': self.string(name), 'flag': self.string(flag)}
+
+    def names(self) -> List[str]:
+        """Name of every row, decoded in one pass"""
+        indices = self._rows[:, 1].astype(np.intp)
+        starts = (self._string_offsets[indices] + self._blob_offset).tolist()
+        ends = (self._string_offsets[indices + 1] + self._blob_offset).tolist()
+        buffer = self._buffer
+        return [buffer[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+
+    def details(self, row: int) -> Dict[str, Any]:
+        """Code, pros and cons of one row, the long text left out of lean results"""
+        code, _, _, pros_start, pros_count, cons_start, cons_count = (int(v) for v in self._rows[row])
+        return {
+            'code': self.string(code),
+            'pros': self._strings(pros_start, pros_count),
+            'cons': self._strings(cons_start, cons_count)
+        }
+
+    def countries(self) -> List[Dict[str, Any]]:
+        """Every row as an API country dict, ordered by name"""
+        return [self.country(i) for i in range(len(self))]
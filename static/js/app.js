@@ -79,6 +79,87 @@ async function testAnalyzeEndpoint() {
     await testEndpoint('/analyze', 'POST', sampleData);
 }
 
+// Live re-ranking over a WebSocket: the server keeps the session's targets,
+// profession and visa type, so each slider move only sends the changed weights
+class LiveRanking {
+    constructor(onUpdate, onError) {
+        this.onUpdate = onUpdate;
+        this.onError = onError || console.error;
+        this.pendingWeights = {};
+        this.frameRequested = false;
+        this.seq = 0;
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        this.socket = new WebSocket(`${scheme}://${window.location.host}/ws/rank`);
+        this.opened = new Promise(resolve => this.socket.addEventListener('open', resolve));
+        this.socket.addEventListener('message', event => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'error') {
+                this.onError(message.detail);
+            } else {
+                this.onUpdate(message);
+            }
+        });
+    }
+
+    // Set targets, profession, visa type and starting weights
+    async start(session) {
+        await this.opened;
+        this.socket.send(JSON.stringify({ type: 'init', seq: ++this.seq, ...session }));
+    }
+
+    // Queue a weight change; at most one delta is sent per animation frame
+    setWeight(name, value) {
+        this.pendingWeights[name] = Number(value);
+        if (this.frameRequested) {
+            return;
+        }
+        this.frameRequested = true;
+        requestAnimationFrame(() => {
+            this.frameRequested = false;
+            const weights = this.pendingWeights;
+            this.pendingWeights = {};
+            this.socket.send(JSON.stringify({ type: 'delta', seq: ++this.seq, weights: weights }));
+        });
+    }
+
+    close() {
+        this.socket.close();
+    }
+}
+
+// Open a live ranking session with the sample analysis and show its updates
+let liveRanking = null;
+async function startLiveRanking() {
+    if (liveRanking) {
+        liveRanking.close();
+    }
+    const ranks = {};
+    liveRanking = new LiveRanking(message => {
+        message.changes.forEach(change => { ranks[change.code] = change; });
+        const ranking = Object.values(ranks).sort((a, b) => a.rank - b.rank);
+        showSuccess({ seq: message.seq, changed: message.changes.length, ranking: ranking });
+    }, showError);
+    await liveRanking.start({
+        target_countries: ["NL", "CA", "AU", "DE", "JP"],
+        profession: "Software Engineer",
+        visa_type: "Work Visa",
+        preferences: {
+            economicOpportunities: 8,
+            qualityOfLife: 7,
+            safetyAndSecurity: 6,
+            healthcareQuality: 7,
+            climateSuitability: 5
+        }
+    });
+}
+
+// Slider handler for the live ranking demo
+function updateLiveWeight(name, value) {
+    if (liveRanking) {
+        liveRanking.setWeight(name, value);
+    }
+}
+
 // Initialize the page
 document.addEventListener('DOMContentLoaded', function() {
     console.log('🌍 Global Relocation Analyzer API Frontend Loaded');
@@ -120,4 +201,7 @@ document.addEventListener('DOMContentLoaded', addInteractiveFeatures);
 
 // Export functions for global access
 window.testEndpoint = testEndpoint;
-window.testAnalyzeEndpoint = testAnalyzeEndpoint;
\ No newline at end of file
+window.testAnalyzeEndpoint = testAnalyzeEndpoint;
+window.LiveRanking = LiveRanking;
+window.startLiveRanking = startLiveRanking;
+window.updateLiveWeight = updateLiveWeight;
\ No newline at end of file
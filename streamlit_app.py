@@ -1,7 +1,4 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
 import requests
 import json
 from typing import Dict, List, Any
@@ -164,7 +161,7 @@ def fetch_visa_types():
     except:
         return []
 
-def analyze_migration(current_country, target_countries, profession, visa_type, preferences):
+def analyze_migration(current_country, target_countries, profession, visa_type, preferences, countries_by_code):
     """Call migration analysis API"""
     try:
         payload = {
@@ -172,11 +169,16 @@ def analyze_migration(current_country, target_countries, profession, visa_type,
             "target_countries": target_countries,
             "profession": profession,
             "visa_type": visa_type,
-            "preferences": preferences
+            "preferences": preferences,
+            "detail": "lean"
         }
         response = requests.post(f"{API_BASE_URL}/analyze", json=payload)
         if response.status_code == 200:
-            return response.json()["results"]
+            # Lean results carry only the code; the country list is already cached
+            results = response.json()["results"]
+            for result in results:
+                result['country'] = countries_by_code[result['code']]
+            return results
         return []
     except:
         return []
@@ -186,6 +188,8 @@ def create_radar_chart(results):
     if not results:
         return None
     
+    import plotly.graph_objects as go
+    
     categories = ['Economic', 'Quality', 'Safety', 'Healthcare', 'Climate']
     
     fig = go.Figure()
@@ -230,6 +234,8 @@ def create_cost_comparison_chart(results):
     if not results:
         return None
     
+    import plotly.graph_objects as go
+    
     countries = []
     costs = []
     flags = []
@@ -283,6 +289,9 @@ def display_metrics_table(results):
             'Job Market': f"{metrics['jobMarket']}/10"
         })
     
+    # pandas is only needed for this table, so keep it off the first paint
+    import pandas as pd
+    
     df = pd.DataFrame(metrics_data)
     st.dataframe(df, use_container_width=True)
 
@@ -316,6 +325,9 @@ def main():
         st.error("Unable to load country data. Please ensure the API server is running.")
         st.stop()
     
+    # Widgets hold codes and only display labels, so no label is mapped back to a code
+    country_labels = {c['code']: f"{c['flag']} {c['name']}" for c in countries}
+    
     # Sidebar
     with st.sidebar:
         st.markdown("## 🎯 Migration Analysis Settings")
@@ -323,31 +335,24 @@ def main():
         # Current Country
         st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
         st.markdown("### Current Country")
-        current_country_options = [""] + [f"{c['flag']} {c['name']}" for c in countries]
-        current_country_display = st.selectbox(
+        current_country = st.selectbox(
             "Select your current country",
-            current_country_options,
+            [None] + list(country_labels),
+            format_func=lambda code: country_labels.get(code, ""),
             key="current_country"
         )
-        current_country = None
-        if current_country_display:
-            current_country = next((c['code'] for c in countries if f"{c['flag']} {c['name']}" == current_country_display), None)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Target Countries
         st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
         st.markdown("### Target Countries (Select up to 3)")
-        target_countries_display = st.multiselect(
+        target_countries = st.multiselect(
             "Countries to analyze",
-            [f"{c['flag']} {c['name']}" for c in countries],
+            list(country_labels),
+            format_func=country_labels.get,
             max_selections=3,
             key="target_countries"
         )
-        target_countries = [
-            next((c['code'] for c in countries if f"{c['flag']} {c['name']}" == display), None)
-            for display in target_countries_display
-        ]
-        target_countries = [c for c in target_countries if c]
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Profession
@@ -440,7 +445,8 @@ def main():
         if len(target_countries) > 0:
             with st.spinner("Analyzing migration options..."):
                 results = analyze_migration(
-                    current_country, target_countries, profession, visa_type, preferences
+                    current_country, target_countries, profession, visa_type, preferences,
+                    {c['code']: c for c in countries}
                 )
             
             if results:
@@ -508,6 +514,7 @@ def main():
                 st.markdown("## ⚖️ Pros & Cons Analysis")
                 st.markdown("*Detailed advantages and challenges for each country*")
                 
+                # Pros and cons come with the cached country list
                 for result in results:
                     country = result['country']
                     
@@ -517,14 +524,14 @@ def main():
                         with col1:
                             st.markdown("### ✅ Key Advantages")
                             st.markdown('<div class="pros-list">', unsafe_allow_html=True)
-                            for pro in country['pros']:
+                            for pro in country.get('pros', []):
                                 st.markdown(f"• {pro}")
                             st.markdown('</div>', unsafe_allow_html=True)
                         
                         with col2:
                             st.markdown("### ⚠️ Challenges")
                             st.markdown('<div class="cons-list">', unsafe_allow_html=True)
-                            for con in country['cons']:
+                            for con in country.get('cons', []):
                                 st.markdown(f"• {con}")
                             st.markdown('</div>', unsafe_allow_html=True)
             
@@ -5,8 +5,11 @@ Run this after starting the FastAPI server to verify all endpoints work correctl
 """
 
 import requests
+import asyncio
 import json
+import os
 import sys
+import tempfile
 from typing import Dict, Any
 
 API_BASE_URL = "http://localhost:8000/api"
@@ -39,6 +42,64 @@ def test_endpoint(endpoint: str, method: str = "GET", data: Dict[Any, Any] = Non
         print(f"❌ {method} {endpoint} - Error: {str(e)}")
         return False
 
+def test_sensitivity_matches_analyze() -> bool:
+    """Check sensitivity base scores and ranks against /analyze for a default request"""
+    request = {
+        "target_countries": ["NL", "CA", "DE", "PT", "SG"],
+        "profession": "Software Engineer",
+        "visa_type": "Work Visa",
+        "preferences": {"economicOpportunities": 8, "qualityOfLife": 7}
+    }
+    try:
+        analysis = requests.post(f"{API_BASE_URL}/analyze", json={**request, "detail": "lean"}).json()["results"]
+        sensitivity = requests.post(f"{API_BASE_URL}/sensitivity", json={
+            **request, "samples": 200
+        }).json()["sensitivity"]["results"]
+    except Exception as e:
+        print(f"❌ Sensitivity base scores - Error: {str(e)}")
+        return False
+    
+    expected = [(result["code"], result["score"]) for result in analysis]
+    ranked = sorted(sensitivity, key=lambda result: result["base_rank"])
+    actual = [(result["country"]["code"], result["base_score"]) for result in ranked]
+    if actual == expected:
+        print("✅ Sensitivity base scores match /analyze")
+        return True
+    print(f"❌ Sensitivity base ranking {actual} differs from /analyze {expected}")
+    return False
+
+def test_import_survives_refresh() -> bool:
+    """Check that an imported snapshot is kept by the next refresh; runs without the server"""
+    from data_fetcher import DataFetcher
+    from snapshot import write_snapshot
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            fetcher = DataFetcher(os.path.join(directory, "test.db"), mode="rw", sources=[])
+            await fetcher.initialize_database()
+            countries = fetcher.snapshot.records()
+            for country in countries:
+                if country.code == "NL":
+                    country.metrics.safetyIndex = 1.0
+            path = os.path.join(directory, "edited.snap")
+            write_snapshot(path, countries, 0)
+            await fetcher.import_database(path)
+            changed = await fetcher.fetch_and_store_data()
+            await fetcher.reload()
+            row = fetcher.snapshot.index_of("NL")
+            return changed, fetcher.snapshot.record(row).metrics.safetyIndex
+
+    try:
+        changed, safety = asyncio.run(run())
+    except Exception as e:
+        print(f"❌ Import survives refresh - Error: {str(e)}")
+        return False
+    if not changed and safety == 1.0:
+        print("✅ Import survives refresh")
+        return True
+    print(f"❌ Import lost on refresh: changed={changed}, NL safetyIndex={safety}")
+    return False
+
 def main():
     """Run all API tests"""
     print("🧪 Testing Global Relocation Analyzer API")
@@ -52,11 +113,53 @@ def main():
     if test_endpoint("/health"):
         tests_passed += 1
     
+    # Test readiness endpoint
+    total_tests += 1
+    if test_endpoint("/ready"):
+        tests_passed += 1
+    
+    # Test admission metrics endpoint
+    total_tests += 1
+    if test_endpoint("/metrics"):
+        tests_passed += 1
+    
     # Test countries endpoint
     total_tests += 1
     if test_endpoint("/countries"):
         tests_passed += 1
     
+    # Test country details endpoints
+    total_tests += 1
+    if test_endpoint("/countries/NL/details"):
+        tests_passed += 1
+    
+    total_tests += 1
+    if test_endpoint("/details?codes=NL,CA,AU"):
+        tests_passed += 1
+    
+    # Test full-text search endpoint
+    total_tests += 1
+    if test_endpoint("/search?q=public transport"):
+        tests_passed += 1
+    
+    # Test resolver endpoints
+    total_tests += 1
+    if test_endpoint("/resolve?q=Holland,deu,Munich"):
+        tests_passed += 1
+    
+    total_tests += 1
+    if test_endpoint("/autocomplete?q=ne"):
+        tests_passed += 1
+    
+    # Test metric history endpoints
+    total_tests += 1
+    if test_endpoint("/history/NL/safetyIndex"):
+        tests_passed += 1
+    
+    total_tests += 1
+    if test_endpoint("/changes?since_version=0"):
+        tests_passed += 1
+    
     # Test professions endpoint
     total_tests += 1
     if test_endpoint("/professions"):
@@ -85,16 +188,73 @@ def main():
     if test_endpoint("/analyze", "POST", analyze_data):
         tests_passed += 1
     
+    # Test lean analyze responses
+    total_tests += 1
+    if test_endpoint("/analyze", "POST", {**analyze_data, "detail": "lean"}):
+        tests_passed += 1
+    
+    # Test analyze at city level
+    total_tests += 1
+    city_data = {**analyze_data, "target_countries": ["EU"], "level": "city", "limit": 5}
+    if test_endpoint("/analyze", "POST", city_data):
+        tests_passed += 1
+    
+    # Test catalog endpoint
+    total_tests += 1
+    if test_endpoint("/catalog/DE/BY/MUC"):
+        tests_passed += 1
+    
+    # Test sensitivity endpoint
+    total_tests += 1
+    sensitivity_data = {
+        "target_countries": ["NL", "CA", "AU"],
+        "preferences": analyze_data["preferences"],
+        "samples": 1000
+    }
+    if test_endpoint("/sensitivity", "POST", sensitivity_data):
+        tests_passed += 1
+    
+    # Sensitivity must start from the ranking /api/analyze reports, with
+    # its profession and visa adjustments and only some preferences given
+    total_tests += 1
+    if test_sensitivity_matches_analyze():
+        tests_passed += 1
+    
     # Test compare endpoint
     total_tests += 1
     if test_endpoint("/compare/IN/NL"):
         tests_passed += 1
     
+    # Test one-to-many compare endpoint
+    total_tests += 1
+    if test_endpoint("/compare/IN?targets=NL,CA,AU"):
+        tests_passed += 1
+    
+    # Test metric matrix endpoint
+    total_tests += 1
+    if test_endpoint("/compare-matrix/gdpPerCapita?codes=IN,NL,CA"):
+        tests_passed += 1
+    
+    # Test similar countries endpoint
+    total_tests += 1
+    if test_endpoint("/similar/NL?k=3"):
+        tests_passed += 1
+    
+    # Test skyline endpoint
+    total_tests += 1
+    if test_endpoint("/skyline"):
+        tests_passed += 1
+    
     # Test refresh data endpoint
     total_tests += 1
     if test_endpoint("/refresh-data", "POST"):
         tests_passed += 1
     
+    # A restored database must not be overwritten by the next refresh
+    total_tests += 1
+    if test_import_survives_refresh():
+        tests_passed += 1
+    
     # Summary
     print("\n" + "=" * 50)
     print(f"📊 Test Results: {tests_passed}/{total_tests} tests passed")
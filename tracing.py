@@ -0,0 +1,351 @@
+"""
+Sampled per-request span tracing with a local file exporter.
+
+A trace starts at the HTTP middleware or a scheduler job and follows the
+request through the code wrapped in span() or @traced: the route, the
+analyzer, DataFetcher calls, SQLite connections and serialization. The
+current span lives in a context variable, so it follows tasks and
+asyncio.to_thread without being passed around.
+
+Incoming W3C traceparent headers are continued with the caller's trace ID
+and sampling decision; other requests are sampled at TRACING_SAMPLE_RATE.
+Spans of unsampled traces are never created, so tracing costs almost
+nothing outside the sample.
+
+Finished spans are queued in memory and a background thread writes them in
+batches, so the event loop never touches the file. Each batch is one line
+of OTLP/JSON, the OpenTelemetry collector file format:
+
+    <TRACING_DIR>/traces-<pid>.jsonl      current file of this worker
+    <TRACING_DIR>/traces-<pid>.jsonl.1    previous file, and so on
+
+Every worker writes its own file and rotates it at TRACING_MAX_BYTES. When
+the queue is full, new spans are dropped and counted rather than waited on.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "global-relocation-analyzer"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'sampled',
+        'attributes', 'status', 'status_message', 'start_ns', '_start_perf', 'end_ns'
+    )
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str] = None,
+        kind: int = KIND_INTERNAL, sampled: bool = True
+    ):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = {}
+        self.status = None
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        # Durations come from the monotonic clock, start times from the wall clock
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self):
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf)
+        if self.status is None:
+            self.status = STATUS_OK
+        if self.sampled:
+            exporter.submit(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': self.status}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+def _new_id(size: int) -> str:
+    return random.getrandbits(size * 8).to_bytes(size, "big").hex()
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        # OTLP/JSON carries 64-bit integers as strings
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Trace ID, parent span ID and sampled flag of a traceparent header, None if invalid"""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+def current_span() -> Optional[Span]:
+    """The span of the running context, None outside any trace"""
+    return _current_span.get()
+
+def set_attribute(key: str, value: Any):
+    """Set an attribute on the current span, if it is recorded"""
+    span = _current_span.get()
+    if span is not None and span.sampled:
+        span.set_attribute(key, value)
+
+@contextmanager
+def start_trace(
+    name: str, traceparent: Optional[str] = None, kind: int = KIND_INTERNAL,
+    sample: Optional[bool] = None
+):
+    """Start a trace, continuing the caller's if a traceparent header is given
+
+    Yields the root span, or None when tracing is disabled. The sampling
+    decision is the caller's when it sent one, else sample, else random.
+    """
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = _new_id(16), None
+        sampled = sample if sample is not None else random.random() < settings.TRACING_SAMPLE_RATE
+
+    root = Span(name, trace_id, parent_id, kind, sampled)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.set_error(repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a child span of the current one; does nothing outside a sampled trace"""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield None
+        return
+
+    child = Span(name, parent.trace_id, parent.span_id)
+    child.attributes.update(attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_error(repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+def traced(name: Optional[str] = None):
+    """Decorator recording a span around each call of a function or coroutine function"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class RotatingFile:
+    """Append-only file rotated by size, like logging's RotatingFileHandler"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def _rotate(self):
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write(self, data: bytes):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+class BatchExporter:
+    """Queues finished spans and writes them in batches from a background thread"""
+
+    def __init__(self):
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._file = None
+        self.exported = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._file = RotatingFile(
+                os.path.join(settings.TRACING_DIR, f"traces-{os.getpid()}.jsonl"),
+                settings.TRACING_MAX_BYTES, settings.TRACING_BACKUP_COUNT
+            )
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def submit(self, span: Span):
+        """Queue a finished span without waiting; drops it when the queue is full"""
+        if len(self._queue) >= settings.TRACING_MAX_QUEUE:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._thread is None or not self._thread.is_alive():
+            self._ensure_thread()
+        if len(self._queue) >= settings.TRACING_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _take_batch(self) -> List[Span]:
+        batch = []
+        while self._queue and len(batch) < settings.TRACING_BATCH_SIZE:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _write(self, batch: List[Span]):
+        document = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    _otlp_attribute('service.name', SERVICE_NAME),
+                    _otlp_attribute('process.pid', os.getpid())
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp() for span in batch]
+                }]
+            }]
+        }
+        line = json.dumps(document, separators=(",", ":")).encode("utf-8") + b"\n"
+        try:
+            self._file.write(line)
+        except OSError as e:
+            self.errors += 1
+            logger.error(f"Error writing {len(batch)} spans: {e}")
+            return
+        self.exported += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.TRACING_EXPORT_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                self._write(batch)
+            if self._stopping:
+                return
+
+    def shutdown(self, timeout: float = 5):
+        """Write the spans still queued and stop the thread; blocks, so run it off the event loop"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            'queued': len(self._queue),
+            'exported': self.exported,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'errors': self.errors
+        }
+
+exporter = BatchExporter()